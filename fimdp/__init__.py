@@ -1 +1,19 @@
 __version__ = "1.0.2dev"
+
+
+def load(path, mmap=False):
+    """Load model stored by `save` from file `path`.
+
+    See `fimdp.storage.load` for details.
+    """
+    from .storage import load
+    return load(path, mmap=mmap)
+
+
+def save(mdp, path):
+    """Store `mdp` into file `path`.
+
+    See `fimdp.storage.save` for details.
+    """
+    from .storage import save
+    return save(mdp, path)
@@ -0,0 +1,277 @@
+"""
+Parallel solving of many tasks for one ConsMDP.
+
+`solve_batch(mdp, specs)` solves tasks described by `SolverSpec` objects
+(class of the solver, capacity, targets, objective, and other parameters of
+the solver) in a pool of processes. The frozen snapshot of `mdp` (see
+`ConsMDP.freeze()`) is placed in shared memory only once (see
+`SharedModel`) and each worker process maps its arrays; the model is neither
+rebuilt nor copied for each task. The results are yielded as soon as they
+are computed, not in the order of `specs`.
+
+The module needs Python 3.8 or newer (`multiprocessing.shared_memory`);
+the rest of FiMDP does not import it.
+
+Usage:
+```
+specs = grid_specs(caps=[10, 20, 40], targets_list=[T1, T2],
+                   objectives=[AS_REACH, BUCHI])
+for result in solve_batch(mdp, specs, max_workers=4):
+    print(result.spec, result.time, result.min_levels)
+```
+"""
+
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .core import CounterSelector, FrozenConsMDP
+from .energy_solvers import BasicES
+
+_ARRAYS = ("action_offsets", "action_ids", "consumption", "succ_offsets",
+           "succ_states", "succ_probs", "reload_mask")
+_ALIGN = 64
+
+
+class SolverSpec:
+    """
+    Picklable description of a task for an energy solver.
+
+    Parameters
+    ==========
+     * cap: energy capacity
+     * targets: `iterable` of target states
+     * objective: one of MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+     * solver_class: class of the solver (`BasicES` by default); it must be
+       defined at the top level of a module so that it can be pickled
+     * options: other keyword arguments of the solver (`engine`,
+       `threshold`, ...)
+    """
+
+    def __init__(self, cap, targets, objective, solver_class=BasicES,
+                 **options):
+        self.cap = cap
+        self.targets = targets
+        self.objective = objective
+        self.solver_class = solver_class
+        self.options = options
+
+    def create(self, mdp):
+        """Return solver for the task on `mdp`."""
+        return self.solver_class(mdp, self.cap, self.targets, **self.options)
+
+    def __repr__(self):
+        options = "".join(f", {key}={value!r}"
+                          for key, value in self.options.items())
+        return (f"SolverSpec(cap={self.cap!r}, targets={self.targets!r}, "
+                f"objective={self.objective!r}, "
+                f"solver_class={self.solver_class.__name__}{options})")
+
+
+class BatchResult:
+    """
+    Result of one task of `solve_batch`.
+
+    Attributes
+    ==========
+     * index: index of the task in `specs`
+     * spec: the `SolverSpec` of the task
+     * min_levels: `list` of minimal levels of energy for the objective
+     * selector: `CounterSelector` for the objective on the original mdp
+       (or `None` if selectors were not requested)
+     * time: time in seconds spent by the solver
+    """
+
+    def __init__(self, index, spec, min_levels, selector, time):
+        self.index = index
+        self.spec = spec
+        self.min_levels = min_levels
+        self.selector = selector
+        self.time = time
+
+    def __repr__(self):
+        return (f"BatchResult(index={self.index}, spec={self.spec!r}, "
+                f"time={self.time:.3f})")
+
+
+class SharedModel:
+    """
+    Frozen snapshot of a ConsMDP with arrays placed in shared memory.
+
+    The object owns the shared memory and releases it by `close()` (or at
+    the end of a `with` block). `descriptor` is a small picklable object
+    from which `SharedModel.attach` builds a `FrozenConsMDP` that reads
+    the arrays directly from the shared memory (in this process or in
+    processes started by it).
+    """
+
+    def __init__(self, mdp):
+        frozen = mdp.freeze()
+        arrays = [np.ascontiguousarray(getattr(frozen, key))
+                  for key in _ARRAYS]
+
+        layout, size = [], 0
+        for key, array in zip(_ARRAYS, arrays):
+            size = -(-size // _ALIGN) * _ALIGN
+            layout.append((key, array.dtype.str, array.shape, size))
+            size += array.nbytes
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for array, (_, _, _, offset) in zip(arrays, layout):
+            view = np.ndarray(array.shape, array.dtype,
+                              buffer=self._shm.buf, offset=offset)
+            view[...] = array
+            del view
+
+        self.descriptor = {
+            "shm": self._shm.name,
+            "layout": layout,
+            "labels": list(frozen.labels),
+            "names": list(frozen.names),
+            "name": frozen.name,
+        }
+
+    @staticmethod
+    def attach(descriptor):
+        """Return `FrozenConsMDP` with arrays in the shared memory given by
+        `descriptor`.
+
+        The shared memory stays mapped as long as the returned object
+        exists.
+        """
+        shm = _attach_shared_memory(descriptor["shm"])
+        arrays = {key: np.ndarray(shape, np.dtype(dtype), buffer=shm.buf,
+                                  offset=offset)
+                  for key, dtype, shape, offset in descriptor["layout"]}
+        frozen = FrozenConsMDP(labels=descriptor["labels"],
+                               names=descriptor["names"],
+                               name=descriptor["name"], **arrays)
+        frozen._shared_memory = shm
+        return frozen
+
+    def close(self):
+        """Release the shared memory."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def grid_specs(caps, targets_list, objectives, solver_classes=(BasicES,),
+               **options):
+    """Return list of `SolverSpec`s for all combinations of solver
+    classes, capacities, sets of targets, and objectives.
+
+    `options` are passed to all solvers.
+    """
+    return [SolverSpec(cap, targets, objective, solver_class, **options)
+            for solver_class, cap, targets, objective
+            in itertools.product(solver_classes, caps, targets_list,
+                                 objectives)]
+
+
+def map_shared(mdp, function, args_list, max_workers=None, mp_context=None):
+    """
+    Call `function(model, *args)` for each `args` in `args_list` in a pool
+    of processes, where `model` is the frozen snapshot of `mdp` in shared
+    memory (see `SharedModel`).
+
+    Yield pairs `(index, result)` where `index` is the index of `args` in
+    `args_list`, as soon as the calls are finished. `function` must be
+    defined at the top level of a module so that it can be pickled.
+
+    If `max_workers` is 1, the calls are made in this process with `mdp`
+    as `model`.
+    """
+    args_list = list(args_list)
+    if max_workers == 1:
+        for index, args in enumerate(args_list):
+            yield index, function(mdp, *args)
+        return
+
+    shared = SharedModel(mdp)
+    executor = ProcessPoolExecutor(max_workers=max_workers,
+                                   mp_context=mp_context,
+                                   initializer=_init_worker,
+                                   initargs=(shared.descriptor,))
+    futures = []
+    try:
+        for index, args in enumerate(args_list):
+            futures.append(executor.submit(_call, index, function, args))
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # `shutdown(cancel_futures=True)` needs Python 3.9
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+        shared.close()
+
+
+def solve_batch(mdp, specs, max_workers=None, selectors=False,
+                mp_context=None):
+    """
+    Solve tasks given by `specs` for `mdp` in parallel.
+
+    Yield `BatchResult` for each task as soon as it is finished.
+
+    Parameters
+    ==========
+     * mdp: `ConsMDP` or its frozen snapshot
+     * specs: iterable of `SolverSpec`
+     * max_workers: number of worker processes (number of CPUs by default);
+       with 1, the tasks are solved in this process
+     * selectors: if `True`, the results contain also selectors
+     * mp_context: multiprocessing context of the pool of processes
+    """
+    specs = list(specs)
+    args_list = [(spec, selectors) for spec in specs]
+    for index, (min_levels, rules, elapsed) in map_shared(
+            mdp, _solve, args_list, max_workers, mp_context):
+        selector = None
+        if rules is not None:
+            selector = CounterSelector.from_rules(mdp, rules)
+        yield BatchResult(index, specs[index], min_levels, selector, elapsed)
+
+
+### Worker processes ###
+_worker_mdp = None
+
+
+def _init_worker(descriptor):
+    global _worker_mdp
+    _worker_mdp = SharedModel.attach(descriptor)
+
+
+def _call(index, function, args):
+    return index, function(_worker_mdp, *args)
+
+
+def _solve(mdp, spec, selectors):
+    solver = spec.create(mdp)
+    start = time.perf_counter()
+    min_levels = solver.get_min_levels(spec.objective)
+    rules = None
+    if selectors:
+        rules = solver.get_selector(spec.objective).to_rules()
+    return min_levels, rules, time.perf_counter() - start
+
+
+def _attach_shared_memory(name):
+    """Open existing shared memory without making the current process
+    responsible for its removal."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers the memory with the resource tracker,
+        # which is shared with the creating process.
+        return shared_memory.SharedMemory(name=name)
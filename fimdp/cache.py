@@ -0,0 +1,171 @@
+"""
+On-disk cache of results of energy solvers.
+
+The results of a solver for an objective are determined by the structure
+of the mdp (see `ConsMDP.fingerprint()`), by the class of the solver and its
+parameters (capacity, targets, threshold, and engine), and by the objective.
+`ResultCache` stores the results under a key derived from all of these in
+a local directory, so that they can be reused by other solvers (also in
+other processes) for the same task.
+
+Usage:
+```
+cache = ResultCache("~/.cache/fimdp", max_bytes=10**9)
+solver = BasicES(mdp, cap, targets)
+solver.cache = cache
+solver.get_min_levels(BUCHI)  # computed, or loaded from cache
+```
+
+Each entry holds `min_levels`, `helper_levels`, and selectors of all
+objectives computed by the solver. Selectors are stored as lists of rules
+`(state, energy, action index)` (see `CounterSelector.to_rules()`). Only
+solvers that use `CounterSelector` are cached.
+
+Solvers with `lazy_selectors` (and `LabelSettingES`) store entries without
+the selectors they have not built; `lazy_selectors` is therefore not a part
+of the key. Each entry also holds the reloads removed in the last round of
+the computation of each objective, so that a solver that loads an entry
+without the selector it needs builds the selector by repeating only the
+last round (see `BasicES._build_selector`) instead of computing the
+objective again.
+
+When the total size of the entries exceeds `max_bytes`, the least recently
+used entries are removed.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+from .core import CounterSelector
+
+_SUFFIX = ".pkl"
+
+
+class ResultCache:
+    """
+    Directory with results of energy solvers.
+
+    Parameters
+    ==========
+     * directory: path to the directory with the cache (created if needed)
+     * max_bytes: maximal total size of entries in bytes (unlimited if `None`)
+    """
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, solver, objective):
+        """Return key for results of `solver` for `objective`."""
+        targets = solver.targets
+        if targets is not None:
+            targets = sorted(targets)
+        task = (
+            solver.mdp.fingerprint(),
+            f"{type(solver).__module__}.{type(solver).__qualname__}",
+            repr(solver.cap),
+            repr(targets),
+            repr(getattr(solver, "threshold", None)),
+            solver.engine,
+            objective,
+        )
+        return hashlib.sha256(repr(task).encode()).hexdigest()
+
+    def load(self, solver, objective):
+        """
+        Fill `solver` with cached results for `objective`.
+
+        Return `True` if the results were found, `False` otherwise.
+        """
+        if not self._supports(solver):
+            return False
+        entry = self.get(self.key(solver, objective))
+        if entry is None:
+            return False
+
+        solver.min_levels.update(entry["min_levels"])
+        solver.helper_levels.update(entry["helper_levels"])
+        solver._last_removed.update(entry.get("last_removed", {}))
+        for obj, rules in entry["strategy"].items():
+            solver.strategy[obj] = solver.SelectorClass.from_rules(solver.mdp,
+                                                                   rules)
+        return True
+
+    def store(self, solver, objective):
+        """Store the results of `solver` (computed for `objective`)."""
+        if not self._supports(solver):
+            return
+
+        strategy = {obj: selector.to_rules()
+                    for obj, selector in solver.strategy.items()}
+        entry = {
+            "min_levels": solver.min_levels,
+            "helper_levels": solver.helper_levels,
+            "last_removed": solver._last_removed,
+            "strategy": strategy,
+        }
+        self.put(self.key(solver, objective), entry)
+
+    def get(self, key):
+        """Return entry stored under `key` or `None`."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        """Store `entry` under `key` and evict old entries if needed."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries above `max_bytes`."""
+        if self.max_bytes is None:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all entries."""
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX):
+                os.remove(os.path.join(self.directory, name))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    @staticmethod
+    def _supports(solver):
+        return solver.SelectorClass is CounterSelector
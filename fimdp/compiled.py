@@ -0,0 +1,320 @@
+"""
+Compiled selectors: flat arrays for deployment and fast selection.
+
+`CounterSelector.compile()` and `ProductSelector.compile()` turn selectors
+into `CompiledSelector` and `CompiledProductSelector` objects that do not
+refer to the mdp. The rules of each row (state of the mdp, or pair of states
+of the mdp and of the other component of a product) are stored in flat
+arrays:
+ * `offsets`: rules of row `r` are at positions `offsets[r]:offsets[r+1]`,
+ * `thresholds`: lower bounds of energy intervals of the rules, sorted in
+   each row,
+ * `actions`: indices of the selected actions into the table of actions.
+The rows of product selectors are indexed densely by
+`orig_state * num_other + other_state`.
+
+The table of actions holds only the actions used by the selector: their
+labels (`action_labels`), consumption (`action_cons`), and indices in the
+frozen snapshot of the mdp (`action_indices`, see `ConsMDP.freeze()`).
+Together with `reload_mask` of states of the mdp, this is everything
+`CompiledCounterStrategy` needs to play the selector.
+
+Compiled selectors are stored by `save(path)` in an uncompressed `.npz`
+file and `CompiledSelector.load(path, mmap=True)` maps the arrays directly
+from the file (see `storage.py`). Labels of actions must be serializable to
+JSON.
+"""
+
+import json
+from bisect import bisect_right
+
+import numpy as np
+
+from .core import NoFeasibleActionError, WrongCallOrderError
+
+FORMAT = "fimdp-selector"
+VERSION = 1
+
+_ARRAYS = ("offsets", "thresholds", "actions", "action_indices",
+           "action_cons", "reload_mask")
+
+
+class CompiledSelector:
+    """
+    Array-backed read-only counter selector.
+
+    `select(state, energy)` returns the index of the action into the table of
+    actions (`action_labels`, `action_cons`, `action_indices`),
+    `select_action(state, energy)` returns its label. The arrays are
+    converted to lists on the first selection.
+
+    Use `CounterSelector.compile()` to create the selector.
+    """
+
+    def __init__(self, offsets, thresholds, actions, action_indices,
+                 action_cons, reload_mask, action_labels):
+        self.offsets = offsets
+        self.thresholds = thresholds
+        self.actions = actions
+        self.action_indices = action_indices
+        self.action_cons = action_cons
+        self.reload_mask = reload_mask
+        self.action_labels = list(action_labels)
+        self._lists = None
+        self._keys = None
+
+    @property
+    def num_states(self):
+        return len(self.reload_mask)
+
+    def _tables(self):
+        if self._lists is None:
+            self._lists = (self.offsets.tolist(), self.thresholds.tolist(),
+                           self.actions.tolist())
+        return self._lists
+
+    def _select_row(self, row, energy):
+        offsets, thresholds, actions = self._lists or self._tables()
+        start = offsets[row]
+        i = bisect_right(thresholds, energy, start, offsets[row + 1])
+        if i == start:
+            raise NoFeasibleActionError(f"No action is feasible for energy "
+                                        f"level {energy}")
+        return actions[i - 1]
+
+    def select(self, state, energy):
+        """Return index of the action selected for `state` and `energy`."""
+        return self._select_row(state, energy)
+
+    def select_action(self, state, energy):
+        """Return label of the action selected for `state` and `energy`."""
+        return self.action_labels[self.select(state, energy)]
+
+    def select_indices(self, states, energies):
+        """
+        Return NumPy array of indices of the actions selected for arrays
+        `states` and `energies`; `-1` where no action is feasible.
+        """
+        return self._select_rows(np.asarray(states, dtype=np.int64),
+                                 energies)
+
+    def _search_keys(self):
+        """Return sorted keys `row * scale + threshold` of all rules, `scale`
+        (larger than all thresholds), and offsets of rows."""
+        if self._keys is None:
+            offsets = np.asarray(self.offsets, dtype=np.int64)
+            thresholds = np.asarray(self.thresholds, dtype=np.int64)
+            scale = int(thresholds.max(initial=-1)) + 2
+            rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+            self._keys = (rows * scale + thresholds, scale, offsets)
+        return self._keys
+
+    def _select_rows(self, rows, energies):
+        keys, scale, offsets = self._search_keys()
+        # Energies above all thresholds select the same as `scale - 1`;
+        # non-integer energies select the same as their floor (as `select`)
+        energies = np.floor(np.clip(np.asarray(energies), -1, scale - 1))
+        i = np.searchsorted(keys, rows * scale + energies.astype(np.int64),
+                            side="right")
+        feasible = i > offsets[rows]
+        if not feasible.any():
+            return np.full(rows.shape, -1, dtype=np.int64)
+        actions = np.asarray(self.actions, dtype=np.int64)
+        return np.where(feasible, actions[np.maximum(i - 1, 0)], -1)
+
+    def save(self, path):
+        """Store the selector into file `path`.
+
+        Raise `ValueError` if some label of action cannot be stored.
+        """
+        header = {"format": FORMAT, "version": VERSION,
+                  "class": type(self).__name__,
+                  "action_labels": self.action_labels}
+        header.update(self._header())
+        try:
+            header = json.dumps(header).encode()
+        except TypeError as e:
+            raise ValueError(f"The selector cannot be stored: {e}")
+
+        arrays = {key: np.asarray(getattr(self, key)) for key in _ARRAYS}
+        arrays["header"] = np.frombuffer(header, dtype=np.uint8)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def load(path, mmap=False):
+        """
+        Load selector stored by `save` from file `path`.
+
+        If `mmap` is `True`, the arrays are memory-mapped from the file.
+
+        Raise `ValueError` if the file is not in a supported format.
+        """
+        from .storage import _mmap_arrays
+
+        if mmap:
+            arrays = _mmap_arrays(path)
+        else:
+            with np.load(path) as data:
+                arrays = {key: data[key] for key in data.files}
+
+        if "header" not in arrays:
+            raise ValueError(f"File {path} does not contain a selector.")
+        header = json.loads(bytes(arrays["header"]).decode())
+        if header.get("format") != FORMAT:
+            raise ValueError(f"File {path} does not contain a selector.")
+        if header.get("version") != VERSION:
+            raise ValueError(f"Unsupported version {header.get('version')} of "
+                             f"the format (supported: {VERSION}).")
+
+        classes = {cls.__name__: cls
+                   for cls in (CompiledSelector, CompiledProductSelector)}
+        cls = classes.get(header["class"])
+        if cls is None:
+            raise ValueError(f"Unknown class of selector {header['class']}.")
+        return cls._from_stored(header, {key: arrays[key] for key in _ARRAYS})
+
+    def _header(self):
+        return {}
+
+    @classmethod
+    def _from_stored(cls, header, arrays):
+        return cls(action_labels=header["action_labels"], **arrays)
+
+    @classmethod
+    def _compile(cls, mdp, rows, **kwargs):
+        """Build the selector from `rows`, iterable of selection rules (or
+        `None` for rows without rules)."""
+        frozen = mdp.freeze()
+        index = {frozen.action(i): i for i in range(frozen.num_actions)}
+        table = {}
+        offsets, thresholds, actions = [0], [], []
+        for rule in rows:
+            if rule:
+                for energy in sorted(rule):
+                    action = index[rule[energy]]
+                    thresholds.append(energy)
+                    actions.append(table.setdefault(action, len(table)))
+            offsets.append(len(thresholds))
+
+        action_indices = np.array(list(table), dtype=np.int64)
+        return cls(offsets=np.array(offsets, dtype=np.int64),
+                   thresholds=np.array(thresholds, dtype=np.int64),
+                   actions=np.array(actions, dtype=np.int64),
+                   action_indices=action_indices,
+                   action_cons=frozen.consumption[action_indices].copy(),
+                   reload_mask=np.array(frozen.reload_mask, dtype=bool),
+                   action_labels=[frozen.labels[i] for i in table],
+                   **kwargs)
+
+
+class CompiledProductSelector(CompiledSelector):
+    """
+    Array-backed read-only variant of `ProductSelector`.
+
+    The rules for `orig_state` of the original mdp and `other_state` of the
+    other component are in the row `orig_state * num_other + other_state`.
+    `select(orig_state, other_state, energy)` returns index of the action
+    of the original mdp into the table of actions and `select_action` its
+    label.
+
+    Use `ProductSelector.compile()` to create the selector.
+    """
+
+    def __init__(self, offsets, thresholds, actions, action_indices,
+                 action_cons, reload_mask, action_labels, num_other):
+        super().__init__(offsets, thresholds, actions, action_indices,
+                         action_cons, reload_mask, action_labels)
+        self.num_other = num_other
+
+    def select(self, orig_state, other_state, energy):
+        """Return index of the action selected for `orig_state×other_state`
+        and `energy`."""
+        if not 0 <= other_state < self.num_other:
+            raise NoFeasibleActionError(f"There is no selection rule for "
+                                        f"other state {other_state}")
+        return self._select_row(orig_state * self.num_other + other_state,
+                                energy)
+
+    def select_action(self, orig_state, other_state, energy):
+        """Return label of the action selected for `orig_state×other_state`
+        and `energy`."""
+        return self.action_labels[self.select(orig_state, other_state,
+                                              energy)]
+
+    def select_indices(self, orig_states, other_states, energies):
+        """
+        Return NumPy array of indices of the actions selected for arrays
+        `orig_states`, `other_states`, and `energies`; `-1` where no action
+        is feasible.
+        """
+        orig_states = np.asarray(orig_states, dtype=np.int64)
+        other_states = np.asarray(other_states, dtype=np.int64)
+        known = (other_states >= 0) & (other_states < self.num_other)
+        rows = orig_states * self.num_other + np.where(known, other_states, 0)
+        return np.where(known, self._select_rows(rows, energies), -1)
+
+    def _header(self):
+        return {"num_other": self.num_other}
+
+    @classmethod
+    def _from_stored(cls, header, arrays):
+        return cls(action_labels=header["action_labels"],
+                   num_other=header["num_other"], **arrays)
+
+
+class CompiledCounterStrategy:
+    """
+    Counter strategy that plays a `CompiledSelector` without the mdp.
+
+    It follows the interface of `CounterStrategy`: calls to `next_action()`
+    and `update_state(outcome)` alternate (or `next_action(outcome)` is used
+    exclusively). `next_action` returns the label of the action to play;
+    `action` is its index into the table of actions of the selector.
+    Outcomes are not checked against the successors of the actions.
+
+    The energy is set to `capacity` in reload states and decreased by the
+    consumption of the played action.
+    """
+
+    def __init__(self, selector, capacity, init_energy, init_state=None):
+        self.selector = selector
+        self.capacity = capacity
+        self._reload = selector.reload_mask.tolist()
+        self._cons = selector.action_cons.tolist()
+        self.reset(init_state, init_energy)
+
+    def next_action(self, outcome=None):
+        """Return label of the next action to play.
+
+        If `outcome` is given, update the current state to `outcome` first.
+        """
+        if outcome is not None:
+            self.update_state(outcome)
+        if self.action is not None:
+            raise WrongCallOrderError("The outcome of the last action is not "
+                                      "known. Supply it using the `outcome` "
+                                      "parameter or using the function"
+                                      "`strategy.update_state(outcome)`.")
+        self.action = self.selector.select(self.state, self.energy)
+        return self.selector.action_labels[self.action]
+
+    def update_state(self, outcome):
+        """Tell the strategy that the last action ended in `outcome`."""
+        if self.state is not None:
+            if self.action is None:
+                raise WrongCallOrderError("`strategy.update_state()` must be "
+                                          "called after "
+                                          "`strategy.next_action()`.")
+            if self._reload[self.state]:
+                self.energy = self.capacity
+            self.energy -= self._cons[self.action]
+        self.action = None
+        self.state = outcome
+
+    def reset(self, init_state=None, init_energy=None):
+        """Start a new play from `init_state` (and `init_energy`)."""
+        self.action = None
+        self.state = init_state
+        if init_energy is not None:
+            self.energy = init_energy
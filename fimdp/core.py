@@ -60,9 +60,16 @@ states of a ProductConsMDP into states and actions of the original ConsMDP.
 [CAV paper]: https://link.springer.com/chapter/10.1007/978-3-030-53291-8_22
 """
 
+import hashlib
 import math
+from bisect import bisect_right
+from collections.abc import Mapping
+from copy import copy, deepcopy
+from decimal import Decimal, InvalidOperation
 from IPython.display import display, SVG
 
+import numpy as np
+
 from .distribution import is_distribution
 from .dot import consMDP2dot, dot_to_svg
 
@@ -100,6 +107,9 @@ class ConsMDP:
     for each state (that is how `actions_for_state(s)` work internally).
     The vector `succ` serves to locate the first action in this linked-list
     for given state (`actions[succ[s]]` hold the first action of `s`).
+    The last action of each state is tracked by `_tails` and the actions of
+    each state are indexed by their labels in `_label_index`, so that adding
+    actions does not need to walk the linked-list.
 
     Do not modify the two vectors directly. Always use `ConsMDP.add_action`
     to add and `ConsMDP.remove_action` or `ConsMDP.out_iteraser(s)` to remove
@@ -107,22 +117,38 @@ class ConsMDP:
     
     Computation of Safe vector
     ==========================
-    The :math:`safe^{cap}` vector can be computed in 2 different ways.
+    The :math:`safe^{cap}` vector can be computed in 3 different ways.
     
     The variant used by default in consMDP can be controlled by def_EL_class.
     Currently, the default is 
     ```
     self.def_EL_class = BasicES
     ```
-    The other option is `LeastFixpointES`.
+    The other options are `LeastFixpointES` and `LabelSettingES`.
     
-    The running times between the 2 variants can vary a lot, it hugely
+    The running times between the variants can vary a lot, it hugely
     depends on the MDP and its structure. See notebook 
     [Safe-variants](Safe-variants.ipynb) for more details and comparison.
     
     Basically, LeastFixpointES is faster on models where the maximal
     consumption on an action is strictly smaller than the number of states,
-    and the other way.
+    and the other way. LabelSettingES finalizes each state only once per
+    removal of reloads and its running time depends mostly on the number
+    of transitions.
+
+    Frozen snapshots
+    ================
+    `freeze()` returns a `FrozenConsMDP`: an immutable array-backed copy of
+    the structure of the ConsMDP that offers the same read-only interface
+    (`actions_for_state`, `is_reload`, `num_states`, ...). Energy solvers
+    can run directly on the snapshot. The snapshot is cached until the next
+    call of `structure_change()`.
+
+    Predecessors
+    ============
+    `predecessors(s)` returns the states that have an action with `s` among
+    its successors. The reverse-adjacency index is built on the first call
+    and is dropped by `structure_change()`.
     """
 
     def __init__(self):
@@ -132,6 +158,8 @@ class ConsMDP:
 
         self.succ = []
         self.actions = [0]
+        self._tails = []
+        self._label_index = []
 
         self.names = []
         self.names_dict = dict()
@@ -139,8 +167,12 @@ class ConsMDP:
 
         self.num_states = 0
 
+        self._frozen = None
+        self._preds = None
+
     def structure_change(self):
-        pass
+        self._frozen = None
+        self._preds = None
 
     def state_with_name(self, name):
         '''Return id of state with name `name` or `None` if not exists.'''
@@ -165,6 +197,8 @@ class ConsMDP:
         sid = self.num_states
         
         self.succ.append(0)
+        self._tails.append(0)
+        self._label_index.append(dict())
         self.reloads.append(reload)
         self.names.append(name)
         if name is not None:
@@ -235,10 +269,9 @@ class ConsMDP:
 
         # check for determinism on action labels
         # raise ValueError if nondeterminsm would occur
-        for a in self.actions_for_state(src):
-            if a.label == label:
-                raise ValueError(
-                    "State {} already has an action with label {}".format(src, label))
+        if label in self._label_index[src]:
+            raise ValueError(
+                "State {} already has an action with label {}".format(src, label))
 
         aid = len(self.actions)
         adata = ActionData(src, consumption, distribution, label, 0)
@@ -248,11 +281,13 @@ class ConsMDP:
         # Update the lists accordingly:
         #  * `next_succ` of last action for src if any, or
         #  * `succ[src]`  if it's first action for src
-        a = self.actions_for_state(src).get_last()
-        if a is None:
+        last = self._tails[src]
+        if last == 0:
             self.succ[src] = aid
         else:
-            a.next_succ = aid
+            self.actions[last].next_succ = aid
+        self._tails[src] = aid
+        self._label_index[src][label] = aid
 
         self.actions.append(adata)
         return aid
@@ -294,6 +329,314 @@ class ConsMDP:
             succs = succs.union(e.distr.keys())
         return succs
 
+    def predecessors(self, s):
+        """Return tuple of states with an action that can lead to `s`."""
+        if self._preds is None:
+            preds = [set() for _ in range(self.num_states)]
+            for src in range(self.num_states):
+                for a in self.actions_for_state(src):
+                    for t in a.distr:
+                        preds[t].add(src)
+            self._preds = [tuple(sorted(p)) for p in preds]
+        return self._preds[s]
+
+    def freeze(self):
+        """
+        Return an immutable array-backed snapshot (`FrozenConsMDP`) of the
+        ConsMDP.
+
+        The snapshot shares the `ActionData` objects with this ConsMDP, so
+        selectors computed on the snapshot return actions of this ConsMDP.
+        The snapshot is cached and rebuilt only after `structure_change()`.
+        """
+        if self._frozen is None:
+            self._frozen = self._make_frozen(self._freeze_arrays())
+        return self._frozen
+
+    def _make_frozen(self, arrays):
+        return FrozenConsMDP(name=self.name, names=self.names, **arrays)
+
+    def _freeze_arrays(self):
+        """
+        Collect the structure of the ConsMDP into the arrays used by
+        `FrozenConsMDP`. The actions of each state keep the order given
+        by `actions_for_state`.
+        """
+        action_offsets, succ_offsets = [0], [0]
+        action_ids, actions, labels, consumption = [], [], [], []
+        succ_states, succ_probs = [], []
+
+        for s in range(self.num_states):
+            aid = self.succ[s]
+            while aid != 0:
+                a = self.actions[aid]
+                action_ids.append(aid)
+                actions.append(a)
+                labels.append(a.label)
+                consumption.append(a.cons)
+                succ_states.extend(a.distr.keys())
+                succ_probs.extend(float(p) for p in a.distr.values())
+                succ_offsets.append(len(succ_states))
+                aid = a.next_succ
+            action_offsets.append(len(action_ids))
+
+        return {
+            "action_offsets": action_offsets,
+            "action_ids": action_ids,
+            "consumption": consumption,
+            "succ_offsets": succ_offsets,
+            "succ_states": succ_states,
+            "succ_probs": succ_probs,
+            "reload_mask": self.reloads,
+            "labels": labels,
+            "actions": actions,
+        }
+
+    ### Bulk construction and export ###
+    @classmethod
+    def from_arrays(cls, src, label, consumption, successor, probability,
+                    reloads=None, names=None, num_states=None):
+        """
+        Build a ConsMDP from arrays of transitions.
+
+        The i-th transition says that the action labeled by `label[i]` in
+        the state `src[i]` consumes `consumption[i]` units of energy and leads
+        to `successor[i]` with probability `probability[i]`. Transitions with
+        the same `src` and `label` form one action; the actions of each state
+        are created in the order of their first transition.
+
+        All arrays are validated at once, the probabilities of each action
+        must sum up to 1 (up to 1e-9). They are stored exactly as `Decimal`
+        values: probabilities given as `Decimal`s or decimal strings are kept,
+        floats are read as their shortest decimal representation. If these
+        do not sum up to 1, the largest probability of the action is adjusted
+        so that they do.
+
+        Parameters
+        ==========
+         * src, label, consumption, successor, probability: array-likes of
+           the same length, one item per transition
+         * reloads: array-like of `bool` for each state (no reloads by default)
+         * names: list of names of states (`None` by default)
+         * num_states: number of states; by default given by `reloads`,
+           `names`, or the largest state used in transitions
+
+        Raises `ValueError` if the arrays do not describe a valid ConsMDP.
+        """
+        mdp = cls()
+        mdp._fill_from_arrays(src, label, consumption, successor,
+                              probability, reloads, names, num_states)
+        return mdp
+
+    def _fill_from_arrays(self, src, label, consumption, successor,
+                          probability, reloads=None, names=None,
+                          num_states=None):
+        """Fill this empty ConsMDP with states and actions given by arrays.
+
+        See `from_arrays` for the parameters.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        successor = np.asarray(successor, dtype=np.int64)
+        consumption = np.asarray(consumption, dtype=np.int64)
+        # Decimals or decimal strings are kept exactly, they are converted
+        # to floats only for validation
+        given_probability = np.asarray(probability)
+        if given_probability.dtype.kind not in "OUS":
+            given_probability = given_probability.astype(np.float64)
+        probability = given_probability.astype(np.float64)
+        label = np.asarray(label)
+        rows = len(src)
+        if not (len(label) == len(consumption) == len(successor) ==
+                len(probability) == rows):
+            raise ValueError("All arrays of transitions must have the same "
+                             "length.")
+
+        if num_states is None:
+            if reloads is not None:
+                num_states = len(reloads)
+            elif names is not None:
+                num_states = len(names)
+            else:
+                num_states = int(max(src.max(), successor.max())) + 1 \
+                    if rows > 0 else 0
+        for name, given in [("reloads", reloads), ("names", names)]:
+            if given is not None and len(given) != num_states:
+                raise ValueError(f"Length of {name} must be equal to the "
+                                 f"number of states ({num_states}).")
+
+        self.num_states = num_states
+        self.succ = [0] * num_states
+        self._tails = [0] * num_states
+        self._label_index = [dict() for _ in range(num_states)]
+        if reloads is None:
+            self.reloads = [False] * num_states
+        else:
+            self.reloads = np.asarray(reloads, dtype=bool).tolist()
+        if names is None:
+            self.names = [None] * num_states
+        else:
+            self.names = list(names)
+            for sid, name in enumerate(self.names):
+                if name is None:
+                    continue
+                if name in self.names_dict:
+                    raise ValueError("State with name \"{}\" already exists "
+                                     "(id={})".format(name,
+                                                      self.names_dict[name]))
+                self.names_dict[name] = sid
+
+        if rows == 0:
+            return
+
+        invalid = (src < 0) | (src >= num_states) | \
+                  (successor < 0) | (successor >= num_states)
+        if invalid.any():
+            i = np.flatnonzero(invalid)[0]
+            raise ValueError(f"Transition {i} ({src[i]} -> {successor[i]}) "
+                             f"uses a state that does not exist.")
+        if (probability <= 0).any():
+            i = np.flatnonzero(probability <= 0)[0]
+            raise ValueError(f"Transition {i} has non-positive probability "
+                             f"{probability[i]}.")
+
+        # Group transitions by actions (src, label); the stable sort keeps
+        # the order of transitions within each action.
+        label_values, label_codes = np.unique(label, return_inverse=True)
+        label_codes = label_codes.reshape(-1)
+        key = src * len(label_values) + label_codes
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        ends = np.r_[starts[1:], rows]
+
+        cons = consumption[order]
+        if (cons != np.repeat(cons[starts], ends - starts)).any():
+            i = order[np.flatnonzero(
+                cons != np.repeat(cons[starts], ends - starts))[0]]
+            raise ValueError(f"Transition {i} has a different consumption "
+                             f"than other transitions of its action.")
+
+        succs = successor[order]
+        pairs = np.sort(key * num_states + succs)
+        if (pairs[1:] == pairs[:-1]).any():
+            raise ValueError("Some action has the same successor in more "
+                             "than one transition.")
+
+        probs = probability[order]
+        sums = np.add.reduceat(probs, starts)
+        if (np.abs(sums - 1) > 1e-9).any():
+            g = np.flatnonzero(np.abs(sums - 1) > 1e-9)[0]
+            raise ValueError(f"Probabilities of action {label[order[starts[g]]]}"
+                             f" of state {src[order[starts[g]]]} sum up "
+                             f"to {sums[g]}.")
+
+        # Create actions state by state in the order of first transitions
+        first = order[starts]
+        action_order = np.lexsort((first, src[first]))
+
+        label_values = label_values.tolist()
+        action_labels = label_codes[first].tolist()
+        action_src = src[first].tolist()
+        action_cons = cons[starts].tolist()
+        starts, ends = starts.tolist(), ends.tolist()
+        succs = succs.tolist()
+        values, codes = np.unique(given_probability[order],
+                                  return_inverse=True)
+        exact = [_exact_probability(p) for p in values.tolist()]
+        probs = [exact[c] for c in codes.reshape(-1).tolist()]
+
+        actions, tails = self.actions, self._tails
+        for g in action_order.tolist():
+            s = action_src[g]
+            l = label_values[action_labels[g]]
+            start, end = starts[g], ends[g]
+            probs_g = probs[start:end]
+            total = sum(probs_g)
+            if total != 1:
+                i = max(range(len(probs_g)), key=probs_g.__getitem__)
+                probs_g[i] += 1 - total
+            distr = dict(zip(succs[start:end], probs_g))
+            aid = len(actions)
+            actions.append(_action_data(s, action_cons[g], distr, l))
+            last = tails[s]
+            if last == 0:
+                self.succ[s] = aid
+            else:
+                actions[last].next_succ = aid
+            tails[s] = aid
+            self._label_index[s][l] = aid
+
+        self.structure_change()
+
+    @classmethod
+    def from_scipy(cls, matrices, consumption, reloads=None, names=None):
+        """
+        Build a ConsMDP from transition matrices of action labels.
+
+        For each label `l`, `matrices[l]` is a square `scipy.sparse` matrix
+        where the row `s` is the distribution of successors of the action
+        labeled by `l` in state `s` (empty rows mean no action). The
+        consumption of these actions is given by `consumption[l]`, which is
+        either a number or an array with a value for each state.
+
+        See `from_arrays` for the other parameters.
+        """
+        num_states = None
+        src, label, cons, succ, prob = [], [], [], [], []
+        for l, matrix in matrices.items():
+            matrix = matrix.tocsr(copy=True)
+            matrix.eliminate_zeros()
+            if matrix.shape[0] != matrix.shape[1] or \
+                    num_states not in (None, matrix.shape[0]):
+                raise ValueError(f"Matrix for label {l} must be square and of "
+                                 f"the same size as other matrices.")
+            num_states = matrix.shape[0]
+            coo = matrix.tocoo()
+            l_cons = np.broadcast_to(np.asarray(consumption[l]),
+                                     (num_states,))
+            src.append(coo.row)
+            succ.append(coo.col)
+            prob.append(coo.data)
+            cons.append(l_cons[coo.row])
+            l_labels = np.empty(coo.nnz, dtype=object)
+            l_labels[:] = [l] * coo.nnz
+            label.append(l_labels)
+
+        if num_states is None:
+            num_states = 0 if reloads is None else len(reloads)
+        concat = lambda arrays, dtype: np.concatenate(arrays) \
+            if arrays else np.zeros(0, dtype=dtype)
+        return cls.from_arrays(concat(src, np.int64), concat(label, object),
+                               concat(cons, np.int64), concat(succ, np.int64),
+                               concat(prob, np.float64), reloads=reloads,
+                               names=names, num_states=num_states)
+
+    def to_arrays(self):
+        """
+        Return `dict` with arrays of transitions, reloads, and names.
+
+        The result can be passed to `from_arrays` as keyword arguments.
+        """
+        return self.freeze().to_arrays()
+
+    def to_scipy(self):
+        """
+        Return transition matrices and consumption for each action label.
+
+        Returns pair `(matrices, consumption)` of dicts accepted by
+        `from_scipy`. Consumption is an array with 0 for states without
+        the corresponding action. Needs `scipy`.
+        """
+        return self.freeze().to_scipy()
+
+    def fingerprint(self):
+        """
+        Return hex digest that identifies the structure of the ConsMDP.
+
+        See `FrozenConsMDP.fingerprint`.
+        """
+        return self.freeze().fingerprint()
+
     def get_dot(self, options=""):
         dwriter = consMDP2dot(self, solver=None, options=options)
         return dwriter.get_dot()
@@ -341,6 +684,30 @@ class ActionData:
         return f"{self.src}——{self.label}[{self.cons}]——>{self.distr}"
 
 
+def _action_data(src, cons, distr, label, next_succ=0):
+    """
+    Create `ActionData` without checking that `distr` is a distribution.
+
+    Only for distributions that were already validated.
+    """
+    a = ActionData.__new__(ActionData)
+    a.src = src
+    a.cons = cons
+    a.distr = distr
+    a.label = label
+    a.next_succ = next_succ
+    return a
+
+
+def _exact_probability(p):
+    """Return `Decimal` of probability `p` (a float is read as its shortest
+    decimal representation)."""
+    try:
+        return Decimal(str(p))
+    except InvalidOperation:
+        return Decimal(str(float(p)))
+
+
 class _ActionIter:
     """
     Iterate over linked list nested in a given List.
@@ -428,11 +795,223 @@ class _ActionItEraser(_ActionIter):
 
         self.mdp.structure_change()
 
-        self.outer_list[self.curr].next_succ = self.curr
+        action = self.outer_list[self.curr]
+        del self.mdp._label_index[self.s][action.label]
+        if self.mdp._tails[self.s] == self.curr:
+            self.mdp._tails[self.s] = 0 if self.prev is None else self.prev
+
+        action.next_succ = self.curr
         if self.prev is None:
             self.succ[self.s] = self.next
         else:
             self.outer_list[self.prev].next_succ = self.next
+        # the erased action must not become `prev` of the next action
+        self.curr = self.prev
+
+
+def _readonly(array, dtype):
+    """Return `array` as NumPy array of `dtype` that cannot be written to."""
+    array = np.asarray(array, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+class FrozenConsMDP:
+    """
+    Immutable array-backed snapshot of a ConsMDP.
+
+    The snapshot stores the structure of a ConsMDP in a compressed sparse
+    row (CSR) fashion. The actions of all states are numbered consecutively
+    (we call these numbers *action indices*), state by state, and:
+     * `action_offsets[s]:action_offsets[s+1]` are the action indices of
+       actions of the state `s`,
+     * `action_src`, `consumption` and `action_ids` hold, for each action
+       index, the source state, the consumption, and the id of the action
+       in the original ConsMDP (index in `ConsMDP.actions`), and
+     * `succ_offsets[i]:succ_offsets[i+1]` delimit the successors of the
+       action with index `i` in `succ_states` and their probabilities in
+       `succ_probs`.
+    Finally, `reload_mask` is a Boolean array with reload states.
+
+    The snapshot offers the read-only part of the interface of ConsMDP
+    (`num_states`, `is_reload`, `actions_for_state`, `state_succs`,
+    `predecessors`, `names`, ...) and thus energy solvers can run on it directly. The `ActionData`
+    objects are created only when requested (unless supplied in `actions`)
+    and are cached afterwards.
+
+    Use `ConsMDP.freeze()` to obtain the snapshot.
+    """
+
+    def __init__(self, action_offsets, action_ids, consumption,
+                 succ_offsets, succ_states, succ_probs, reload_mask,
+                 labels, names=None, name=None, actions=None):
+        self.name = name
+
+        self.action_offsets = _readonly(action_offsets, np.int64)
+        self.action_ids = _readonly(action_ids, np.int64)
+        self.consumption = _readonly(consumption, np.int64)
+        self.succ_offsets = _readonly(succ_offsets, np.int64)
+        self.succ_states = _readonly(succ_states, np.int64)
+        self.succ_probs = _readonly(succ_probs, np.float64)
+        self.reload_mask = _readonly(reload_mask, bool)
+
+        self.num_states = len(self.reload_mask)
+        self.num_actions = len(self.action_ids)
+        self.action_src = _readonly(
+            np.repeat(np.arange(self.num_states, dtype=np.int64),
+                      np.diff(self.action_offsets)), np.int64)
+
+        self.labels = tuple(labels)
+        self.reloads = tuple(self.reload_mask.tolist())
+        if names is None:
+            names = [None] * self.num_states
+        self.names = tuple(names)
+        self._names_dict = None
+
+        if actions is None:
+            actions = [None] * self.num_actions
+        self._actions = list(actions)
+        self._state_actions = [None] * self.num_states
+        self._preds = None
+        self._fingerprint = None
+
+    def freeze(self):
+        return self
+
+    def state_with_name(self, name):
+        """Return id of state with name `name` or `None` if not exists."""
+        if self._names_dict is None:
+            self._names_dict = {n: s for s, n in enumerate(self.names)
+                                if n is not None}
+        return self._names_dict.get(name)
+
+    def is_reload(self, sid):
+        """Return the reload status of state `sid`."""
+        return self.reloads[sid]
+
+    def action(self, index):
+        """Return `ActionData` for the action with the given action index."""
+        a = self._actions[index]
+        if a is None:
+            start = self.succ_offsets[index]
+            end = self.succ_offsets[index + 1]
+            distr = dict(zip(self.succ_states[start:end].tolist(),
+                             self.succ_probs[start:end].tolist()))
+            a = _action_data(int(self.action_src[index]),
+                             int(self.consumption[index]),
+                             distr, self.labels[index])
+            self._actions[index] = a
+        return a
+
+    def actions_for_state(self, s):
+        """Return tuple of actions available for state `s`."""
+        actions = self._state_actions[s]
+        if actions is None:
+            start = self.action_offsets[s]
+            end = self.action_offsets[s + 1]
+            actions = tuple(self.action(i) for i in range(start, end))
+            self._state_actions[s] = actions
+        return actions
+
+    def state_succs(self, s):
+        """Return successors of `s` over all actions"""
+        start = self.succ_offsets[self.action_offsets[s]]
+        end = self.succ_offsets[self.action_offsets[s + 1]]
+        return set(self.succ_states[start:end].tolist())
+
+    def predecessors(self, s):
+        """Return tuple of states with an action that can lead to `s`."""
+        if self._preds is None:
+            n = self.num_states
+            entry_src = np.repeat(self.action_src, np.diff(self.succ_offsets))
+            # unique (successor, source) pairs sorted by successor
+            pairs = np.unique(self.succ_states * n + entry_src)
+            pred_states = (pairs % n).tolist()
+            offsets = np.searchsorted(pairs // n, np.arange(n + 1)).tolist()
+            self._preds = [tuple(pred_states[offsets[t]:offsets[t + 1]])
+                           for t in range(n)]
+        return self._preds[s]
+
+    def fingerprint(self):
+        """
+        Return hex digest (SHA-256) that identifies the structure.
+
+        The digest covers states, reloads, and actions (in their order) with
+        their labels, consumption, and successors with probabilities (as
+        floats). Names of states are not included.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for array in [self.action_offsets, self.consumption,
+                          self.succ_offsets, self.succ_states,
+                          self.succ_probs, self.reload_mask]:
+                digest.update(np.ascontiguousarray(array).tobytes())
+                digest.update(b";")
+            digest.update(repr(self.labels).encode())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def to_arrays(self):
+        """
+        Return `dict` with arrays of transitions, reloads, and names.
+
+        The result can be passed to `ConsMDP.from_arrays` as keyword
+        arguments.
+        """
+        counts = np.diff(self.succ_offsets)
+        labels = np.empty(self.num_actions, dtype=object)
+        labels[:] = self.labels
+        return {
+            "src": np.repeat(self.action_src, counts),
+            "label": np.repeat(labels, counts),
+            "consumption": np.repeat(self.consumption, counts),
+            "successor": self.succ_states.copy(),
+            "probability": self.succ_probs.copy(),
+            "reloads": self.reload_mask.copy(),
+            "names": list(self.names),
+        }
+
+    def to_scipy(self):
+        """
+        Return transition matrices and consumption for each action label.
+
+        See `ConsMDP.to_scipy`.
+        """
+        from scipy.sparse import csr_matrix
+
+        entry_action = np.repeat(np.arange(self.num_actions),
+                                 np.diff(self.succ_offsets))
+        label_actions = {}
+        for i, l in enumerate(self.labels):
+            label_actions.setdefault(l, []).append(i)
+
+        n = self.num_states
+        matrices, consumption = {}, {}
+        for l, l_actions in label_actions.items():
+            action_mask = np.zeros(self.num_actions, dtype=bool)
+            action_mask[l_actions] = True
+            entry_mask = action_mask[entry_action]
+            rows = self.action_src[entry_action[entry_mask]]
+            matrices[l] = csr_matrix((self.succ_probs[entry_mask],
+                                      (rows, self.succ_states[entry_mask])),
+                                     shape=(n, n))
+            consumption[l] = np.zeros(n, dtype=np.int64)
+            consumption[l][self.action_src[action_mask]] = \
+                self.consumption[action_mask]
+        return matrices, consumption
+
+    def get_dot(self, options=""):
+        dwriter = consMDP2dot(self, solver=None, options=options)
+        return dwriter.get_dot()
+
+    def show(self, options=""):
+        return display(SVG(dot_to_svg(self.get_dot(options))))
+
+    def _repr_dot_(self):
+        return self.get_dot()
+
+    def _repr_svg_(self):
+        return dot_to_svg(self._repr_dot_())
 
 
 class ProductConsMDP(ConsMDP):
@@ -484,6 +1063,14 @@ class ProductConsMDP(ConsMDP):
 
         return pa_id
 
+    def _make_frozen(self, arrays):
+        return FrozenProductConsMDP(self.orig_mdp, self.other,
+                                    self.components,
+                                    self.orig_action_mapping,
+                                    self.other_action_mapping,
+                                    name=self.name, names=self.names,
+                                    **arrays)
+
     def get_state(self, orig_s, other_s):
         """
         Return state of product based on the two components `(orig_s, other_s)`
@@ -552,6 +1139,69 @@ class ProductConsMDP(ConsMDP):
         return self.other_action_mapping.get(action, None)
 
 
+class FrozenProductConsMDP(FrozenConsMDP):
+    """
+    Immutable array-backed snapshot of a ProductConsMDP.
+
+    On top of `FrozenConsMDP` it keeps the components of states and the
+    mappings of actions onto the original ConsMDP (`orig_action`) and onto
+    the other component (`other_action`). See `ProductConsMDP` for details.
+
+    Use `ProductConsMDP.freeze()` to obtain the snapshot.
+
+    Instead of the mappings of `ActionData` objects, the mappings can be
+    given by `orig_action_indices` (action index in frozen `orig_mdp` for
+    each action index, or -1) and `other_actions` (value for each action
+    index). The mappings are then filled when the actions are created
+    (see `FrozenConsMDP.action`).
+    """
+
+    def __init__(self, orig_mdp, other, components,
+                 orig_action_mapping=None, other_action_mapping=None,
+                 orig_action_indices=None, other_actions=None, **arrays):
+        super().__init__(**arrays)
+        self.orig_mdp = orig_mdp
+        self.other = other
+        self.components = tuple(components)
+        self.components_to_states_d = {pair: s for s, pair
+                                       in enumerate(self.components)}
+        self.orig_action_mapping = dict(orig_action_mapping or {})
+        self.other_action_mapping = dict(other_action_mapping or {})
+        self._orig_action_indices = orig_action_indices
+        self._other_actions = other_actions
+
+    def action(self, index):
+        """Return `ActionData` for the action with the given action index."""
+        a = self._actions[index]
+        if a is None:
+            a = super().action(index)
+            if self._orig_action_indices is not None:
+                orig_index = int(self._orig_action_indices[index])
+                if orig_index >= 0:
+                    self.orig_action_mapping[a] = \
+                        self.orig_mdp.freeze().action(orig_index)
+            if self._other_actions is not None:
+                other_action = self._other_actions[index]
+                if other_action is not None:
+                    self.other_action_mapping[a] = other_action
+        return a
+
+    def get_state(self, orig_s, other_s):
+        """
+        Return state of product based on the two components `(orig_s, other_s)`
+        if exists and `None` otherwise.
+        """
+        return self.components_to_states_d.get((orig_s, other_s), None)
+
+    def orig_action(self, action):
+        """Return ActionData from the original mdp for `action`."""
+        return self.orig_action_mapping.get(action, None)
+
+    def other_action(self, action):
+        """Return value supplied on creation of `action` (if any), or None."""
+        return self.other_action_mapping.get(action, None)
+
+
 ### Strategies ###
 class Strategy:
     """
@@ -721,12 +1371,92 @@ class CounterSelector(list):
                              f"{state}.")
         self[state][energy_level] = action
 
+    def _trusted_update(self, state, energy_level, action):
+        """
+        Variant of `update` without the check of `action` for solvers that
+        select `action` among the actions of `state`.
+        """
+        self[state][energy_level] = action
+
     def select_action(self, state, energy):
         """
         Return action selected for `state` and `energy`
         """
         return self[state].select_action(energy)
 
+    def to_rules(self):
+        """
+        Return list of triples `(state, energy_level, index)` describing the
+        selector, where `index` is the index of the action in the frozen
+        snapshot of the mdp (see `ConsMDP.freeze()`).
+
+        Unlike the selector, the triples do not refer to the mdp and can be
+        pickled and passed between processes cheaply.
+        """
+        frozen = self.mdp.freeze()
+        index = {frozen.action(i): i for i in range(frozen.num_actions)}
+        return [(state, energy, index[action])
+                for state, rule in enumerate(self)
+                for energy, action in rule.items()]
+
+    @classmethod
+    def from_rules(cls, mdp, rules):
+        """
+        Return selector for `mdp` given by triples returned by `to_rules`.
+        """
+        frozen = mdp.freeze()
+        values = [{} for _ in range(mdp.num_states)]
+        for state, energy, index in rules:
+            values[state][energy] = frozen.action(index)
+        return cls(mdp, values)
+
+    def freeze(self):
+        """
+        Return copy of the selector with read-only rules (see
+        `SelectionRule.freeze()`); the copy cannot be updated.
+        """
+        res = copy(self)
+        for i, rule in enumerate(self):
+            res[i] = rule.freeze()
+        return res
+
+    def compile(self):
+        """
+        Return `CompiledSelector` with the rules of the selector in flat
+        arrays (see `compiled.py`).
+        """
+        from .compiled import CompiledSelector
+        return CompiledSelector._compile(self.mdp, self)
+
+    def select_actions(self, states, energies):
+        """
+        Return actions selected for many pairs of `states` and `energies`
+        (sequences of the same length, e.g. one pair for each agent).
+
+        The actions are returned in a NumPy array as indices into the frozen
+        snapshot of the mdp (see `ConsMDP.freeze()`), `-1` marks pairs for
+        which no action is feasible. The selection is vectorized over the
+        rules compiled by `compile()`; they are compiled again only after
+        some selection rule changes.
+        """
+        compiled = _batch_selector(self, self.mdp)
+        return _action_ids(compiled,
+                           compiled.select_indices(states, energies))
+
+    def update_energies(self, states, actions, energies, capacity):
+        """
+        Return energies after playing `actions` (indices returned by
+        `select_actions`) in `states` with `energies` as `CounterStrategy`
+        updates its energy: it is set to `capacity` in reload states before
+        the consumption of the action is subtracted.
+        """
+        return _update_energies(self.mdp.freeze(), states, actions, energies,
+                                capacity)
+
+    def _rules(self):
+        """Return iterator over the selection rules of the selector."""
+        return iter(self)
+
     def copy_values_from(self, other, state_subset=None):
         """
         Replace values for given `state_subset` by values from `other` counter
@@ -741,6 +1471,10 @@ class CounterSelector(list):
         for s in state_subset:
             self[s] = other[s].copy()
 
+    def __setitem__(self, state, rule):
+        super().__setitem__(state, rule)
+        self._batch = None
+
     def __copy__(self):
         """Return a shallow copy of the CounterSelector"""
         res = type(self)(self.mdp)
@@ -787,6 +1521,10 @@ class ProductSelector(dict):
         self.other = product_mdp.other
         super(ProductSelector, self).__init__()
 
+    def __setitem__(self, orig_state, rules):
+        super().__setitem__(orig_state, rules)
+        self._batch = None
+
     def update(self, product_state, energy_level, product_action):
         """
         For given state of product with components `(orig, other)` update the
@@ -803,12 +1541,22 @@ class ProductSelector(dict):
         if product_action not in mdp.actions_for_state(product_state):
             raise ValueError(f"The action {product_action} is not valid for "
                              f"the state {product_state}.")
+        self._trusted_update(product_state, energy_level, product_action)
 
+    def _trusted_update(self, product_state, energy_level, product_action):
+        """
+        Variant of `update` without the check of `product_action` for
+        solvers that select it among the actions of `product_state`.
+        """
+        mdp = self.product_mdp
         orig_state, other_state = mdp.components[product_state]
         orig_action = mdp.orig_action(product_action)
         orig_selector: dict = self.setdefault(orig_state, {})
         # rule = selector[other_state][orig_state]
-        rule = orig_selector.setdefault(other_state, SelectionRule())
+        rule = orig_selector.get(other_state)
+        if rule is None:
+            rule = orig_selector[other_state] = SelectionRule()
+            self._batch = None
         rule[energy_level] = orig_action
 
     def select_action(self, orig_state, other_state, energy):
@@ -824,6 +1572,49 @@ class ProductSelector(dict):
 
         return rule.select_action(energy)
 
+    def compile(self):
+        """
+        Return `CompiledProductSelector` with the rules of the selector in
+        flat arrays indexed densely by pairs `(orig_state, other_state)`
+        (see `compiled.py`).
+        """
+        from .compiled import CompiledProductSelector
+        num_other = 1 + max((other for rules in self.values()
+                             for other in rules), default=-1)
+        rows = [self.get(orig, {}).get(other)
+                for orig in range(self.orig.num_states)
+                for other in range(num_other)]
+        return CompiledProductSelector._compile(self.orig, rows,
+                                                num_other=num_other)
+
+    def select_actions(self, orig_states, other_states, energies):
+        """
+        Return actions selected for many triples of `orig_states`,
+        `other_states`, and `energies` (sequences of the same length).
+
+        The actions of the original mdp are returned in a NumPy array as
+        indices into its frozen snapshot (see `ConsMDP.freeze()`), `-1`
+        marks triples for which no action is feasible. See
+        `CounterSelector.select_actions`; changes of the selector made other
+        than by `update`, `copy_values_from`, and changes of the selection
+        rules are not noticed.
+        """
+        compiled = _batch_selector(self, self.orig)
+        return _action_ids(compiled, compiled.select_indices(
+            orig_states, other_states, energies))
+
+    def update_energies(self, orig_states, actions, energies, capacity):
+        """
+        Return energies after playing `actions` of the original mdp in
+        `orig_states`; see `CounterSelector.update_energies`.
+        """
+        return _update_energies(self.orig.freeze(), orig_states, actions,
+                                energies, capacity)
+
+    def _rules(self):
+        """Return iterator over the selection rules of the selector."""
+        return (rule for rules in self.values() for rule in rules.values())
+
     def copy_values_from(self, other, product_state_subset=None):
         """
         Replace values by values from `other` ProductSelector.
@@ -835,6 +1626,7 @@ class ProductSelector(dict):
         if product_state_subset is None:
             product_state_subset = range(self.product_mdp.num_states)
 
+        self._batch = None
         for s in product_state_subset:
             orig_state, other_state = self.product_mdp.components[s]
             orig_selector: dict = self.setdefault(orig_state, {})
@@ -911,6 +1703,44 @@ class ProductSelectorWrapper(CounterSelector):
         p_a = super().select_action(p_s, energy)
         return self.mdp.orig_action(p_a)
 
+    def compile(self):
+        """
+        Return `CompiledProductSelector` that selects actions of the
+        original mdp for pairs `(state, other_state)` (see `compiled.py`).
+        """
+        from .compiled import CompiledProductSelector
+        mdp = self.mdp
+        num_other = 1 + max((other for p_s, (_, other)
+                             in enumerate(mdp.components) if self[p_s]),
+                            default=-1)
+        rows = []
+        for orig in range(mdp.orig_mdp.num_states):
+            for other in range(num_other):
+                p_s = mdp.get_state(orig, other)
+                rows.append(None if p_s is None else
+                            {energy: mdp.orig_action(p_a)
+                             for energy, p_a in self[p_s].items()})
+        return CompiledProductSelector._compile(mdp.orig_mdp, rows,
+                                                num_other=num_other)
+
+    def select_actions(self, states, other_states, energies):
+        """
+        Return actions of the original mdp selected for many triples of
+        `states`, `other_states`, and `energies`; see
+        `ProductSelector.select_actions`.
+        """
+        compiled = _batch_selector(self, self.mdp.orig_mdp)
+        return _action_ids(compiled, compiled.select_indices(
+            states, other_states, energies))
+
+    def update_energies(self, states, actions, energies, capacity):
+        """
+        Return energies after playing `actions` of the original mdp in
+        `states`; see `CounterSelector.update_energies`.
+        """
+        return _update_energies(self.mdp.orig_mdp.freeze(), states, actions,
+                                energies, capacity)
+
     def __copy__(self):
         """Return a shallow copy of the ProductSelectorWrapper"""
         res = ProductSelectorWrapper(self.mdp)
@@ -923,6 +1753,45 @@ class ProductSelectorWrapper(CounterSelector):
         return ProductSelectorWrapper(self.mdp, product_selector=self)
 
 
+def _batch_selector(selector, mdp):
+    """Return compiled `selector` for batch selection; compile it again if
+    some selection rule of the selector, the selector, or the structure of
+    `mdp` (whose actions it selects) has changed since.
+
+    The compiled selector is dropped (`_batch` is set to `None`) by the
+    selector when its rules are replaced and by the rules themselves when
+    they change (see `SelectionRule._watch`), so the check is cheap.
+    """
+    frozen = mdp.freeze()
+    batch = getattr(selector, "_batch", None)
+    if batch is None or batch[0] is not frozen:
+        batch = (frozen, selector.compile())
+        selector._batch = batch
+        for rule in selector._rules():
+            # Frozen rules never change
+            if isinstance(rule, SelectionRule):
+                rule._watch(selector)
+    return batch[1]
+
+
+def _action_ids(compiled, indices):
+    """Translate `indices` into the table of actions of `compiled` into
+    indices of the frozen snapshot of the mdp (keep -1)."""
+    if len(compiled.action_indices) == 0:
+        return indices
+    return np.where(indices >= 0, compiled.action_indices[indices], -1)
+
+
+def _update_energies(frozen, states, actions, energies, capacity):
+    states = np.asarray(states, dtype=np.int64)
+    actions = np.asarray(actions, dtype=np.int64)
+    if (actions < 0).any():
+        raise ValueError("Energy cannot be updated for states with no "
+                         "feasible action.")
+    energies = np.where(frozen.reload_mask[states], capacity, energies)
+    return energies - frozen.consumption[actions]
+
+
 class SelectionRule(dict):
     """
     Selection rule is a partial function: ℕ → Actions.
@@ -933,8 +1802,74 @@ class SelectionRule(dict):
 
     For dom(φ) = n₁ < n₂ < ... < n_k and energy level e the selection
     returns φ(n_i) where i is largest integer such that n_i <= e.
+
+    The lower bounds are sorted on the first selection after a change of
+    the rule and the selection uses bisection. Changes of the rule only
+    drop the sorted bounds. `freeze()` returns a read-only
+    `FrozenSelectionRule`.
     """
 
+    # Sorted lower bounds and the corresponding actions (or None if the
+    # rule has changed since the last selection)
+    _sorted = None
+    # Selectors (by their ids) whose compiled rules for `select_actions`
+    # must be dropped when the rule changes (or None)
+    _watchers = None
+
+    def _watch(self, selector):
+        """Drop the compiled rules of `selector` on the next change."""
+        if self._watchers is None:
+            self._watchers = {}
+        self._watchers[id(selector)] = selector
+
+    def _changed(self):
+        self._sorted = None
+        if self._watchers is not None:
+            for selector in self._watchers.values():
+                selector._batch = None
+            self._watchers = None
+
+    def __setitem__(self, lower_bound, action):
+        super().__setitem__(lower_bound, action)
+        self._changed()
+
+    def __delitem__(self, lower_bound):
+        super().__delitem__(lower_bound)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def pop(self, lower_bound, *args):
+        if lower_bound in self:
+            self._changed()
+        return super().pop(lower_bound, *args)
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def setdefault(self, lower_bound, action=None):
+        if lower_bound not in self:
+            self._changed()
+        return super().setdefault(lower_bound, action)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def _bounds_actions(self):
+        if self._sorted is None:
+            bounds = sorted(self)
+            self._sorted = (bounds, [self[b] for b in bounds])
+        return self._sorted
+
     def select_action(self, energy):
         """Select action for given energy level.
 
@@ -943,15 +1878,16 @@ class SelectionRule(dict):
         :raise: `NoFeasibleActionError` if no action can be selected for the
                 given `energy`
         """
-        candidate_interval, candidate_action = -1, None
-        for lower_bound, action in self.items():
-            if energy >= lower_bound > candidate_interval:
-                candidate_interval, candidate_action = lower_bound, action
-
-        if candidate_action is None:
+        bounds, actions = self._sorted or self._bounds_actions()
+        i = bisect_right(bounds, energy)
+        if i == 0:
             raise NoFeasibleActionError(f"No action is feasible for energy "
                                         f"level {energy}")
-        return candidate_action
+        return actions[i - 1]
+
+    def freeze(self):
+        """Return read-only copy of the rule (`FrozenSelectionRule`)."""
+        return FrozenSelectionRule(self)
 
     def copy(self):
         return self.__copy__()
@@ -986,6 +1922,53 @@ class SelectionRule(dict):
         return "{\n  " + records_str + "\n}"
 
 
+class FrozenSelectionRule(Mapping):
+    """
+    Read-only selection rule (see `SelectionRule`).
+
+    The lower bounds and actions are stored in sorted tuples `bounds` and
+    `actions`; `select_action` finds the interval by bisection.
+    """
+
+    __slots__ = ("bounds", "actions")
+
+    def __init__(self, rule=()):
+        items = sorted(dict(rule).items(), key=lambda item: item[0])
+        self.bounds = tuple(bound for bound, _ in items)
+        self.actions = tuple(action for _, action in items)
+
+    def select_action(self, energy):
+        """Select action for given energy level.
+
+        See `SelectionRule.select_action`.
+        """
+        i = bisect_right(self.bounds, energy)
+        if i == 0:
+            raise NoFeasibleActionError(f"No action is feasible for energy "
+                                        f"level {energy}")
+        return self.actions[i - 1]
+
+    def __getitem__(self, lower_bound):
+        i = bisect_right(self.bounds, lower_bound) - 1
+        if i < 0 or self.bounds[i] != lower_bound:
+            raise KeyError(lower_bound)
+        return self.actions[i]
+
+    def __iter__(self):
+        return iter(self.bounds)
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __reduce__(self):
+        return type(self), (dict(zip(self.bounds, self.actions)),)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    __str__ = SelectionRule.__str__
+
+
 class NoFeasibleActionError(Exception):
     pass
 
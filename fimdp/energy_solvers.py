@@ -17,8 +17,23 @@ The results of a solver for an objective `o` are twofolds:
 
 The computed values `o[s]` from 1. can be visualized in the `mdp` object by
 setting `mdp.EL=solver` and then calling `mdp.show()`.
+
+The fixpoints can be computed by different engines selected by the `engine`
+parameter of solvers:
+ * `SWEEP` (default): repeated sweeps over all states that update the values
+   one state at a time (`largest_fixpoint`).
+ * `WORKLIST`: evaluates only predecessors of states whose value changed
+   (`largest_fixpoint_worklist`). The computed values are the same as
+   with `SWEEP`.
+ * `NUMPY`: each sweep evaluates all actions at once using NumPy on the
+   frozen snapshot of the mdp (see `fimdp.vectorized`). The computed values
+   are the same as with `SWEEP`; the selectors can differ in the choice of
+   actions for intermediate levels of energy.
 """
 
+from collections import deque
+from copy import copy
+from heapq import heappop, heappush
 from math import inf
 from sys import stderr
 
@@ -27,12 +42,23 @@ from IPython.display import SVG, display
 from .objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI, \
     max_objective
 from . import dot
+from . import vectorized
 from .core import CounterSelector
 
+# Objectives that do not depend on targets
+_TARGET_INDEPENDENT = (MIN_INIT_CONS, SAFE)
+
 ### HELPER objectives ###
 _HELPER_AS_REACH = max_objective + 1
 _HELPER_BUCHI = _HELPER_AS_REACH + 1
 _OBJ_COUNT = _HELPER_BUCHI + 1
+_HELPERS = {AS_REACH: _HELPER_AS_REACH, BUCHI: _HELPER_BUCHI}
+
+### Fixpoint engines ###
+SWEEP = "sweep"
+WORKLIST = "worklist"
+NUMPY = "numpy"
+_ENGINES = (SWEEP, WORKLIST, NUMPY)
 
 # Control debug info printed after fixpoints iterations
 debug = False
@@ -47,27 +73,62 @@ class BasicES:
 
     Parameters
     ==========
-     * mdp: `ConsMDP` object
+     * mdp: `ConsMDP` object or its frozen snapshot (see `ConsMDP.freeze()`)
      * cap: `int`; energy capacity for given objective
      * targets: `iterable`; states of `mdp` that are targets for the objectives.
+     * engine: `SWEEP` (default), `WORKLIST`, or `NUMPY`; engine that computes
+       the fixpoints
+
+    Set the attribute `cache` to a `fimdp.cache.ResultCache` to reuse results
+    stored on disk by other solvers for the same task.
+
+    Set the attribute `lazy_selectors` to `True` to compute only the minimal
+    levels. The selector for an objective is then built when it is first
+    requested by `get_selector`, by repeating only the last round of the
+    computation of the objective (with the final set of removed reloads and
+    the final helper levels). This saves the memory of selectors and the
+    time of selectors that are never requested; for objectives computed in
+    a single round, requesting the selector repeats the computation.
     """
 
-    def __init__(self, mdp, cap, targets):
+    def __init__(self, mdp, cap, targets, engine=SWEEP):
+        if engine not in _ENGINES:
+            raise ValueError(f"Unknown engine {engine}. Use one of {_ENGINES}.")
+
         self.mdp         = mdp
         self.states      = mdp.num_states
         self.cap         = cap
         self.targets     = targets
+        self.engine      = engine
 
         self.min_levels = {}
         self.helper_levels = {}
 
-        # reloads
-        self.is_reload  = lambda x: self.mdp.is_reload(x)
-
         # Selector's setup
         self.strategy = {}
         self.SelectorClass = CounterSelector
 
+        # On-disk cache of results (`fimdp.cache.ResultCache`) or None
+        self.cache = None
+
+        # Build selectors only on request (see `_build_selector`)
+        self.lazy_selectors = False
+        self._replaying = False
+        # Reloads removed in the last round of computation of objectives
+        self._last_removed = {}
+
+        # (objective, state, energy) while `is_satisfiable` runs
+        self._query = None
+
+        # Fixpoint functions of the engine (NUMPY uses them only where
+        # no vectorized variant exists)
+        if engine == WORKLIST:
+            self._largest_fixpoint = largest_fixpoint_worklist
+            self._least_fixpoint = least_fixpoint_worklist
+        else:
+            self._largest_fixpoint = largest_fixpoint
+            self._least_fixpoint = least_fixpoint
+
         # HOOKS
         # Hooks that enable creation of heuristic-based child classes.
         # IMPORTANT: these are only used in reachability objectives,
@@ -76,7 +137,11 @@ class BasicES:
         # Initialization of argmin function for fixpoint computations.
         self.argmin = argmin
         # Function that computes largest fixpoint
-        self.largest_fixpoint = largest_fixpoint
+        self.largest_fixpoint = self._largest_fixpoint
+
+    def is_reload(self, s):
+        """Return `True` if `s` is a reload state of `self.mdp`."""
+        return self.mdp.is_reload(s)
 
     ### Helper functions ###
     # * reload_capper     : [v]^cap
@@ -200,20 +265,8 @@ class BasicES:
             for s in range(self.states):
                 values[s] = init_val(s)
 
-            # Mitigate reload removal
-            zero_cond = lambda x: self.is_reload(x) and x not in removed
-            rem_action_value = lambda a, v: self._action_value(a, v, zero_cond)
-
-            # Removed reloads are skipped
-            skip_cond = lambda x: x in removed # Improve performance only
-            # Over capacity values -> ∞
-            cap = lambda s, v: inf if v > self.cap else v
-
-            largest_fixpoint(self, values,
-                             rem_action_value,
-                             value_adj=cap,
-                             skip_state=skip_cond,
-                             on_update=self._update_function(objective))
+            self._cons_fixpoint(values, objective, removed)
+            self._query_round(objective, values)
 
             done = True
             # Iterate over reloads and remove unusable ones (∞)
@@ -222,18 +275,97 @@ class BasicES:
                     if s not in removed:
                         removed.add(s)
                         done = False
+        self._last_removed[objective] = set(removed)
 
         # Set reload values to 0, "< & +1"-trick to handle ∞
         for s in range(self.states):
                 if self.mdp.is_reload(s) and values[s] < self.cap+1:
                     values[s] = 0
 
+    def _cons_fixpoint(self, values, objective, removed=None):
+        """Largest fixpoint of `_action_value` with values above capacity
+        set to ∞.
+
+        Reloads in `removed` are treated as normal states and their values
+        are not changed. Updates the strategy for `objective`.
+        """
+        on_update = self._update_function(objective)
+        if removed is None:
+            removed = set()
+
+        if self.engine == NUMPY:
+            vectorized.cons_fixpoint(self.mdp.freeze(), values, self.cap,
+                                     removed=removed, on_update=on_update)
+            return
+
+        # Mitigate reload removal
+        zero_cond = lambda x: self.is_reload(x) and x not in removed
+        rem_action_value = lambda a, v: self._action_value(a, v, zero_cond)
+
+        # Removed reloads are skipped
+        skip_cond = lambda x: x in removed # Improve performance only
+        # Over capacity values -> ∞
+        cap = lambda s, v: inf if v > self.cap else v
+
+        self._largest_fixpoint(self, values,
+                               rem_action_value,
+                               value_adj=cap,
+                               skip_state=skip_cond,
+                               on_update=on_update)
+
+    def _reach_fixpoint(self, values, survival, objective, removed=None):
+        """Largest fixpoint of `_action_value_T` that navigates towards
+        targets and survives with `survival` levels.
+
+        Targets and reloads in `removed` keep their values. Reloads get
+        value 0 and values above capacity are set to ∞ (`_reload_capper`).
+        Updates the strategy for `objective`.
+        """
+        on_update = self._update_function(objective)
+        if removed is None:
+            removed = set()
+
+        if self.engine == NUMPY:
+            self._reach_fixpoint_np(values, survival, removed, on_update)
+            return
+
+        # Use survival values for the other successors
+        survival_val = lambda s: survival[s]
+        action_value = lambda a, v: self._action_value_T(a, v, survival_val)
+
+        # Avoid unnecessary computations
+        is_removed = lambda x: x in removed  # always ∞
+        is_target = lambda x: x in self.targets  # always survival
+        skip_cond = lambda x: is_removed(x) or is_target(x)
+
+        self.largest_fixpoint(self, values,
+                              action_value,
+                              value_adj=self._reload_capper,
+                              skip_state=skip_cond,
+                              on_update=on_update,
+                              argmin=self.argmin)
+
+    def _reach_fixpoint_np(self, values, survival, removed, on_update):
+        """NumPy variant of `_reach_fixpoint`."""
+        vectorized.reach_fixpoint(self.mdp.freeze(), values, survival,
+                                  self.cap,
+                                  skip=removed.union(self.targets),
+                                  on_update=on_update)
+
+    def _records_strategy(self):
+        """Return `True` if the fixpoints should update the strategies."""
+        return not self.lazy_selectors or self._replaying
+
     def _init_strategy(self, objective):
         """Initialize strategy for given objective to be empty.
 
         The empty strategy is a list with an empty dict for each state.
+        With `lazy_selectors`, only drop the old strategy.
         """
         self._check_objective(objective, True)
+        if not self._records_strategy():
+            self.strategy.pop(objective, None)
+            return
         self.strategy[objective] = self.SelectorClass(self.mdp)
 
     def _copy_strategy(self, source, to, state_set=None):
@@ -251,6 +383,8 @@ class BasicES:
 
         self._check_objective(source, helper=True)
         self._check_objective(to)
+        if not self._records_strategy():
+            return
 
         self.strategy[to].copy_values_from(self.strategy[source], state_set)
 
@@ -258,15 +392,55 @@ class BasicES:
         """Return update function for given objective.
 
         Returns function that should be passed to `largest_fixpoint` to
-        update strategy for given objective.
+        update strategy for given objective. The fixpoints pass only actions
+        of the updated states, so the selectors are updated without checks
+        (if they offer `_trusted_update`).
         """
         self._check_objective(objective, helper=True)
 
+        if not self._records_strategy():
+            def update(s, e, a):
+                if self._query is not None:
+                    self._query_update(objective, s, e)
+            return update
+
         def update(s, e, a):
-            self.strategy[objective].update(s, e, a)
+            selector = self.strategy[objective]
+            getattr(selector, "_trusted_update", selector.update)(s, e, a)
+            if self._query is not None:
+                self._query_update(objective, s, e)
 
         return update
 
+    def _query_update(self, objective, s, v):
+        """Decide the running `is_satisfiable` query if the value of its
+        state dropped to its energy in a single largest fixpoint.
+
+        The values of MIN_INIT_CONS and POS_REACH are computed by a single
+        largest fixpoint, their values only decrease.
+        """
+        query_objective, state, energy = self._query
+        if objective == query_objective and s == state and v <= energy and \
+                objective in (MIN_INIT_CONS, POS_REACH):
+            raise _Decided(True)
+
+    def _query_round(self, objective, values):
+        """Decide the running `is_satisfiable` query if the value of its
+        state after a round of reload removal is above its energy.
+
+        Each round removes more reloads and thus the values of later rounds
+        can only be higher.
+        """
+        if self._query is None or objective != self._query[0]:
+            return
+        _, state, energy = self._query
+        value = values[state]
+        # "+1"-trick handles cap = ∞
+        if self.is_reload(state) and value < self.cap+1:
+            value = 0
+        if value > energy:
+            raise _Decided(False)
+
     ### Functions for running the computations for objectives ###
     # * _minInitCons
     # * _safe
@@ -283,12 +457,8 @@ class BasicES:
         self._init_strategy(MIN_INIT_CONS)
 
         self.min_levels[MIN_INIT_CONS] = [inf] * self.states
-        cap = lambda s, v: inf if v > self.cap else v
-        largest_fixpoint(self,
-                         self.min_levels[MIN_INIT_CONS],
-                         self._action_value,
-                         value_adj=cap,
-                         on_update=self._update_function(MIN_INIT_CONS))
+        self._cons_fixpoint(self.min_levels[MIN_INIT_CONS], MIN_INIT_CONS)
+        self._last_removed[MIN_INIT_CONS] = set()
 
     def _safe(self):
         """
@@ -335,13 +505,10 @@ class BasicES:
         for t in self.targets:
             self.min_levels[POS_REACH][t] = self.min_levels[SAFE][t]
 
-        self.largest_fixpoint(self, self.min_levels[POS_REACH],
-                         self._action_value_T,
-                         value_adj=self._reload_capper,
-                         # Target states are always min_levels[SAFE][t]
-                         skip_state=lambda x: x in self.targets,
-                         on_update=self._update_function(objective),
-                         argmin=self.argmin)
+        # Target states are always min_levels[SAFE][t]
+        self._reach_fixpoint(self.min_levels[POS_REACH],
+                             self.min_levels[SAFE], objective)
+        self._last_removed[objective] = set()
 
         self._copy_strategy(SAFE, objective, self.targets)
 
@@ -409,21 +576,10 @@ class BasicES:
 
             ### 2.1.3 Compute PosReach on sub-MDP
             # Mitigate reload removal (use Safe_M for survival)
-            rem_survival_val = lambda s: self.helper_levels[AS_REACH][s]
-            rem_action_value = lambda a, v: self._action_value_T(a, v, survival_val=rem_survival_val)
-
-            # Avoid unnecessary computations
-            is_removed = lambda x: x in removed  # always ∞
-            is_target = lambda x: x in self.targets  # always Safe
-            skip_cond = lambda x: is_removed(x) or is_target(x)
-
-            ## Finish the fixpoint
-            self.largest_fixpoint(self, self.min_levels[AS_REACH],
-                             rem_action_value,
-                             value_adj=self._reload_capper,
-                             skip_state=skip_cond,
-                             on_update=self._update_function(objective),
-                             argmin=self.argmin)
+            self._reach_fixpoint(self.min_levels[AS_REACH],
+                                 self.helper_levels[AS_REACH],
+                                 objective, removed)
+            self._query_round(objective, self.min_levels[AS_REACH])
 
             ### 2.2. & 2.3. Detect bad reloads and remove them
             done = True
@@ -435,6 +591,7 @@ class BasicES:
                         done = False
 
             self._copy_strategy(SAFE, objective, self.targets)
+        self._last_removed[objective] = removed
 
     def _buchi(self):
         """
@@ -491,22 +648,11 @@ class BasicES:
             ### 1.3. Computation of PosReach on sub-MDP (with removed reloads)
             ## how much do I need to survive via this state after reloads removal
             # Use Safe_m (stored in helper_levels[BUCHI]) as value needed for survival
-            rem_survival_val = lambda s: self.helper_levels[BUCHI][s]
-            # Navigate towards T and survive with Safe_m
-            rem_action_value = lambda a, v: self._action_value_T(a, v, survival_val=rem_survival_val)
-
-            ## Avoid unnecessary computations
-            is_removed = lambda x: x in removed  # always ∞
-            is_target = lambda x: x in self.targets  # always Safe_M
-            skip_cond = lambda x: is_removed(x) or is_target(x)
-
-            ## Finish the fixpoint
-            self.largest_fixpoint(self, self.min_levels[BUCHI],
-                                  rem_action_value,
-                                  value_adj=self._reload_capper,
-                                  skip_state=skip_cond,
-                                  on_update=self._update_function(BUCHI),
-                                  argmin=self.argmin)
+            # and navigate towards T
+            self._reach_fixpoint(self.min_levels[BUCHI],
+                                 self.helper_levels[BUCHI],
+                                 objective, removed)
+            self._query_round(objective, self.min_levels[BUCHI])
 
             ### 2. & 3. Detect bad reloads and remove them
             done = True
@@ -518,6 +664,7 @@ class BasicES:
                         done = False
 
             self._copy_strategy(_HELPER_BUCHI, BUCHI, self.targets)
+        self._last_removed[objective] = removed
 
 
     def _check_objective(self, objective, helper=False):
@@ -530,6 +677,9 @@ class BasicES:
     # * compute
     # * get_min_levels
     # * get_selector
+    # * is_satisfiable
+    # * for_targets
+    # * solve_many
     def compute(self, objective):
         self._check_objective(objective)
         func_dict = {
@@ -553,7 +703,7 @@ class BasicES:
         """
         self._check_objective(objective)
         if recompute or objective not in self.min_levels:
-            self.compute(objective)
+            self._compute_or_load(objective, recompute)
 
         return self.min_levels[objective]
 
@@ -566,10 +716,154 @@ class BasicES:
         `recompute` : if `True` forces all computations to be done again
         """
         self._check_objective(objective)
-        if recompute or objective not in self.strategy:
-            self.compute(objective)
+        if recompute or objective not in self.min_levels:
+            self._compute_or_load(objective, recompute)
+        if objective not in self.strategy:
+            self._build_selector(objective)
         return self.strategy[objective]
 
+    def is_satisfiable(self, objective, state, energy):
+        """Return `True` if `objective` can be satisfied from `state` with
+        initial load `energy`, i.e. if `get_min_levels(objective)[state]`
+        is at most `energy`.
+
+        Unless the levels for `objective` are already known, the computation
+        stops as soon as the answer is known:
+         * MIN_INIT_CONS and POS_REACH are computed by largest fixpoints
+           whose values only decrease; the answer is `True` as soon as the
+           value of `state` drops to `energy`.
+         * SAFE, AS_REACH, and BUCHI remove reloads in rounds; the answer is
+           `False` as soon as some round ends with the value of `state` above
+           `energy`.
+         * POS_REACH and AS_REACH are `False` if SAFE is above `energy` and
+           equal to SAFE for targets.
+
+        Results of interrupted computations are discarded.
+        """
+        self._check_objective(objective)
+        if objective not in self.min_levels and self.cache is not None:
+            self.cache.load(self, objective)
+        if objective in self.min_levels:
+            return self.min_levels[objective][state] <= energy
+
+        if objective in (POS_REACH, AS_REACH):
+            safe = self.get_min_levels(SAFE)[state]
+            if safe > energy or state in self.targets:
+                return safe <= energy
+
+        self._query = (objective, state, energy)
+        try:
+            self.compute(objective)
+        except _Decided as decision:
+            for obj in (objective, _HELPERS.get(objective)):
+                self.min_levels.pop(obj, None)
+                self.helper_levels.pop(obj, None)
+                self.strategy.pop(obj, None)
+            return decision.result
+        finally:
+            self._query = None
+        return self.min_levels[objective][state] <= energy
+
+    def for_targets(self, targets):
+        """Return solver for the same mdp and capacity with new `targets`.
+
+        The returned solver is of the same class and with the same parameters
+        (and hooks) as `self`. The results of MIN_INIT_CONS and SAFE, which do
+        not depend on targets, are shared with `self` (SAFE is computed first
+        if needed) and only the objectives that depend on targets are
+        computed by the new solver.
+        """
+        if SAFE not in self.min_levels:
+            self.get_min_levels(SAFE)
+
+        solver = copy(self)
+        solver.targets = targets
+        solver.min_levels = {o: self.min_levels[o] for o in _TARGET_INDEPENDENT
+                             if o in self.min_levels}
+        solver.strategy = {o: self.strategy[o] for o in _TARGET_INDEPENDENT
+                           if o in self.strategy}
+        solver._last_removed = {o: self._last_removed[o]
+                                for o in _TARGET_INDEPENDENT
+                                if o in self._last_removed}
+        solver.helper_levels = {}
+
+        # Hooks bound to `self` should work with the new solver
+        for name, value in vars(solver).items():
+            if getattr(value, "__self__", None) is self:
+                setattr(solver, name, getattr(solver, value.__name__))
+        return solver
+
+    def solve_many(self, targets_list, objective):
+        """Solve `objective` for each set of targets in `targets_list`.
+
+        Return a list of solvers (see `for_targets`) with `objective`
+        computed, one for each set of targets. The values of SAFE are
+        computed only once and shared by all the solvers.
+        """
+        solvers = [self.for_targets(targets) for targets in targets_list]
+        for solver in solvers:
+            solver.get_min_levels(objective)
+        return solvers
+
+    def _build_selector(self, objective):
+        """Build the selector for `objective` whose minimal levels are
+        known (with `lazy_selectors` or loaded from cache without selectors).
+
+        Repeat the last round of the computation of the objective, which
+        starts from the final helper levels and the final set of removed
+        reloads, so that the fixpoint reports exactly the updates of the
+        selector in the full computation. The selectors cannot be derived
+        from the final levels alone: ties among actions (through reloads or
+        cycles of actions with no consumption) could select actions that
+        never make progress towards targets. If the last round is not known
+        (the objective is computed by an overridden method), compute the
+        objective again.
+        """
+        if objective in (POS_REACH, AS_REACH):
+            # Strategy for targets
+            self.get_selector(SAFE)
+
+        self._replaying = True
+        try:
+            removed = self._last_removed.get(objective)
+            if removed is None:
+                self.compute(objective)
+                return
+
+            if objective in (MIN_INIT_CONS, SAFE, BUCHI):
+                cons_objective = _HELPERS.get(objective, objective)
+                self._init_strategy(cons_objective)
+                self._cons_fixpoint([inf] * self.states, cons_objective,
+                                    set(removed))
+                if objective != BUCHI:
+                    return
+
+            survival = {POS_REACH: self.min_levels.get(SAFE),
+                        AS_REACH: self.helper_levels.get(AS_REACH),
+                        BUCHI: self.helper_levels.get(BUCHI)}[objective]
+            target_levels = self.min_levels[SAFE] if objective != BUCHI \
+                else survival
+            values = [inf] * self.states
+            for t in self.targets:
+                values[t] = target_levels[t]
+
+            self._init_strategy(objective)
+            self._reach_fixpoint(values, survival, objective, set(removed))
+            source = _HELPER_BUCHI if objective == BUCHI else SAFE
+            self._copy_strategy(source, objective, self.targets)
+        finally:
+            self._replaying = False
+
+    def _compute_or_load(self, objective, recompute=False):
+        """Load results for `objective` from `self.cache` if possible,
+        compute them (and store them in the cache) otherwise."""
+        if self.cache is None:
+            self.compute(objective)
+            return
+        if recompute or not self.cache.load(self, objective):
+            self.compute(objective)
+            self.cache.store(self, objective)
+
     def _get_dot(self, options=""):
         dot_writer = dot.consMDP2dot(mdp=self.mdp,
                                      solver=self,
@@ -618,10 +912,12 @@ class GoalLeaningES(BasicES):
      * threshold: `float`, default 0; a probability treshold.
                   Successor less likely then `treshold` will be ignored
                   in the first fixpoint.
+     * engine: `SWEEP` (default), `WORKLIST`, or `NUMPY`; engine that computes
+       the fixpoints
     """
 
-    def __init__(self, mdp, cap, targets=None, threshold=0):
-        super().__init__(mdp=mdp, cap=cap, targets=targets)
+    def __init__(self, mdp, cap, targets=None, threshold=0, engine=SWEEP):
+        super().__init__(mdp=mdp, cap=cap, targets=targets, engine=engine)
         self.threshold = threshold
         self.argmin = pick_best_action
         self.largest_fixpoint = self.double_fixpoint
@@ -690,14 +986,27 @@ class GoalLeaningES(BasicES):
 
     def double_fixpoint(self, *args, **kwargs):
         # First fixpoint using threshold
-        largest_fixpoint(*args, **kwargs)
+        self._largest_fixpoint(*args, **kwargs)
 
         # Second fixpoint with threshold=0
         if self.threshold > 0:
             threshold = self.threshold # remember original value
             self.threshold = 0
-            largest_fixpoint(*args, **kwargs)
-            self.threshold = threshold
+            try:
+                self._largest_fixpoint(*args, **kwargs)
+            finally:
+                self.threshold = threshold
+
+    def _reach_fixpoint_np(self, values, survival, removed, on_update):
+        """NumPy variant of `_reach_fixpoint` with the 2-shot fixpoint."""
+        thresholds = [self.threshold, 0] if self.threshold > 0 else [0]
+        for threshold in thresholds:
+            vectorized.reach_fixpoint(self.mdp.freeze(), values, survival,
+                                      self.cap,
+                                      skip=removed.union(self.targets),
+                                      on_update=on_update,
+                                      threshold=threshold,
+                                      prefer_likely=True)
 
 
 class LeastFixpointES(BasicES):
@@ -723,9 +1032,9 @@ class LeastFixpointES(BasicES):
 
         action_value = lambda a, values: self._action_value(a, values, zero_c)
 
-        least_fixpoint(self, self.min_levels[SAFE],
-                       action_value,
-                       value_adj=cap)
+        self._least_fixpoint(self, self.min_levels[SAFE],
+                             action_value,
+                             value_adj=cap)
 
         # Set the value of Safe to 0 for all good reloads
         for s in range(self.states):
@@ -733,6 +1042,62 @@ class LeastFixpointES(BasicES):
                 self.min_levels[SAFE][s] = 0
 
 
+class LabelSettingES(BasicES):
+    """Solver that computes MIN_INIT_CONS and SAFE by a label-setting algorithm.
+
+    The values of MIN_INIT_CONS (and of each round of SAFE computation) are
+    minima over actions of the consumption plus the maximum over the values
+    of successors. This is a shortest-path problem in an AND-OR graph that
+    can be solved by Knuth's generalization of Dijkstra's algorithm where
+    each state is finalized exactly once. The states wait in buckets of
+    their levels of energy (as in Dial's algorithm) and a heap orders the
+    levels that occur, so the worst case complexity is
+    ``O(|E| + |S| log |S|)`` per round of reload removal (instead of
+    ``|S|^2`` for the largest fixpoint); ``|E|`` is the number of pairs
+    action–successor.
+
+    The label-setting computation finds the levels but not the chains of
+    rules that the sweeps of `BasicES` record. The selectors are therefore
+    always built on request as with `lazy_selectors`: by repeating the last
+    round of each objective with the fixpoints of `BasicES`. They are the
+    same as the selectors of `BasicES`.
+
+    The reachability objectives are computed as in `BasicES` (using the
+    fixpoint engine given by `engine`).
+    """
+
+    def _records_strategy(self):
+        """Record strategies only when `get_selector` builds them."""
+        return self._replaying
+
+    def _cons_fixpoint(self, values, objective, removed=None):
+        """Compute the values of `_cons_fixpoint` by `label_setting_fixpoint`
+        (by the fixpoint of `BasicES` when building selectors)."""
+        if self._replaying:
+            super()._cons_fixpoint(values, objective, removed)
+            return
+
+        on_update = self._update_function(objective)
+        if removed is None:
+            removed = set()
+
+        zero_cond = lambda x: self.is_reload(x) and x not in removed
+        skip_cond = lambda x: x in removed
+
+        label_setting_fixpoint(self, values,
+                               zero_cond=zero_cond,
+                               skip_state=skip_cond,
+                               on_update=on_update)
+
+
+class _Decided(Exception):
+    """Stops computation when the answer of `is_satisfiable` is known."""
+
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+
 ### argmin-style functions
 # argmin
 # pick_best_action
@@ -930,3 +1295,190 @@ def least_fixpoint(solver, values, action_value,
             if candidate_v > current_v:
                 values[s] = candidate_v
                 iterate = True
+
+
+def largest_fixpoint_worklist(solver, values, action_value,
+                              value_adj=lambda s, v: v,
+                              skip_state=lambda x: False,
+                              on_update=lambda s, v, a: None,
+                              argmin=argmin):
+    """Worklist variant of `largest_fixpoint` with the same parameters.
+
+    Instead of repeated sweeps over all states, only predecessors (see
+    `ConsMDP.predecessors`) of states whose value decreased are evaluated
+    again. The states wait for evaluation in a FIFO queue that initially
+    contains all states (in the order of their ids). The computed fixpoint
+    is the same as with `largest_fixpoint`.
+
+    `action_value` must depend only on the values of successors of the
+    action (and `value_adj` only on the state and the candidate value).
+    """
+    mdp = solver.mdp
+    states = len(values)
+    act_value = lambda a: action_value(a, values)
+
+    queue = deque(s for s in range(states) if not skip_state(s))
+    queued = [False] * states
+    for s in queue:
+        queued[s] = True
+
+    c = 0
+    while queue:
+        s = queue.popleft()
+        queued[s] = False
+        c += 1
+
+        current_v = values[s]
+        actions = mdp.actions_for_state(s)
+
+        # candidate_v is the minimum over action values
+        candidate_a, candidate_v = argmin(actions, act_value)
+
+        # apply value_adj (capacity, reloads, ...)
+        candidate_v = value_adj(s, candidate_v)
+
+        # check for decrease in value and schedule predecessors
+        if candidate_v < current_v:
+            values[s] = candidate_v
+            on_update(s, candidate_v, candidate_a)
+            for p in mdp.predecessors(s):
+                if not queued[p] and not skip_state(p):
+                    queued[p] = True
+                    queue.append(p)
+
+    if debug: print(f"{c} evaluations\t:{values}", file=stderr)
+
+
+def least_fixpoint_worklist(solver, values, action_value,
+                            value_adj=lambda s, v: v,
+                            skip_state=None):
+    """Worklist variant of `least_fixpoint` with the same parameters.
+
+    Only predecessors of states whose value increased are evaluated again.
+    See `largest_fixpoint_worklist` for details.
+    """
+    mdp = solver.mdp
+    if skip_state is None:
+        skip_state = lambda x: values[x] == inf
+
+    states = len(values)
+    act_value = lambda a: action_value(a, values)
+
+    queue = deque(range(states))
+    queued = [True] * states
+
+    c = 0
+    while queue:
+        s = queue.popleft()
+        queued[s] = False
+        if skip_state(s):
+            continue
+        c += 1
+
+        current_v = values[s]
+        actions = mdp.actions_for_state(s)
+        # candidate_v is now the minimum over action values
+        candidate_v = min([act_value(a) for a in actions])
+
+        # apply value_adj (capacity, reloads, ...)
+        candidate_v = value_adj(s, candidate_v)
+
+        # least fixpoint increases only
+        if candidate_v > current_v:
+            values[s] = candidate_v
+            for p in mdp.predecessors(s):
+                if not queued[p]:
+                    queued[p] = True
+                    queue.append(p)
+
+    if debug: print(f"{c} evaluations\t:{values}", file=stderr)
+
+
+def label_setting_fixpoint(solver, values, zero_cond,
+                           skip_state=lambda x: False,
+                           on_update=lambda s, v, a: None):
+    """Label-setting computation of the largest fixpoint of `_action_value`.
+
+    Computes the same values as `largest_fixpoint` with the action value
+    `BasicES._action_value(a, values, zero_cond)` and with values above
+    `solver.cap` set to ∞. Values should be properly initialized (to ∞ or
+    some other value) before calling; values of states in `skip_state` are
+    not changed.
+
+    The states are finalized in the order of increasing values using
+    buckets of states keyed by levels of energy and a heap of the levels
+    with non-empty buckets; the levels need not be small nor integers.
+    Each action counts its
+    successors (except those in `zero_cond`) that are not finalized yet.
+    When the count drops to 0, the action is ready and its value is
+    its consumption plus the value of the last finalized successor.
+    `on_update` is called only once for each state whose value decreased,
+    with its final value and the first ready action that achieves it.
+    """
+    mdp = solver.mdp
+    cap = solver.cap
+    states = len(values)
+
+    # For each action count successors that need to be finalized and
+    # remember which actions wait for each state.
+    actions, waiting = [], []
+    watchers = [[] for _ in range(states)]
+    for s in range(states):
+        if skip_state(s):
+            continue
+        for a in mdp.actions_for_state(s):
+            succs = [t for t in a.distr if not zero_cond(t)]
+            for t in succs:
+                watchers[t].append(len(actions))
+            actions.append(a)
+            waiting.append(len(succs))
+
+    # Tentative values; the actions that achieved them (None for initial)
+    best_v = list(values)
+    best_a = [None] * states
+    finalized = [False] * states
+    buckets, levels = {}, []
+
+    def push(s, v):
+        bucket = buckets.get(v)
+        if bucket is None:
+            bucket = buckets[v] = []
+            heappush(levels, v)
+        bucket.append(s)
+
+    def relax(a, v):
+        s = a.src
+        # "+1"-trick handles cap = ∞
+        if finalized[s] or v >= cap + 1 or v >= best_v[s]:
+            return
+        best_v[s], best_a[s] = v, a
+        push(s, v)
+
+    for s in range(states):
+        if best_v[s] < inf:
+            push(s, best_v[s])
+    for i, a in enumerate(actions):
+        if waiting[i] == 0:
+            relax(a, a.cons)
+
+    rounds = 0
+    while levels:
+        level = heappop(levels)
+        bucket = buckets[level]
+        rounds += 1
+        # states pushed to the current level are appended to `bucket`
+        for s in bucket:
+            if finalized[s] or best_v[s] != level:
+                continue
+            finalized[s] = True
+            if best_a[s] is not None:
+                values[s] = level
+                on_update(s, level, best_a[s])
+            for i in watchers[s]:
+                waiting[i] -= 1
+                if waiting[i] == 0:
+                    a = actions[i]
+                    relax(a, a.cons + level)
+        del buckets[level]
+
+    if debug: print(f"levels {rounds}\t:{values}", file=stderr)
@@ -1,9 +1,189 @@
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+from collections.abc import Mapping, Sequence
+from math import inf
+from operator import index
+
+import numpy as np
+
+from .core import ConsMDP, ProductConsMDP
+from .energy_solvers import BasicES
+from .objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+
+
+class EnergyProductConsMDP(ProductConsMDP):
+    """Product of a ConsMDP with levels of energy (see `product_energy`).
+
+    States of the product are pairs `(s, e)` of a state `s` of `orig_mdp`
+    and an energy level `0 <= e <= capacity` (stored as `other`). Instead of
+    tuples and dictionaries, the pairs are stored in arrays:
+     * the product state of `(s, e)` is at index `s * (capacity + 1) + e`
+       of a preallocated array (-1 for pairs without a state),
+     * the components `s` and `e` of each product state are stored in two
+       arrays of integers; `components` is a read-only view of them.
+
+    Names of states are `"s,e"` by default and are created only when
+    accessed. Pairs of other forms (like the sink `(-1, "-∞")`) are stored
+    separately, and so are all pairs if `capacity` is infinite (the energy
+    is then `inf` in all states). Capacity must be an integer (including
+    integers of NumPy) or `inf`.
+    """
+
+    def __init__(self, orig_mdp, capacity):
+        if capacity != inf:
+            try:
+                capacity = index(capacity)
+            except TypeError:
+                raise ValueError(f"Capacity must be an integer or inf, "
+                                 f"{capacity!r} was given.") from None
+        # Skip ProductConsMDP's constructor; components are stored in arrays
+        ConsMDP.__init__(self)
+        self.orig_mdp = orig_mdp
+        self.other = capacity
+        self.orig_action_mapping = {}
+        self.other_action_mapping = {}
+
+        self.capacity = capacity
+        # A list (rather than an array) shares the `int` objects of states
+        # with successors in distributions.
+        self._index = [] if capacity == inf else \
+            [-1] * (orig_mdp.num_states * (capacity + 1))
+        self._orig_states = array("q")
+        self._energies = array("q")
+        self._special = {}
+        self._special_index = {}
+        self.components = _EnergyComponents(self)
+        self.components_to_states_d = _EnergyStateIndex(self)
+        self.names = _EnergyNames(self)
+
+    def _position(self, orig_s, other_s):
+        """Return index of `(orig_s, other_s)` in `_index` or `None`."""
+        if self.capacity == inf:
+            return None
+        try:
+            orig_s, other_s = index(orig_s), index(other_s)
+        except TypeError:
+            return None
+        if 0 <= orig_s < self.orig_mdp.num_states and \
+                0 <= other_s <= self.capacity:
+            return orig_s * (self.capacity + 1) + other_s
+        return None
+
+    def get_state(self, orig_s, other_s):
+        """
+        Return state of product based on the two components `(orig_s, other_s)`
+        if exists and `None` otherwise.
+        """
+        position = self._position(orig_s, other_s)
+        if position is None:
+            return self._special_index.get((orig_s, other_s), None)
+        state = self._index[position]
+        return None if state < 0 else state
+
+    def new_state(self, orig_s, other_s, reload=False, name=None):
+        """
+        Create a new product state (orig_s, other_s).
+
+        The name of the state is `orig_s,other_s` unless `name` is given.
+        """
+        new_id = ConsMDP.new_state(self, reload=reload, name=name)
+
+        position = self._position(orig_s, other_s)
+        if position is None:
+            self._special[new_id] = (orig_s, other_s)
+            self._special_index[(orig_s, other_s)] = new_id
+            orig_s, other_s = -1, -1
+        else:
+            self._index[position] = new_id
+        self._orig_states.append(orig_s)
+        self._energies.append(other_s)
+
+        return new_id
+
+    def state_with_name(self, name):
+        """Return id of state with name `name` or `None` if not exists."""
+        state = self.names_dict.get(name)
+        if state is not None or not isinstance(name, str):
+            return state
+        orig_s, sep, other_s = name.partition(",")
+        if not sep or not orig_s.isdigit() or not other_s.isdigit():
+            return None
+        state = self.get_state(int(orig_s), int(other_s))
+        if state is not None and self.names._custom[state] is None:
+            return state
+        return None
+
+
+class _EnergyComponents(Sequence):
+    """Read-only sequence of components of states of `EnergyProductConsMDP`."""
+
+    def __init__(self, product):
+        self._product = product
+
+    def __len__(self):
+        return self._product.num_states
+
+    def __getitem__(self, state):
+        if isinstance(state, slice):
+            return [self[s] for s in range(len(self))[state]]
+        product = self._product
+        if state < 0:
+            state += len(self)
+        if state in product._special:
+            return product._special[state]
+        return product._orig_states[state], product._energies[state]
+
+
+class _EnergyStateIndex(Mapping):
+    """Read-only mapping from components to states of
+    `EnergyProductConsMDP` (resolved by `get_state`)."""
+
+    def __init__(self, product):
+        self._product = product
+
+    def __getitem__(self, pair):
+        state = self._product.get_state(*pair)
+        if state is None:
+            raise KeyError(pair)
+        return state
+
+    def __iter__(self):
+        return iter(self._product.components)
+
+    def __len__(self):
+        return self._product.num_states
+
+
+class _EnergyNames(Sequence):
+    """Names of states of `EnergyProductConsMDP` created on access.
+
+    Only names given explicitly are stored.
+    """
+
+    def __init__(self, product):
+        self._product = product
+        self._custom = []
 
-from .core import ProductConsMDP
+    def __len__(self):
+        return len(self._custom)
 
+    def __getitem__(self, state):
+        if isinstance(state, slice):
+            return [self[s] for s in range(len(self))[state]]
+        name = self._custom[state]
+        if name is None:
+            orig_s, other_s = self._product.components[state]
+            name = f"{orig_s},{other_s}"
+        return name
 
-def product_energy(cmdp, capacity, targets=[]):
+    def __setitem__(self, state, name):
+        self._custom[state] = name
+
+    def append(self, name):
+        self._custom.append(name)
+
+
+def product_energy(cmdp, capacity, targets=[], init_states=None):
     """Explicit encoding of energy into state-space
 
     The state-space of the newly created MDP consists of tuples `(s, e)`,
@@ -12,8 +192,23 @@ def product_energy(cmdp, capacity, targets=[]):
     input CMDP) `c`, all successors of the action `a` in the new MDP are
     of the form `(s', e-c)` for non-reload states and
     `(r, capacity)` for reload states.
+
+    Only states reachable from `(s, capacity)` for `s` in `init_states`
+    (all states of `cmdp` by default) are created. `capacity` must be an
+    integer or `inf` (ValueError is raised otherwise). The result is an
+    `EnergyProductConsMDP` together with the list of its states `(t, e)`
+    for `t` in `targets`.
     """
-    result = ProductConsMDP(cmdp, capacity)
+    result = EnergyProductConsMDP(cmdp, capacity)
+    capacity = result.capacity
+    targets = set(targets)
+    if init_states is None:
+        init_states = range(cmdp.num_states)
+
+    finite = capacity != inf
+    stride = capacity + 1
+    index = result._index
+    reloads = [cmdp.is_reload(s) for s in range(cmdp.num_states)]
     # The list of output states for which we have not yet
     # computed the successors.  Items on this list are triplets
     # of the form `(s, e, p)` where `s` is the state
@@ -21,24 +216,27 @@ def product_energy(cmdp, capacity, targets=[]):
     # is the state number in the output mdp.
     todo = []
     otargets = []
-    sink_created = False
+    sink = None
 
     # Transform a pair of state numbers (s, e) into a state
     # number in the output mdp, creating a new state if needed.
     # Whenever a new state is created, we can add it to todo.
     def dst(s, e):
-        p = result.get_state(s, e)
-        if p is None:
-            p = result.new_state(s, e,
-                                 reload=cmdp.is_reload(s))
-            if s in targets and e >= 0:
+        if finite:
+            p = index[s * stride + e]
+        else:
+            p = result.get_state(s, e)
+            p = -1 if p is None else p
+        if p < 0:
+            p = result.new_state(s, e, reload=reloads[s])
+            if s in targets:
                 otargets.append(p)
             todo.append((s, e, p))
         return p
 
     # Initialization
-    # For each state of mdp add a new initial state
-    for s in range(cmdp.num_states):
+    # For each initial state of mdp add a new initial state
+    for s in init_states:
         dst(s, capacity)
 
     # Build all states and edges in the product
@@ -47,16 +245,15 @@ def product_energy(cmdp, capacity, targets=[]):
         for a in cmdp.actions_for_state(s):
             # negative goes to sink
             if e - a.cons < 0:
-                if not sink_created:
+                if sink is None:
                     sink = result.new_state(-1, "-∞", name="sink,-∞")
                     result.add_action(sink, {sink: 1}, "σ", 1, None)
-                    sink_created = True
                 result.add_action(p, {sink: 1}, a.label, a.cons, a)
                 continue
             # build new distribution
             odist = {}
             for succ, prob in a.distr.items():
-                new_e = capacity if cmdp.is_reload(succ) else e - a.cons
+                new_e = capacity if reloads[succ] else e - a.cons
                 out_succ = dst(succ, new_e)
                 odist[out_succ] = prob
             result.add_action(p, odist, a.label, a.cons, a)
@@ -64,186 +261,546 @@ def product_energy(cmdp, capacity, targets=[]):
     return result, otargets
 
 
-# Decompose MDP into MECs. Ignores consumption.
-#
-# The algorithm uses decomposition of directed graph using
-# Tarjan's algorithm (single DFS). The implementation of this
-# the Tarjan's algo is inspired from:
-# https://www.geeksforgeeks.org/tarjan-algorithm-find-strongly-connected-components/
-def get_MECs(mdp):
-    """Given an MDP (not necessarly consMDP), compute its
-    maximal-end-components decomposition.
-
-    Returns list of mecs (lists).
+class ExplicitES(BasicES):
+    """Solver that encodes energy explicitly into the state-space.
+
+    The solver builds the product of `mdp` with all levels of energy
+    `0..cap` (as `product_energy` does, but directly in NumPy arrays) and
+    solves the objectives by classical graph algorithms on the product
+    without any energy:
+     * MIN_INIT_CONS: attractor of transitions to reload states,
+     * SAFE: the same attractor, where reload states not in the attractor
+       are removed until no such state remains,
+     * POS_REACH: backward reachability of safe targets by safe actions,
+     * AS_REACH and BUCHI: backward reachability of targets by actions that
+       stay in the candidate set, repeated until the candidate set is stable.
+       Reload states that are not winning are removed as in `BasicES` and
+       the candidate set is restricted to states that surely reach the
+       remaining reload states (or safe targets for AS_REACH).
+    The attractors and the backward searches run in time linear in the
+    size of the product. The minimal levels for a state `s` are the least
+    `e` such that `(s, e)` is winning (0 for reload states other than for
+    MIN_INIT_CONS). Selectors play in `(s, e)` the winning action of the
+    product.
+
+    The minimal levels are the same as those of the counter-based solvers,
+    also with cycles of actions that consume no energy: like them, the
+    solver does not count on repeating such a cycle instead of reaching
+    a reload state.
+
+    The product has `|S|·(cap+1)` states and the solver is intended as a
+    baseline for benchmarks and cross-checks of the counter-based solvers
+    on moderate capacities.
+
+    Parameters
+    ==========
+     * mdp: `ConsMDP` object or its frozen snapshot
+     * cap: `int`; energy capacity for given objective (must be finite)
+     * targets: `iterable`; states of `mdp` that are targets for the objectives.
     """
-    g = _mdp2graph(mdp)
-    mecs = []
-    removed = set()
-    # detect states of bSCCs
-    while len(g.graph) > 0:
-        to_remove = set()
-        sccs = g.SCC()
-        for scc_i, scc in enumerate(sccs):
-            if g.check_bscc(scc) and not g.check_trivial(scc):
-                to_remove.update(scc)
-                mecs.append(scc)
-
-        attr = _prob_attractor(mdp, removed.union(to_remove))
-        g.remove_vertices(attr)
-        removed.update(attr)
-
-    return mecs
-
-
-class _Graph:
-    '''
-    Represent graphs using adjacency list representation
-    '''
-    def __init__(self):
-        # default dictionary to store graph
-        self.graph = defaultdict(list)
-
-        self.Time = 0
-
-        self.sccs = []
-
-    # function to add an edge to graph
-    def addEdge(self, u, v):
-        self.graph[u].append(v)
-
-    def _SCCUtil(self, u, low, disc, stackMember, st):
-        '''A recursive function that find finds strongly connected
-            components using DFS traversal
-            u --> The vertex to be visited next
-            disc[] --> Stores discovery times of visited vertices
-            low[] -- >> earliest visited vertex (the vertex with minimum
-                        discovery time) that can be reached from subtree
-                        rooted with current vertex
-             st -- >> To store all the connected ancestors (could be part
-                   of SCC)
-             stackMember[] --> bit/index array for faster check whether
-                          a node is in stack
-        '''
-
-        # Initialize discovery time and low value
-        disc[u] = self.Time
-        low[u] = self.Time
-        self.Time += 1
-        stackMember[u] = True
-        st.append(u)
-
-        # Go through all vertices adjacent to this
-        for v in self.graph[u]:
-
-            # If v is not visited yet, then recur for it
-            if disc[v] == -1:
-
-                self._SCCUtil(v, low, disc, stackMember, st)
-
-                # Check if the subtree rooted with v has a connection to
-                # one of the ancestors of u
-                # Case 1 (per above discussion on Disc and Low value)
-                low[u] = min(low[u], low[v])
-
-            elif stackMember[v]:
-
-                # Update low value of 'u' only if 'v' is still in stack
-                # (i.e. it's a back edge, not cross edge).
-                low[u] = min(low[u], disc[v])
-
-                # head node found, pop the stack and print an SCC
-        w = -1  # To store stack extracted vertices
-        if low[u] == disc[u]:
-            scc = []
-            while w != u:
-                w = st.pop()
-                scc.append(w)
-                stackMember[w] = False
-
-            self.sccs.append(scc)
-
-    def SCC(self):
-        """Find strongly connected components using Tarjan's algorithm.
-
-        Take `self.removed` into account: skip edges between removed nodes.
-
-        Uses self._SCCUtil.
-        """
 
-        # Mark all the vertices as not visited
-        # and Initialize parent and visited,
-        # and ap(articulation point) arrays
-        disc = {u : -1 for u in self.graph.keys()}
-        low = {u : -1 for u in self.graph.keys()}
-        stackMember = {False : -1 for u in self.graph.keys()}
-        st = []
-        self.sccs = []
-
-        # Call the recursive helper function
-        # to find articulation points
-        # in DFS tree rooted with vertex 'i'
-        for u in self.graph:
-            if disc[u] == -1:
-                self._SCCUtil(u, low, disc, stackMember, st)
-
-        return self.sccs
-
-    def remove_vertices(self, to_remove):
-        for u in to_remove:
-            self.graph.pop(u, None)
-        for u, succs in self.graph.items():
-            self.graph[u] = [v for v in succs if v not in to_remove]
-
-    def check_bscc(self, scc):
-        """Check if scc is botton and non-trivial -- has cycle"""
-        for s in scc:
-            for t in self.graph[s]:
-                if t not in scc:
-                    return False
-        return True
-
-    def check_trivial(self, scc):
-        for s in scc:
-            for t in self.graph[s]:
-                if t in scc:
-                    return False
-        return True
-
-
-def _prob_attractor(mdp, attr):
-    """ Compute a set of states from which I cannot avoid
-    states from SCCs pointed by `scc_ind`.
-    scc_indices are pointers to graph_sccs.
-
-    We exploit that graph_sccs are in reverse topological
-    order.
+    def __init__(self, mdp, cap, targets):
+        if cap == inf:
+            raise ValueError("ExplicitES needs a finite capacity.")
+        super().__init__(mdp, cap, targets)
+        self._product = None
+
+    def _get_product(self):
+        if self._product is None:
+            self._product = _ExplicitProduct(self.mdp.freeze(), self.cap)
+        return self._product
+
+    def _target_mask(self):
+        product = self._get_product()
+        mask = np.zeros(product.num_states, dtype=bool)
+        targets = list(self.targets) if self.targets is not None else []
+        mask.reshape(self.states, product.levels)[targets] = True
+        return mask
+
+    def _lift(self, objective, win, choice, reload_start=True):
+        """Store minimal levels and selector for `objective` given winning
+        states `win` and chosen actions `choice` of the product."""
+        product = self._get_product()
+        levels = product.levels
+        win = win.reshape(self.states, levels)
+        choice = choice.reshape(self.states, levels)
+        frozen = self.mdp.freeze()
+
+        self.min_levels[objective] = [inf] * self.states
+        self._init_strategy(objective)
+        selector = self.strategy.get(objective)
+        if selector is None:
+            # `lazy_selectors`; the selector is built on request
+            update = lambda s, e, a: None
+        else:
+            # Actions are chosen among the actions of the states
+            update = getattr(selector, "_trusted_update", selector.update)
+        first_win = np.argmax(win, axis=1).tolist()
+        any_win = win.any(axis=1).tolist()
+
+        for s in range(self.states):
+            if reload_start and self.is_reload(s):
+                # The energy is reloaded in `s` before the first action
+                if win[s, self.cap]:
+                    self.min_levels[objective][s] = 0
+                    action = product.pa_orig[choice[s, self.cap]]
+                    update(s, 0, frozen.action(int(action)))
+                continue
+            if not any_win[s]:
+                continue
+            self.min_levels[objective][s] = first_win[s]
+            prev = None
+            for e, p in enumerate(choice[s].tolist()[first_win[s]:],
+                                  first_win[s]):
+                action = int(product.pa_orig[p])
+                if action != prev:
+                    update(s, e, frozen.action(action))
+                    prev = action
+
+    def _safe_product(self):
+        """Return safe states of the product and their safe actions."""
+        if not hasattr(self, "_safe_result"):
+            self._safe_result = self._get_product().safe_states()
+        return self._safe_result
+
+    def _minInitCons(self):
+        win, choice = self._get_product().reload_attractor()
+        self._lift(MIN_INIT_CONS, win, choice, reload_start=False)
+
+    def _safe(self):
+        win, choice = self._safe_product()
+        self._lift(SAFE, win, choice)
+
+    def _positive_reachability(self):
+        product = self._get_product()
+        safe, safe_choice = self._safe_product()
+        targets = self._target_mask() & safe
+        win, choice = product.backward_reach(targets,
+                                             product.closed_actions(safe))
+        choice[targets] = safe_choice[targets]
+        self._lift(POS_REACH, win, choice)
+
+    def _almost_sure_reachability(self):
+        product = self._get_product()
+        safe, safe_choice = self._safe_product()
+        targets = self._target_mask() & safe
+        reloads = product.orig_reload
+        win = safe
+        while True:
+            new_win, choice = product.backward_reach(
+                targets, product.closed_actions(win))
+            # As in `BasicES`, reloads that lose are removed and the states
+            # must surely reach the remaining reloads or safe targets
+            good = reloads & new_win.reshape(self.states, -1)[:, self.cap]
+            if (good != reloads).any():
+                reloads = good
+                new_win &= product.safe_states(reloads, targets)[0]
+            if (new_win == win).all():
+                break
+            win = new_win
+        choice[targets] = safe_choice[targets]
+        self._lift(AS_REACH, win, choice)
+
+    def _buchi(self):
+        product = self._get_product()
+        safe, _ = self._safe_product()
+        targets = self._target_mask()
+        reloads = product.orig_reload
+        win = safe
+        while True:
+            closed = product.closed_actions(win)
+            sources = targets & product.states_with(closed)
+            new_win, choice = product.backward_reach(sources, closed)
+            # As in `BasicES`, reloads that lose are removed and the states
+            # must be safe with the remaining reloads
+            good = reloads & new_win.reshape(self.states, -1)[:, self.cap]
+            if (good != reloads).any():
+                reloads = good
+                new_win &= product.safe_states(reloads)[0]
+            if (new_win == win).all():
+                break
+            win = new_win
+        choice[sources] = product.first_action(closed)[sources]
+        self._lift(BUCHI, win, choice)
+
+
+class _ExplicitProduct:
+    """Product of a `FrozenConsMDP` with levels of energy in NumPy arrays.
+
+    The state `(s, e)` has index `s * levels + e` where `levels = cap + 1`.
+    Product action `p` is the action `pa_orig[p]` of the mdp played with
+    energy `pa_e[p]` (only actions with enough energy exist) from `pa_src[p]`.
+    Its successors are `succ[succ_offsets[p]:succ_offsets[p+1]]`: `(t, cap)`
+    for reload states `t` and `(t, e - cons)` otherwise.
     """
-    repeat = True
-    while repeat:
-        repeat = False
-        for s in range(mdp.num_states):
-            if s in attr:
+
+    def __init__(self, frozen, cap):
+        self.cap = cap
+        self.levels = levels = cap + 1
+        self.num_states = frozen.num_states * levels
+        self.orig_reload = frozen.reload_mask
+
+        # Product actions
+        cons = frozen.consumption
+        counts = np.clip(levels - cons, 0, None)
+        self.pa_orig = np.repeat(np.arange(frozen.num_actions), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        self.pa_e = np.arange(len(self.pa_orig)) - first + cons[self.pa_orig]
+        self.pa_src = frozen.action_src[self.pa_orig] * levels + self.pa_e
+        self.num_actions = len(self.pa_orig)
+
+        # Successors of product actions
+        succ_counts = np.diff(frozen.succ_offsets)[self.pa_orig]
+        self.succ_offsets = np.concatenate(
+            ([0], np.cumsum(succ_counts))).astype(np.int64)
+        entry_pa = np.repeat(np.arange(self.num_actions), succ_counts)
+        entry = (np.arange(len(entry_pa))
+                 - self.succ_offsets[:-1][entry_pa]
+                 + frozen.succ_offsets[self.pa_orig][entry_pa])
+        t = frozen.succ_states[entry]
+        t_e = np.where(frozen.reload_mask[t], cap,
+                       self.pa_e[entry_pa] - cons[self.pa_orig][entry_pa])
+        self.succ = t * levels + t_e
+
+        # Actions of each product state
+        self.state_actions = np.argsort(self.pa_src, kind="stable")
+        self.state_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(self.pa_src,
+                                        minlength=self.num_states))))
+
+        # Predecessor index: product actions with the state as successor
+        order = np.argsort(self.succ, kind="stable")
+        self.pred_actions = entry_pa[order]
+        self.pred_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(self.succ,
+                                        minlength=self.num_states))))
+
+    def closed_actions(self, states):
+        """Mask of actions from `states` with all successors in `states`."""
+        if self.num_actions == 0:
+            return np.zeros(0, dtype=bool)
+        inside = np.minimum.reduceat(states[self.succ].view(np.int8),
+                                     self.succ_offsets[:-1]).astype(bool)
+        return inside & states[self.pa_src]
+
+    def states_with(self, actions):
+        """Mask of states with some action from the mask `actions`."""
+        mask = np.zeros(self.num_states, dtype=bool)
+        mask[self.pa_src[actions]] = True
+        return mask
+
+    def first_action(self, actions):
+        """First action from the mask `actions` of each state (or -1)."""
+        choice = np.full(self.num_states, -1, dtype=np.int64)
+        picked = self.state_actions[actions[self.state_actions]][::-1]
+        choice[self.pa_src[picked]] = picked
+        return choice
+
+    def backward_reach(self, sources, actions):
+        """Return states that can reach `sources` using `actions` (a mask)
+        and for each of them the action that leads closer to `sources`
+        (-1 for `sources`)."""
+        reached = sources.copy()
+        choice = np.full(self.num_states, -1, dtype=np.int64)
+        allowed = actions.tolist()
+        pa_src = self.pa_src.tolist()
+        offsets = self.pred_offsets.tolist()
+        preds = self.pred_actions.tolist()
+        reached_l = reached.tolist()
+
+        queue = deque(np.flatnonzero(sources).tolist())
+        while queue:
+            v = queue.popleft()
+            for p in preds[offsets[v]:offsets[v + 1]]:
+                if allowed[p]:
+                    u = pa_src[p]
+                    if not reached_l[u]:
+                        reached_l[u] = True
+                        choice[u] = p
+                        queue.append(u)
+        reached[:] = reached_l
+        return reached, choice
+
+    def reload_attractor(self, reloads=None, sinks=None):
+        """Return states from which all paths surely reach a reload state
+        in at least one step and for each of them the action to play.
+
+        Only reload states `s` with `reloads[s]` (all by default) count as
+        reload states; the others are never reached safely. States of the
+        product in the mask `sinks` (if given) are reached safely as reload
+        states are and they are included in the result.
+        """
+        orig_reload = self.orig_reload.tolist()
+        if reloads is None:
+            reloads = orig_reload
+        levels = self.levels
+        stop = [reloads[s // levels] for s in range(self.num_states)]
+        if sinks is not None:
+            stop = [r or t for r, t in zip(stop, sinks.tolist())]
+        succ = self.succ.tolist()
+        succ_offsets = self.succ_offsets.tolist()
+        # Number of successors that are not reloads and not yet attracted
+        missing = [sum(1 for t in succ[succ_offsets[p]:succ_offsets[p + 1]]
+                       if not stop[t])
+                   for p in range(self.num_actions)]
+        pa_src = self.pa_src.tolist()
+        offsets = self.pred_offsets.tolist()
+        preds = self.pred_actions.tolist()
+
+        # States of removed reload states are never attracted
+        attracted = [orig_reload[s // levels] and not reloads[s // levels]
+                     for s in range(self.num_states)]
+        choice = np.full(self.num_states, -1, dtype=np.int64)
+        queue = deque()
+        for p in range(self.num_actions):
+            u = pa_src[p]
+            if missing[p] == 0 and not attracted[u]:
+                attracted[u] = True
+                choice[u] = p
+                queue.append(u)
+
+        while queue:
+            v = queue.popleft()
+            if stop[v]:
+                # Entering a reload state is not counted as missing
                 continue
+            for p in preds[offsets[v]:offsets[v + 1]]:
+                missing[p] -= 1
+                u = pa_src[p]
+                if missing[p] == 0 and not attracted[u]:
+                    attracted[u] = True
+                    choice[u] = p
+                    queue.append(u)
+
+        attracted = np.array(attracted, dtype=bool)
+        attracted &= ~np.repeat(self.orig_reload & ~np.array(reloads, bool),
+                                levels)
+        if sinks is not None:
+            attracted |= sinks
+        return attracted, choice
+
+    def safe_states(self, reloads=None, sinks=None):
+        """Return states from which reload states can be visited forever
+        (without running out of energy) and for each of them the action to
+        play.
+
+        Only reload states `s` with `reloads[s]` (all by default) count as
+        reload states. Reload states from which no reload state can be surely
+        reached with full energy are removed until no such state remains.
+        With `sinks`, it suffices to reach one of these states of the
+        product instead (see `reload_attractor`).
+        """
+        if reloads is None:
+            reloads = self.orig_reload
+        reloads = reloads.copy()
+        while True:
+            win, choice = self.reload_attractor(reloads.tolist(), sinks)
+            good = reloads & win.reshape(-1, self.levels)[:, self.cap]
+            if (good == reloads).all():
+                return win, choice
+            reloads = good
 
-            safe = False
-            for a in mdp.actions_for_state(s):
-                if len(a.get_succs().intersection(attr)) == 0:
-                    safe = True
 
-            if not safe:
-                attr.add(s)
-                repeat = True
+# Decompose MDP into MECs. Ignores consumption.
+#
+# The algorithm refines candidate sets of states. Each candidate is split
+# into strongly connected components (by an iterative version of Tarjan's
+# algorithm, or by scipy), actions that can leave the component of their
+# state are removed, and states without actions are removed together with
+# all actions that can lead to them (attractor computed by a worklist).
+# Components that lost some action are split again, the others are MECs.
+def get_MECs(mdp, backend="python"):
+    """Given an MDP (not necessarly consMDP), compute its
+    maximal-end-components decomposition.
+
+    The strongly connected components are computed in Python by default,
+    or by `scipy.sparse.csgraph` with `backend="scipy"` (needs `scipy`).
+    The two backends return the same MECs, but the order of the MECs and
+    of the states in them may differ.
 
-    return attr
+    Returns list of mecs (lists).
+    """
+    if backend not in ("python", "scipy"):
+        raise ValueError(f"Unknown backend {backend} for get_MECs, use "
+                         f"'python' or 'scipy'.")
+    return _MECDecomposition(mdp.freeze(), backend).decompose()
 
 
-def _mdp2graph(mdp):
-    """Convert mdp to graph representation for the Tarjan algo"""
-    ns = mdp.num_states # store the number of states
-    g = _Graph()
+class _MECDecomposition:
+    """State of the MEC decomposition of a `FrozenConsMDP`.
 
-    for s in range(ns):
-        for t in mdp.state_succs(s):
-            g.addEdge(s,t)
+    `enabled[a]` says whether the action `a` can still be part of some MEC
+    and `count[s]` is the number of enabled actions of `s`. `dirty[s]` is set
+    when `s` loses an action; the components with dirty states must be
+    split again.
+    """
 
-    return g
+    def __init__(self, frozen, backend):
+        self.backend = backend
+        self.num_states = n = frozen.num_states
+        self.action_offsets = frozen.action_offsets.tolist()
+        self.succ_offsets = frozen.succ_offsets.tolist()
+        self.succ_states = frozen.succ_states.tolist()
+        self.action_src = frozen.action_src.tolist()
+
+        # actions that can lead to each state
+        entry_action = np.repeat(np.arange(frozen.num_actions),
+                                 np.diff(frozen.succ_offsets))
+        order = np.argsort(frozen.succ_states, kind="stable")
+        self.pred_actions = entry_action[order].tolist()
+        self.pred_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(frozen.succ_states,
+                                        minlength=n)))).tolist()
+
+        self.enabled = [True] * frozen.num_actions
+        self.count = np.diff(frozen.action_offsets).tolist()
+        self.removed = [False] * n
+        self.dirty = [True] * n
+
+    def decompose(self):
+        """Return list of MECs."""
+        self._remove_states([s for s in range(self.num_states)
+                             if self.count[s] == 0])
+        mecs = []
+        candidates = [list(range(self.num_states))]
+        while candidates:
+            states = [s for s in candidates.pop() if not self.removed[s]]
+            if not states:
+                continue
+            if any(self.dirty[s] for s in states):
+                candidates.extend(reversed(self._split(states)))
+            else:
+                mecs.append(states)
+        return mecs
+
+    def _split(self, states):
+        """Split `states` into SCCs and remove actions that leave them."""
+        for s in states:
+            self.dirty[s] = False
+        if self.backend == "scipy":
+            sccs = self._scipy_sccs(states)
+        else:
+            sccs = self._tarjan(states)
+
+        component = {}
+        for i, scc in enumerate(sccs):
+            for s in scc:
+                component[s] = i
+        leaving = []
+        for s in states:
+            for a in range(self.action_offsets[s], self.action_offsets[s+1]):
+                if self.enabled[a] and any(
+                        component.get(t) != component[s]
+                        for t in self._action_succs(a)):
+                    leaving.append(a)
+        self._remove_actions(leaving)
+        return sccs
+
+    def _action_succs(self, a):
+        return self.succ_states[self.succ_offsets[a]:self.succ_offsets[a+1]]
+
+    def _succs(self, s):
+        """Return sorted successors of `s` under enabled actions."""
+        succs = set()
+        for a in range(self.action_offsets[s], self.action_offsets[s + 1]):
+            if self.enabled[a]:
+                succs.update(self._action_succs(a))
+        return sorted(succs)
+
+    def _remove_actions(self, actions):
+        """Disable `actions` and remove states that have no enabled action
+        left (together with the actions that lead to them)."""
+        empty = []
+        for a in actions:
+            if self.enabled[a]:
+                self.enabled[a] = False
+                s = self.action_src[a]
+                self.dirty[s] = True
+                self.count[s] -= 1
+                if self.count[s] == 0:
+                    empty.append(s)
+        self._remove_states(empty)
+
+    def _remove_states(self, states):
+        """Remove `states` and the attractor of them."""
+        queue = deque()
+        for s in states:
+            if not self.removed[s]:
+                self.removed[s] = True
+                queue.append(s)
+        enabled, count = self.enabled, self.count
+        while queue:
+            t = queue.popleft()
+            for a in self.pred_actions[self.pred_offsets[t]:
+                                       self.pred_offsets[t + 1]]:
+                if not enabled[a]:
+                    continue
+                enabled[a] = False
+                s = self.action_src[a]
+                self.dirty[s] = True
+                count[s] -= 1
+                if count[s] == 0 and not self.removed[s]:
+                    self.removed[s] = True
+                    queue.append(s)
+
+    def _tarjan(self, states):
+        """Return SCCs of `states` in the order found by Tarjan's algorithm.
+
+        The DFS uses an explicit stack, the roots are tried in ascending
+        order and the successors of each state in ascending order.
+        """
+        disc, low, on_stack = {}, {}, set()
+        stack, sccs = [], []
+        for root in sorted(states):
+            if root in disc:
+                continue
+            disc[root] = low[root] = len(disc)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self._succs(root)))]
+            while work:
+                u, succs = work[-1]
+                for v in succs:
+                    if v not in disc:
+                        disc[v] = low[v] = len(disc)
+                        stack.append(v)
+                        on_stack.add(v)
+                        work.append((v, iter(self._succs(v))))
+                        break
+                    if v in on_stack and disc[v] < low[u]:
+                        low[u] = disc[v]
+                else:
+                    work.pop()
+                    if work and low[u] < low[work[-1][0]]:
+                        low[work[-1][0]] = low[u]
+                    if low[u] == disc[u]:
+                        scc = []
+                        while True:
+                            w = stack.pop()
+                            on_stack.discard(w)
+                            scc.append(w)
+                            if w == u:
+                                break
+                        sccs.append(scc)
+        return sccs
+
+    def _scipy_sccs(self, states):
+        """Return SCCs of `states` computed by `scipy.sparse.csgraph`."""
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        states = sorted(states)
+        local = {s: i for i, s in enumerate(states)}
+        rows, cols = [], []
+        for s in states:
+            for t in self._succs(s):
+                rows.append(local[s])
+                cols.append(local[t])
+        graph = csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)),
+                           shape=(len(states), len(states)))
+        _, labels = connected_components(graph, directed=True,
+                                         connection="strong")
+        sccs = defaultdict(list)
+        for s, label in zip(states, labels.tolist()):
+            sccs[label].append(s)
+        return list(sccs.values())
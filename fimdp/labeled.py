@@ -1,7 +1,10 @@
-from .core import ConsMDP, CounterStrategy, ProductConsMDP, ProductSelector
+from .core import ConsMDP, CounterStrategy, FrozenConsMDP, ProductConsMDP, \
+    ProductSelector
 from .energy_solvers import GoalLeaningES
 from .objectives import BUCHI
 
+from array import array
+from collections.abc import MutableSequence, MutableSet, Sequence
 from copy import deepcopy
 from math import inf
 
@@ -29,6 +32,13 @@ class LabeledConsMDP(ConsMDP):
     by`LabeledConsMDP.get_states_with_label()`. The state labels are sets of
     integers that correspond to intended APs.
 
+    Internally, the labels are stored as bitmasks (bit `i` stands for
+    `AP[i]`) in the array `LabeledConsMDP.label_masks`. `state_labels` is a
+    list-like view whose items are set-like views of the labels; both
+    assignments to `state_labels[s]` and in-place changes like
+    `state_labels[s].add(ap)` change the bitmasks. The states with each
+    label are indexed on the first query of `states_with_label`.
+
     Parameters:
     ===========
       * AP : list of names of atomic propositions
@@ -49,10 +59,30 @@ class LabeledConsMDP(ConsMDP):
             self.AP2int[value] = key
 
         # Initialize labeling function
-        self.state_labels = []
+        self._state_labels = _StateLabels(self)
+
+    @property
+    def state_labels(self):
+        return self._state_labels
+
+    @state_labels.setter
+    def state_labels(self, labels):
+        self._state_labels = _StateLabels(self, labels)
+        self.structure_change()
+
+    @property
+    def label_masks(self):
+        """Array with labels of states as bitmasks of AP-indices."""
+        return self._state_labels.masks
 
     def _copy_mdp(self, other):
         self.__dict__.update(deepcopy(other.__dict__))
+        self.structure_change()
+
+    def _make_frozen(self, arrays):
+        return FrozenLabeledConsMDP(self.AP, self.state_labels,
+                                    name=self.name, names=self.names,
+                                    **arrays)
 
     def new_state(self, reload=False, name=None, label=set()):
         """Create a new labeled state.
@@ -123,9 +153,7 @@ class LabeledConsMDP(ConsMDP):
                                  f"Values can be 0-{len(self.AP) - 1}.\n" +
                                  f"The set of AP given as label: {label}")
 
-        labels = self.state_labels
-        states = self.num_states
-        return [i for i in range(states) if labels[i] == label]
+        return self._state_labels.states_with_mask(_label_mask(label))
 
     def product_with_dba(self, aut, init_states=None):
         """Product of a labeled CMDP and a deterministic Büchi automaton.
@@ -259,6 +287,164 @@ class LabeledConsMDP(ConsMDP):
                                      keep_product=keep_product)
 
 
+class FrozenLabeledConsMDP(FrozenConsMDP):
+    """
+    Immutable array-backed snapshot of a LabeledConsMDP.
+
+    On top of `FrozenConsMDP` it keeps the atomic propositions (`AP` and
+    `AP2int`) and the labeling function `state_labels`. See
+    `LabeledConsMDP` for details.
+
+    Use `LabeledConsMDP.freeze()` to obtain the snapshot. Assignments
+    to `LabeledConsMDP.state_labels` create a new snapshot on the next call
+    of `freeze()`.
+    """
+
+    def __init__(self, AP, state_labels, **arrays):
+        super().__init__(**arrays)
+        self.AP = list(AP)
+        self.AP2int = {ap: i for i, ap in enumerate(self.AP)}
+        self.state_labels = tuple(frozenset(label) for label in state_labels)
+        self.label_masks = _mask_array(len(self.AP))
+        self.label_masks.extend(_label_mask(label)
+                                for label in self.state_labels)
+        self._label_index = None
+
+    def states_with_label(self, label):
+        """Return a list of states that carry the given label."""
+        if self._label_index is None:
+            self._label_index = _index_masks(self.label_masks)
+        states = self._label_index.get(_label_mask(label))
+        return [] if states is None else states.tolist()
+
+
+class _StateLabels(MutableSequence):
+    """
+    Labels of states of a LabeledConsMDP stored as bitmasks.
+
+    Items are `_LabelView`s, mutable set-like views of the AP-indices of
+    the states. The inverted index from bitmasks to states is built on the
+    first query and dropped on change.
+    """
+
+    def __init__(self, mdp, labels=()):
+        self._mdp = mdp
+        self.masks = _mask_array(len(mdp.AP))
+        self.masks.extend(_label_mask(label) for label in labels)
+        self._index = None
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __getitem__(self, s):
+        if isinstance(s, slice):
+            return [self[i] for i in range(*s.indices(len(self)))]
+        if s < 0:
+            s += len(self)
+        if not 0 <= s < len(self):
+            raise IndexError("state index out of range")
+        return _LabelView(self, s)
+
+    def __setitem__(self, s, label):
+        self.masks[s] = _label_mask(label)
+        self._changed()
+
+    def __delitem__(self, s):
+        del self.masks[s]
+        self._changed()
+
+    def insert(self, s, label):
+        self.masks.insert(s, _label_mask(label))
+        self._changed()
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def _changed(self):
+        self._index = None
+        self._mdp.structure_change()
+
+    def states_with_mask(self, mask):
+        """Return sorted list of states labeled by the bitmask `mask`."""
+        if self._index is None:
+            self._index = _index_masks(self.masks)
+        states = self._index.get(mask)
+        return [] if states is None else states.tolist()
+
+
+class _LabelView(MutableSet):
+    """Label of state `s` given by `labels.masks[s]` as a mutable set of
+    AP-indices; changes are written to the bitmask."""
+
+    def __init__(self, labels, s):
+        self._labels = labels
+        self._state = s
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return set(iterable)
+
+    def _mask(self):
+        return self._labels.masks[self._state]
+
+    def __contains__(self, ap):
+        try:
+            return ap >= 0 and bool(self._mask() >> ap & 1)
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        mask = self._mask()
+        return (ap for ap in range(mask.bit_length()) if mask >> ap & 1)
+
+    def __len__(self):
+        return bin(self._mask()).count("1")
+
+    def add(self, ap):
+        if ap not in self:
+            self._labels[self._state] = list(self) + [ap]
+
+    def discard(self, ap):
+        if ap in self:
+            self._labels.masks[self._state] = self._mask() & ~(1 << ap)
+            self._labels._changed()
+
+    def __repr__(self):
+        return repr(set(self))
+
+
+def _label_mask(label):
+    """Return bitmask of `label` (iterable of AP-indices)."""
+    mask = 0
+    for ap in label:
+        mask |= 1 << ap
+    return mask
+
+
+def _mask_array(num_ap):
+    """Return empty array for bitmasks over `num_ap` atomic propositions."""
+    if num_ap <= 64:
+        return array("Q")
+    # Python ints for labels that do not fit into 64 bits
+    return []
+
+
+def _index_masks(masks):
+    """Return dict from bitmasks to sorted arrays of states with them."""
+    index = {}
+    for s, mask in enumerate(masks):
+        states = index.get(mask)
+        if states is None:
+            states = index[mask] = array("q")
+        states.append(s)
+    return index
+
+
 class DBAWrapper:
     """
     Wrapper class around Spot's interface for automaton that answers queries
@@ -270,6 +456,11 @@ class DBAWrapper:
     propositions of the automaton. It cannot contain superset, as this would
     lead to non-determinism. In queries, atomic propositions should be
     referenced by index in this given list.
+
+    The edges are memoized in a table indexed by the automaton state and
+    by the bitmask of the label restricted to the atomic propositions used
+    by the automaton (bit `i` stands for `AP[i]`). Each pair is resolved
+    using BDDs only once; the following queries are dictionary lookups.
     """
 
     def __init__(self, aut, AP):
@@ -300,11 +491,15 @@ class DBAWrapper:
                 bddvar_i = aut.get_dict().register_proposition(ap, self)
                 self.ap2bdd_var[ap_i] = bddvar_i
 
-    def _bdd_for_label(self, label):
-        """Get the BDD for given label (sequence of AP-indices)."""
+        # Bits of APs used by the automaton and the table of edges
+        self.used_mask = sum(1 << ap_i for ap_i in self.ap2bdd_var)
+        self._edges = {}
+
+    def _bdd_for_mask(self, mask):
+        """Get the BDD for given label (bitmask of AP-indices)."""
         cond = buddy.bddtrue
         for ap_i, bdd_var in self.ap2bdd_var.items():
-            if ap_i in label:
+            if mask >> ap_i & 1:
                 cond &= buddy.bdd_ithvar(bdd_var)
             else:
                 cond -= buddy.bdd_ithvar(bdd_var)
@@ -313,16 +508,42 @@ class DBAWrapper:
     def __del__(self):
         self.bdd_dict.unregister_all_my_variables(self)
 
+    def label_mask(self, label):
+        """Return bitmask of `label` (sequence of AP-indices) restricted to
+        the APs used by the automaton."""
+        mask = 0
+        for ap_i in label:
+            mask |= 1 << ap_i
+        return mask & self.used_mask
+
     def edge(self, state, label):
         """
         Get edge from `state` under `label`
 
         Label is sequence of indices in AP as given by creation of this object.
         """
+        return self.edge_for_mask(state, self.label_mask(label))
+
+    def edge_for_mask(self, state, mask):
+        """
+        Get edge from `state` under label given as bitmask of AP-indices.
+
+        Bits of APs not used by the automaton are ignored.
+        """
+        key = (state, mask & self.used_mask)
+        try:
+            return self._edges[key]
+        except KeyError:
+            pass
+
+        mdp_bdd = self._bdd_for_mask(key[1])
+        edge = None
         for e in self.aut.out(state):
-            mdp_bdd = self._bdd_for_label(label)
             if mdp_bdd & e.cond != buddy.bddfalse:
-                return e
+                edge = e
+                break
+        self._edges[key] = edge
+        return edge
 
     def get_init(self):
         return self.aut.get_init_state_number()
@@ -360,7 +581,7 @@ class DBACounterStategy(CounterStrategy):
                  capacity: int, init_energy: int, init_state=None,
                  *args, **kwargs):
         # Check the type of mdp
-        if not isinstance(mdp, LabeledConsMDP):
+        if not isinstance(mdp, (LabeledConsMDP, FrozenLabeledConsMDP)):
             raise ValueError("Argument `mdp` must be a labeled consumption "
                              f"MDP (LabeledConsMDP). It is of type {type(mdp)}")
 
@@ -393,8 +614,8 @@ class DBACounterStategy(CounterStrategy):
 
     def _update(self, outcome):
         super()._update(outcome)
-        label = self.mdp.state_labels[outcome]
-        self.aut_state = self.aut.succ(self.aut_state, label)
+        mask = self.mdp.label_masks[outcome]
+        self.aut_state = self.aut.edge_for_mask(self.aut_state, mask).dst
 
     def _reset(self, init_energy=None, init_aut_state=None, *args, **kwargs):
         super()._reset(init_energy)
@@ -404,8 +625,9 @@ class DBACounterStategy(CounterStrategy):
             if init_aut_state is None:
                 init_aut_state = self.aut.get_init()
             if self._current_state is not None:
-                label = self.mdp.state_labels[self._current_state]
-                self.aut_state = self.aut.succ(init_aut_state, label)
+                mask = self.mdp.label_masks[self._current_state]
+                self.aut_state = self.aut.edge_for_mask(init_aut_state,
+                                                        mask).dst
             else:
                 self.aut_state = init_aut_state
 
@@ -428,6 +650,15 @@ def product_dba(lmdp, aut, init_states=None):
      * product: CMDP object with the product-CMDP
      * targets: target states in the product (accepting states of the Büchi automaton)
 
+    States of `lmdp` are grouped into classes of labels that the automaton
+    can distinguish and the successors in the automaton are computed once
+    for each pair (automaton state, label class). The dict
+    `product.construction_stats` holds the numbers of `states`, `actions`,
+    and `edges` (pairs of action and successor) of the product, the number
+    of `label_classes`, the number of `automaton_lookups` (pairs resolved by
+    the automaton) and of `cached_lookups` (successors reused for the
+    following edges).
+
     Raise ValueError when empty init supplied
     Raise ValueError if incorrect type of automaton was given
     Raise ValueError if `dba` uses some AP not used by `lcmdp`
@@ -453,6 +684,7 @@ def product_dba(lmdp, aut, init_states=None):
 
     dba = DBAWrapper(aut, lmdp.AP)
     result = ProductConsMDP(lmdp, aut)
+    accepting = [aut.state_is_accepting(q) for q in range(aut.num_states())]
 
     # Output states for which we have not yet computed the successors and
     # Büchi states
@@ -467,32 +699,84 @@ def product_dba(lmdp, aut, init_states=None):
             p = result.new_state(mdps, auts,
                                  reload=lmdp.is_reload(mdps))
             todo.append(p)
-            if aut.state_is_accepting(auts):
+            if accepting[auts]:
                 targets.append(p)
         return p
 
+    # Edges of the automaton for each automaton state and label class,
+    # filled on demand
+    class_of, class_masks = _label_classes(lmdp.label_masks, dba.used_mask)
+    edge_rows = [None] * len(accepting)
+
+    def aut_edges(auts):
+        row = edge_rows[auts]
+        if row is None:
+            row = edge_rows[auts] = [None] * len(class_masks)
+        return row
+
+    def fill(row, auts, label_class):
+        e = dba.edge_for_mask(auts, class_masks[label_class])
+        row[label_class] = e
+        return e
+
     # Initialization
     # For each state of mdp in init_states, add a new initial state
     aut_i = aut.get_init_state_number()
+    row = aut_edges(aut_i)
     for mdp_s in init_states:
-        label = lmdp.state_labels[mdp_s]
-        aut_s = dba.succ(aut_i, label)
-        get_or_create(mdp_s, aut_s)
+        c = class_of[mdp_s]
+        aedge = row[c]
+        if aedge is None:
+            aedge = fill(row, aut_i, c)
+        get_or_create(mdp_s, aedge.dst)
+    queries, num_actions = len(init_states), 0
 
     # Build all states and edges in the product
     while todo:
         osrc = todo.pop()
         msrc, asrc = result.components[osrc]
+        row = aut_edges(asrc)
         for a in lmdp.actions_for_state(msrc):
             # build new distribution
             odist = {}
             for mdst, prob in a.distr.items():
-                label = lmdp.state_labels[mdst]
-                aedge = dba.edge(asrc, label)
-                adst = aedge.dst
-                odst = get_or_create(mdst, adst)
+                c = class_of[mdst]
+                aedge = row[c]
+                if aedge is None:
+                    aedge = fill(row, asrc, c)
+                odst = get_or_create(mdst, aedge.dst)
                 odist[odst] = prob
+            queries += len(odist)
+            num_actions += 1
             result.add_action(osrc, odist, a.label, a.cons,
                               orig_action=a, other_action=aedge)
 
+    lookups = sum(len(row) - row.count(None)
+                  for row in edge_rows if row is not None)
+    result.construction_stats = {
+        "states": result.num_states,
+        "actions": num_actions,
+        "edges": queries - len(init_states),
+        "label_classes": len(class_masks),
+        "automaton_lookups": lookups,
+        "cached_lookups": queries - lookups,
+    }
     return result, targets
+
+
+def _label_classes(masks, used_mask):
+    """Group states by their labels restricted to `used_mask`.
+
+    Return pair `(class_of, class_masks)` where `class_of[s]` is the index
+    of the class of state `s` and `class_masks[c]` is the label of class
+    `c` (as bitmask).
+    """
+    classes = {}
+    class_of = array("q")
+    for mask in masks:
+        mask &= used_mask
+        c = classes.get(mask)
+        if c is None:
+            c = classes[mask] = len(classes)
+        class_of.append(c)
+    return class_of, list(classes)
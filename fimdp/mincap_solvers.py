@@ -1,10 +1,20 @@
 """
 Find minimal capacity needed for given starting location
 and target location.
+
+ * `bin_search` finds the minimal capacity for one starting location by
+   solving the objective for each probed capacity.
+ * `min_capacities` finds the minimal capacities for all states at once and
+   shares each solved capacity among all states.
+ * `min_capacity_queries` answers many queries `(init_loc, target_locs)`;
+   queries with the same targets are answered by one `min_capacities` call
+   and the groups of queries are solved in parallel.
 """
 
+from math import inf
+
 from .energy_solvers import BasicES
-from .objectives import AS_REACH, BUCHI
+from .objectives import MIN_INIT_CONS, AS_REACH, BUCHI
 
 
 def bin_search(mdp, init_loc, target_locs,
@@ -21,7 +31,8 @@ def bin_search(mdp, init_loc, target_locs,
     means that we can choose 1 of them only and not visit the rest.
 
     The search starts from `capacity=100` by default. This can be
-    changed by setting `starting_capacity`.
+    changed by setting `starting_capacity`. Capacities below 1 are not
+    considered; the result is at least 1.
 
     If `max_starting_load` is given, don't consider capacities for
     which we need more than the given value from the starting
@@ -43,18 +54,13 @@ def bin_search(mdp, init_loc, target_locs,
     while low < high:
         current_cap = (high + low) // 2
         solver = BasicES(mdp, current_cap, target_locs)
-        # Get the results
-        if objective == BUCHI:
-            result = solver.get_min_levels(BUCHI)
-        elif objective == AS_REACH:
-            result = solver.get_min_levels(AS_REACH)
-        else:
+        if objective not in (BUCHI, AS_REACH):
             raise ValueError("Objective not supported yet.")
 
         max_load = current_cap if max_starting_load is None else max_starting_load
 
         # capacity too low
-        if result[init_loc] > max_load:
+        if not solver.is_satisfiable(objective, init_loc, max_load):
             low = current_cap + 1
         else:
             high = current_cap
@@ -63,4 +69,143 @@ def bin_search(mdp, init_loc, target_locs,
     if not success:
         raise ValueError(f"No capacity <= {starting_capacity} is enough.")
 
-    return low
\ No newline at end of file
+    return low
+
+
+def min_capacities(mdp, targets, objective=BUCHI,
+                   max_capacity=100,
+                   max_starting_load=None,
+                   states=None,
+                   solver_class=BasicES,
+                   **solver_args):
+    """Compute minimal capacity needed to fulfill `objective` from each state.
+
+    Return a list with the minimal capacity `<= max_capacity` for each state
+    of `mdp` such that `objective` (for the set of targets `targets`) can be
+    satisfied from the state, or `inf` if there is no such capacity. As in
+    `bin_search`, capacities below 1 are not considered. If
+    `max_starting_load` is given, don't consider capacities for which we
+    need more than the given value from the state. If `states` is given,
+    only the capacities for these states are computed (the others are `inf`).
+
+    The search uses that the minimal levels of energy can only decrease with
+    growing capacity:
+     1. The minimal levels for infinite capacity are lower bounds on the
+        capacities (states with `inf` are not solvable at all). For
+        MIN_INIT_CONS, the values above capacity are simply capped and the
+        lower bounds are the results.
+     2. The remaining states are searched by a binary search that splits
+        the states on each probed capacity; each probed capacity is solved
+        once for all states whose minimal capacity can be in the probed
+        interval.
+
+    Each probe creates `solver_class(mdp, cap, targets, **solver_args)`;
+    `solver_class` must support `cap=inf`.
+    """
+    levels_at = {}
+
+    def levels(cap):
+        if cap not in levels_at:
+            solver = solver_class(mdp, cap, targets, **solver_args)
+            levels_at[cap] = solver.get_min_levels(objective)
+        return levels_at[cap]
+
+    def satisfied(cap, s):
+        level = levels(cap)[s]
+        if max_starting_load is None:
+            return level < inf
+        return level <= max_starting_load
+
+    result = [inf] * mdp.num_states
+    lower = levels(inf)
+    if states is None:
+        states = range(mdp.num_states)
+    states = [s for s in set(states)
+              if satisfied(inf, s) and lower[s] <= max_capacity]
+
+    if max_capacity < 1:
+        return result
+    if objective == MIN_INIT_CONS:
+        for s in states:
+            result[s] = max(lower[s], 1)
+        return result
+
+    # Each interval [low, high] comes with states whose minimal capacity
+    # is in the interval (or is > max_capacity if high == max_capacity).
+    intervals = [(1, max_capacity, states)]
+    while intervals:
+        low, high, states = intervals.pop()
+        if not states:
+            continue
+        low = max(low, min(lower[s] for s in states))
+        if low == high:
+            for s in states:
+                if satisfied(high, s):
+                    result[s] = high
+            continue
+
+        mid = (low + high) // 2
+        below = [s for s in states if lower[s] <= mid and satisfied(mid, s)]
+        below_set = set(below)
+        intervals.append((low, mid, below))
+        intervals.append((mid + 1, high,
+                          [s for s in states if s not in below_set]))
+
+    return result
+
+
+def min_capacity_queries(mdp, queries, objective=BUCHI,
+                         max_capacity=100,
+                         max_starting_load=None,
+                         max_workers=None,
+                         solver_class=BasicES,
+                         **solver_args):
+    """Compute minimal capacities for many pairs of initial state and targets.
+
+    `queries` is an iterable of pairs `(init_loc, target_locs)` as in
+    `bin_search`. Return a list with the minimal capacity `<= max_capacity`
+    for each query, or `inf` if there is no such capacity.
+
+    Queries with the same set of targets form a group that is answered by
+    one call of `min_capacities` (restricted to the initial states of the
+    group). The groups are solved in parallel by `max_workers` processes
+    (see `batch.map_shared`); `max_workers=1` solves them in this process
+    (and does not need the module `batch`, which needs Python 3.8). The
+    other parameters are as for `min_capacities`.
+    """
+    groups = {}
+    queries = list(queries)
+    for i, (init_loc, target_locs) in enumerate(queries):
+        if isinstance(target_locs, int):
+            target_locs = [target_locs]
+        groups.setdefault(frozenset(target_locs), []).append(i)
+
+    args_list = []
+    for targets, indices in groups.items():
+        init_states = [queries[i][0] for i in indices]
+        args_list.append((sorted(targets), init_states, objective,
+                          max_capacity, max_starting_load,
+                          solver_class, solver_args))
+
+    if max_workers == 1:
+        results = ((g, _group_capacities(mdp, *args))
+                   for g, args in enumerate(args_list))
+    else:
+        from .batch import map_shared
+        results = map_shared(mdp, _group_capacities, args_list, max_workers)
+
+    result = [inf] * len(queries)
+    indices_list = list(groups.values())
+    for g, capacities in results:
+        for i in indices_list[g]:
+            result[i] = capacities[queries[i][0]]
+    return result
+
+
+def _group_capacities(mdp, targets, states, objective, max_capacity,
+                      max_starting_load, solver_class, solver_args):
+    """Return minimal capacities of `states` for one group of queries."""
+    capacities = min_capacities(mdp, targets, objective, max_capacity,
+                                max_starting_load, states, solver_class,
+                                **solver_args)
+    return {s: capacities[s] for s in states}
@@ -0,0 +1,310 @@
+"""
+Monte Carlo simulation of counter strategies with NumPy.
+
+`Simulator` runs many independent plays of a selector on a ConsMDP in
+lockstep: in each step, all plays select their actions by one lookup into
+a dense table of actions indexed by state and energy level, sample their
+successors from the distributions of the actions using a seeded NumPy
+generator, and update their energy. Energy is tracked as by
+`CounterStrategy`: it is set to the capacity in reload states before the
+consumption of the played action is subtracted.
+
+Selectors for products with a deterministic Büchi automaton (as used by
+`DBACounterStategy`) are supported as well; the state of the automaton is
+then tracked by a table of its transitions for all classes of labels.
+
+`simulate(strategy, num_plays, steps)` simulates plays that continue from
+the current configuration of a `CounterStrategy` or `DBACounterStategy`.
+
+Usage:
+```
+simulator = Simulator(mdp, solver.get_selector(BUCHI), capacity=cap)
+result = simulator.run(init_state=0, init_energy=cap, num_plays=10**6,
+                       steps=100, targets=T, seed=42)
+print(result.hit_rate, result.visits.mean(), result.errors)
+```
+"""
+
+from math import inf
+
+import numpy as np
+
+from .core import NoFeasibleActionError
+
+
+class SimulationResult:
+    """
+    Results of plays computed by `Simulator.run`.
+
+    Attributes (arrays with a value for each play)
+    ==========
+     * hit_time: first step in which the play visited a target (-1 if never)
+     * visits: number of steps in which the play was in a target
+     * min_energy: the minimal energy level reached by the play
+     * error_step: step in which no action was feasible for the selector
+       (`NoFeasibleActionError`) or the energy dropped below 0; -1 if the
+       play did not stop before `steps`
+     * steps: number of simulated steps
+    """
+
+    def __init__(self, hit_time, visits, min_energy, error_step, steps):
+        self.hit_time = hit_time
+        self.visits = visits
+        self.min_energy = min_energy
+        self.error_step = error_step
+        self.steps = steps
+
+    @property
+    def num_plays(self):
+        return len(self.hit_time)
+
+    @property
+    def hit_rate(self):
+        """Fraction of plays that visited a target."""
+        return float(np.mean(self.hit_time >= 0))
+
+    @property
+    def errors(self):
+        """Number of plays stopped by an error."""
+        return int(np.count_nonzero(self.error_step >= 0))
+
+    def __repr__(self):
+        return (f"SimulationResult(num_plays={self.num_plays}, "
+                f"steps={self.steps}, hit_rate={self.hit_rate:.4f}, "
+                f"errors={self.errors})")
+
+
+class Simulator:
+    """
+    Simulator of plays of `selector` on `mdp` with energy `capacity`.
+
+    Parameters
+    ==========
+     * mdp: `ConsMDP` (or `LabeledConsMDP` if `aut` is given) or its frozen
+       snapshot
+     * selector: `CounterSelector`, `CompiledSelector`, or any object with
+       `select_action(state, energy)` that returns actions of `mdp`; with
+       `aut`, `ProductSelector` or `CompiledProductSelector` for the product
+       of `mdp` with `aut`
+     * capacity: energy capacity (must be finite)
+     * aut: deterministic Büchi automaton (Spot's automaton or
+       `DBAWrapper`) for product selectors, `None` otherwise
+
+    The tables of the selector (and of the automaton) are built once and
+    reused by all calls of `run`. They have `(capacity + 1)` entries for
+    each state of `mdp` (and of `aut`); capacities for which the table of
+    the selector would take more than `max_table_bytes` are rejected by
+    `ValueError`.
+    """
+
+    #: Limit on the size (in bytes) of the table of the selector
+    max_table_bytes = 2 ** 32
+
+    def __init__(self, mdp, selector, capacity, aut=None):
+        if capacity == inf:
+            raise ValueError("The simulator needs a finite capacity.")
+        self.mdp = mdp
+        self.capacity = capacity
+        frozen = mdp.freeze()
+        self._frozen = frozen
+
+        # Successors of actions with cumulative probabilities
+        self.succ_offsets = np.asarray(frozen.succ_offsets, dtype=np.int64)
+        self.succ_states = np.asarray(frozen.succ_states, dtype=np.int64)
+        cum = np.cumsum(frozen.succ_probs, dtype=np.float64)
+        starts = self.succ_offsets[:-1]
+        base = np.where(starts > 0, cum[starts - 1], 0.)
+        self.cum_probs = cum - np.repeat(base, np.diff(self.succ_offsets))
+        self.max_degree = int(np.diff(self.succ_offsets).max(initial=0))
+        self.consumption = np.asarray(frozen.consumption, dtype=np.int64)
+        self.reload_mask = np.asarray(frozen.reload_mask, dtype=bool)
+
+        self.dba = None
+        if aut is not None:
+            self._init_dba(aut)
+        self.table = self._selector_table(selector)
+
+    def _init_dba(self, aut):
+        """Build table of successors of automaton states for each state of
+        the mdp (given by the label of the state)."""
+        if not hasattr(aut, "edge_for_mask"):
+            from .labeled import DBAWrapper
+            aut = DBAWrapper(aut, self.mdp.AP)
+        self.dba = aut
+        num_aut = aut.aut.num_states()
+        self.accepting = np.array([bool(aut.aut.state_is_accepting(q))
+                                   for q in range(num_aut)], dtype=bool)
+
+        masks = [mask & aut.used_mask for mask in self._frozen.label_masks]
+        classes = {mask: c for c, mask in enumerate(dict.fromkeys(masks))}
+        self.label_class = np.array([classes[mask] for mask in masks],
+                                    dtype=np.int64)
+        self.aut_succ = np.array([[aut.edge_for_mask(q, mask).dst
+                                   for mask in classes]
+                                  for q in range(num_aut)], dtype=np.int64)
+
+    def _selector_table(self, selector):
+        """Return table of frozen action indices (-1 for no action) indexed
+        by row of the selector and energy level."""
+        if hasattr(selector, "compile"):
+            selector = selector.compile()
+        if self.dba is None and hasattr(selector, "num_other"):
+            raise ValueError("Selectors for products need the automaton "
+                             "given by `aut`.")
+
+        levels = self.capacity + 1
+        num_rows = self._frozen.num_states
+        if self.dba is not None:
+            num_rows *= self.accepting.size
+        size = num_rows * levels * np.dtype(np.int64).itemsize
+        if size > self.max_table_bytes:
+            raise ValueError(f"The table of the selector for capacity "
+                             f"{self.capacity} would take {size} bytes, more "
+                             f"than `max_table_bytes` ({self.max_table_bytes})"
+                             f"; use a smaller capacity.")
+        if not hasattr(selector, "thresholds"):
+            return self._table_by_selection(selector)
+
+        num_rows = len(selector.offsets) - 1
+        if self.dba is not None:
+            num_other = self.accepting.size
+            if selector.num_other > num_other:
+                raise ValueError("The selector uses more states of the "
+                                 "automaton than the automaton has.")
+            self.num_other = num_other
+        counts = np.diff(np.asarray(selector.offsets, dtype=np.int64))
+        rows = np.repeat(np.arange(num_rows), counts)
+        if self.dba is not None:
+            # Rows of the selector have `selector.num_other` columns
+            orig, other = np.divmod(rows, max(selector.num_other, 1))
+            rows = orig * self.num_other + other
+            num_rows = self._frozen.num_states * self.num_other
+        thresholds = np.asarray(selector.thresholds, dtype=np.int64)
+        actions = np.asarray(selector.action_indices,
+                             dtype=np.int64)[np.asarray(selector.actions)]
+
+        # Put actions to their thresholds and fill the rest of each row
+        table = np.full((num_rows, levels), -1, dtype=np.int64)
+        used = thresholds <= self.capacity
+        table[rows[used], thresholds[used]] = actions[used]
+        position = np.where(table >= 0, np.arange(levels), -1)
+        np.maximum.accumulate(position, axis=1, out=position)
+        filled = np.take_along_axis(table, np.maximum(position, 0), axis=1)
+        return np.where(position >= 0, filled, -1)
+
+    def _table_by_selection(self, selector):
+        """Build the table by calls to `selector.select_action`."""
+        if self.dba is not None:
+            raise ValueError("Selectors for products must be ProductSelector "
+                             "or CompiledProductSelector.")
+        frozen = self._frozen
+        index = {frozen.action(i): i for i in range(frozen.num_actions)}
+        table = np.full((frozen.num_states, self.capacity + 1), -1,
+                        dtype=np.int64)
+        for s in range(frozen.num_states):
+            for energy in range(self.capacity + 1):
+                try:
+                    table[s, energy] = index[selector.select_action(s,
+                                                                    energy)]
+                except NoFeasibleActionError:
+                    pass
+        return table
+
+    def run(self, init_state, init_energy, num_plays, steps, targets=None,
+            seed=None, init_aut_state=None):
+        """
+        Simulate `num_plays` plays of `steps` steps from `init_state` with
+        `init_energy` and return `SimulationResult`.
+
+        `targets` are states of the mdp counted as visits of targets; with
+        an automaton, the accepting states of the automaton are the targets.
+        `seed` is passed to `numpy.random.default_rng`. With an automaton,
+        `init_aut_state` is the state of the automaton in the initial
+        configuration; the successor of the initial state of the automaton
+        under the label of `init_state` by default.
+        """
+        rng = np.random.default_rng(seed)
+        capacity = self.capacity
+        table = self.table
+        dba = self.dba is not None
+
+        target_mask = np.zeros(self._frozen.num_states, dtype=bool)
+        if targets is not None and not dba:
+            target_mask[list(targets)] = True
+
+        alive = np.arange(num_plays)
+        state = np.full(num_plays, init_state, dtype=np.int64)
+        energy = np.full(num_plays, init_energy, dtype=np.int64)
+        if dba:
+            if init_aut_state is None:
+                init_aut_state = self.aut_succ[self.dba.get_init(),
+                                               self.label_class[init_state]]
+            aut_state = np.full(num_plays, init_aut_state, dtype=np.int64)
+
+        hit_time = np.full(num_plays, -1, dtype=np.int64)
+        visits = np.zeros(num_plays, dtype=np.int64)
+        min_energy = energy.copy()
+        error_step = np.full(num_plays, -1, dtype=np.int64)
+
+        def record_targets(step):
+            if dba:
+                in_target = self.accepting[aut_state]
+            else:
+                in_target = target_mask[state]
+            hit = alive[in_target]
+            visits[hit] += 1
+            hit = hit[hit_time[hit] < 0]
+            hit_time[hit] = step
+
+        record_targets(0)
+        for step in range(1, steps + 1):
+            row = state * self.num_other + aut_state if dba else state
+            action = table[row, np.clip(energy, 0, capacity)]
+
+            stopped = (action < 0) | (energy < 0)
+            if stopped.any():
+                error_step[alive[stopped]] = step - 1
+                keep = ~stopped
+                alive, state, energy, action = (alive[keep], state[keep],
+                                                energy[keep], action[keep])
+                if dba:
+                    aut_state = aut_state[keep]
+                if alive.size == 0:
+                    break
+
+            energy = np.where(self.reload_mask[state], capacity, energy)
+            energy -= self.consumption[action]
+
+            # Sample successors
+            entry = self.succ_offsets[action]
+            last = self.succ_offsets[action + 1] - 1
+            sample = rng.random(alive.size)
+            for _ in range(self.max_degree - 1):
+                entry += (sample >= self.cum_probs[entry]) & (entry < last)
+            state = self.succ_states[entry]
+            if dba:
+                aut_state = self.aut_succ[aut_state, self.label_class[state]]
+
+            min_energy[alive] = np.minimum(min_energy[alive], energy)
+            record_targets(step)
+
+        return SimulationResult(hit_time, visits, min_energy, error_step,
+                                steps)
+
+
+def simulate(strategy, num_plays, steps, targets=None, seed=None):
+    """
+    Simulate `num_plays` plays of `steps` steps that continue from the
+    current configuration of `strategy` (`CounterStrategy` or
+    `DBACounterStategy` whose current state is set).
+
+    See `Simulator.run` for `targets` and `seed`.
+    """
+    if strategy._current_state is None:
+        raise ValueError("The current state of the strategy is not set.")
+    aut = getattr(strategy, "aut", None)
+    simulator = Simulator(strategy.mdp, strategy.selector, strategy.capacity,
+                          aut=aut)
+    return simulator.run(strategy._current_state, strategy.energy, num_plays,
+                         steps, targets=targets, seed=seed,
+                         init_aut_state=getattr(strategy, "aut_state", None))
@@ -0,0 +1,339 @@
+"""
+Binary storage of ConsMDPs that can be opened memory-mapped.
+
+Models are stored by `save(mdp, path)` in an uncompressed `.npz` file (zip
+archive of `.npy` files). The member `header` holds a JSON header with the
+format version and the parts of the model that are not arrays (names of
+states, action labels, atomic propositions, ...). All other members are
+the arrays of the frozen snapshot of the model (see `ConsMDP.freeze()`):
+ * `action_offsets`, `consumption`, `succ_offsets`, `succ_states`,
+   `succ_probs`, and `reload_mask` as in `FrozenConsMDP`,
+ * `label_codes`: index of the label of each action in the list of labels
+   in the header,
+ * `succ_decimals`: the exact probabilities of `succ_probs` as decimal
+   strings,
+ * `label_offsets` and `label_aps` (for `LabeledConsMDP`): the sets of
+   atomic propositions of states in the CSR fashion,
+ * `components_orig`, `components_other`, `orig_action_indices` and
+   `other_action_indices` (for `ProductConsMDP`): the components of states
+   and the mappings of actions onto actions of `orig_mdp` and onto edges of
+   the automaton (if `other` is a Spot's automaton). The arrays of
+   `orig_mdp` are stored in the same file with the prefix `orig.`.
+
+`load(path)` returns a new model of the stored class (`ConsMDP`,
+`LabeledConsMDP`, or `ProductConsMDP`), `load(path, mmap=True)` returns
+its frozen snapshot (`FrozenConsMDP`, ...) whose arrays are memory-mapped
+from the file. Many processes that open the same file thus share the
+memory pages of the model and the arrays are not parsed at all.
+
+Frozen snapshots use the floats of `succ_probs`; models loaded without
+`mmap` get the exact `Decimal` probabilities of `succ_decimals`, so that
+they can be used to build products like the saved model. Labels of
+actions, names of states, and atomic propositions must be serializable to
+JSON.
+"""
+
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+from .core import ConsMDP, FrozenConsMDP, FrozenProductConsMDP, \
+    ProductConsMDP, _exact_probability
+
+FORMAT = "fimdp"
+VERSION = 1
+
+
+def save(mdp, path):
+    """
+    Store `mdp` (`ConsMDP`, `LabeledConsMDP`, `ProductConsMDP`, or their
+    frozen snapshots) into file `path`.
+
+    Raise `ValueError` if some part of the model cannot be stored.
+    """
+    arrays = {}
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "model": _store(mdp, arrays, ""),
+    }
+    try:
+        header = json.dumps(header).encode()
+    except TypeError as e:
+        raise ValueError(f"The model cannot be stored: {e}")
+    arrays["header"] = np.frombuffer(header, dtype=np.uint8)
+
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load(path, mmap=False):
+    """
+    Load model stored by `save` from file `path`.
+
+    If `mmap` is `True`, return a frozen snapshot of the model with arrays
+    memory-mapped from the file. Otherwise, return a new (mutable) model.
+
+    Raise `ValueError` if the file is not in a supported format.
+    """
+    if mmap:
+        arrays = _mmap_arrays(path)
+    else:
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+
+    if "header" not in arrays:
+        raise ValueError(f"File {path} does not contain a model.")
+    header = json.loads(bytes(arrays["header"]).decode())
+    if header.get("format") != FORMAT:
+        raise ValueError(f"File {path} does not contain a model.")
+    if header.get("version") != VERSION:
+        raise ValueError(f"Unsupported version {header.get('version')} of "
+                         f"the format (supported: {VERSION}).")
+
+    return _restore(header["model"], arrays, "", mmap)
+
+
+def _store(mdp, arrays, prefix):
+    """Put arrays of `mdp` into `arrays` and return its header."""
+    frozen = mdp.freeze()
+    labels = list(dict.fromkeys(frozen.labels))
+    codes = {label: i for i, label in enumerate(labels)}
+
+    for key in ["action_offsets", "consumption", "succ_offsets",
+                "succ_states", "succ_probs", "reload_mask"]:
+        arrays[prefix + key] = np.asarray(getattr(frozen, key))
+    arrays[prefix + "label_codes"] = np.array(
+        [codes[label] for label in frozen.labels], dtype=np.int64)
+    # The actions of the snapshot are those of the mdp with exact values
+    arrays[prefix + "succ_decimals"] = np.array(
+        [str(_exact_probability(p).normalize())
+         for i in range(frozen.num_actions)
+         for p in frozen.action(i).distr.values()], dtype=np.str_)
+
+    names = list(frozen.names)
+    header = {
+        "class": "ConsMDP",
+        "name": frozen.name,
+        "names": None if all(n is None for n in names) else names,
+        "labels": labels,
+    }
+
+    if hasattr(frozen, "AP"):
+        header["class"] = "LabeledConsMDP"
+        header["AP"] = list(frozen.AP)
+        state_labels = [sorted(label) for label in frozen.state_labels]
+        arrays[prefix + "label_offsets"] = np.cumsum(
+            [0] + [len(label) for label in state_labels], dtype=np.int64)
+        arrays[prefix + "label_aps"] = np.array(
+            [ap for label in state_labels for ap in label], dtype=np.int64)
+
+    if hasattr(frozen, "components"):
+        header["class"] = "ProductConsMDP"
+        header["orig"] = _store(frozen.orig_mdp, arrays, prefix + "orig.")
+        header["other"], other_edges = _store_other(frozen.other)
+        _store_components(frozen, header, arrays, prefix)
+        _store_action_mappings(frozen, other_edges, arrays, prefix)
+
+    return header
+
+
+def _store_other(other):
+    """Return header of the `other` component of a product and the list of
+    edges of `other` if it is an automaton."""
+    if _is_automaton(other):
+        edges = [other.edge_number(e)
+                 for s in range(other.num_states()) for e in other.out(s)]
+        return {"hoa": other.to_str("hoa")}, edges
+    return {"value": other}, None
+
+
+def _store_components(frozen, header, arrays, prefix):
+    """Store components of product states; components that are not `int`s
+    are stored in header under `special_components`."""
+    special = []
+    orig, other = [], []
+    for s, (orig_s, other_s) in enumerate(frozen.components):
+        if not (_is_int(orig_s) and _is_int(other_s)):
+            special.append([s, orig_s, other_s])
+            orig_s, other_s = 0, 0
+        orig.append(orig_s)
+        other.append(other_s)
+    header["special_components"] = special
+    arrays[prefix + "components_orig"] = np.array(orig, dtype=np.int64)
+    arrays[prefix + "components_other"] = np.array(other, dtype=np.int64)
+
+
+def _store_action_mappings(frozen, other_edges, arrays, prefix):
+    """Store `orig_action` and `other_action` of all product actions."""
+    orig = frozen.orig_mdp.freeze()
+    orig_index = {orig.action(i): i for i in range(orig.num_actions)}
+    if other_edges is not None:
+        edge_index = {e: i for i, e in enumerate(other_edges)}
+
+    orig_indices, other_indices = [], []
+    for i in range(frozen.num_actions):
+        a = frozen.action(i)
+        orig_a = frozen.orig_action(a)
+        orig_indices.append(-1 if orig_a is None else orig_index[orig_a])
+
+        other_a = frozen.other_action(a)
+        if other_a is None:
+            other_indices.append(-1)
+        elif other_edges is None:
+            raise ValueError(f"Value {other_a} returned by `other_action` "
+                             f"cannot be stored.")
+        else:
+            number = frozen.other.edge_number(other_a)
+            other_indices.append(edge_index[number])
+
+    arrays[prefix + "orig_action_indices"] = np.array(orig_indices,
+                                                      dtype=np.int64)
+    arrays[prefix + "other_action_indices"] = np.array(other_indices,
+                                                       dtype=np.int64)
+
+
+def _restore(header, arrays, prefix, mmap):
+    """Build model described by `header` from `arrays`."""
+    get = lambda key: arrays[prefix + key]
+    labels = header["labels"]
+    num_states = len(get("reload_mask"))
+    names = header["names"]
+    frozen_arrays = {
+        "action_offsets": get("action_offsets"),
+        "action_ids": np.arange(1, len(get("consumption")) + 1),
+        "consumption": get("consumption"),
+        "succ_offsets": get("succ_offsets"),
+        "succ_states": get("succ_states"),
+        "succ_probs": get("succ_probs"),
+        "reload_mask": get("reload_mask"),
+        "labels": [labels[code] for code in get("label_codes").tolist()],
+        "names": names,
+        "name": header["name"],
+    }
+
+    if header["class"] == "ConsMDP":
+        frozen = FrozenConsMDP(**frozen_arrays)
+        return frozen if mmap else _thaw(frozen, ConsMDP(), arrays, prefix)
+
+    if header["class"] == "LabeledConsMDP":
+        from .labeled import FrozenLabeledConsMDP, LabeledConsMDP
+
+        offsets = get("label_offsets").tolist()
+        aps = get("label_aps").tolist()
+        state_labels = [aps[offsets[s]:offsets[s + 1]]
+                        for s in range(num_states)]
+        frozen = FrozenLabeledConsMDP(header["AP"], state_labels,
+                                      **frozen_arrays)
+        if mmap:
+            return frozen
+        mdp = _thaw(frozen, LabeledConsMDP(header["AP"]), arrays, prefix)
+        mdp.state_labels = [set(label) for label in state_labels]
+        return mdp
+
+    if header["class"] == "ProductConsMDP":
+        orig = _restore(header["orig"], arrays, prefix + "orig.", mmap)
+        other, edges = _restore_other(header["other"])
+
+        components = list(zip(get("components_orig").tolist(),
+                              get("components_other").tolist()))
+        for s, orig_s, other_s in header["special_components"]:
+            components[s] = (orig_s, other_s)
+
+        orig_indices = get("orig_action_indices")
+        other_actions = None
+        if edges is not None:
+            other_actions = [None if i < 0 else edges[i]
+                             for i in get("other_action_indices").tolist()]
+
+        frozen = FrozenProductConsMDP(orig, other, components,
+                                      orig_action_indices=orig_indices,
+                                      other_actions=other_actions,
+                                      **frozen_arrays)
+        if mmap:
+            return frozen
+
+        mdp = _thaw(frozen, ProductConsMDP(orig, other), arrays, prefix)
+        mdp.components = components
+        mdp.components_to_states_d = {pair: s for s, pair
+                                      in enumerate(components)}
+        orig_frozen = orig.freeze()
+        for i, orig_i in enumerate(orig_indices.tolist()):
+            a = mdp.actions[i + 1]
+            if orig_i >= 0:
+                mdp.orig_action_mapping[a] = orig_frozen.action(orig_i)
+            if other_actions is not None and other_actions[i] is not None:
+                mdp.other_action_mapping[a] = other_actions[i]
+        return mdp
+
+    raise ValueError(f"Unknown class of model {header['class']}.")
+
+
+def _restore_other(header):
+    """Return the `other` component of a product and the list of its edges
+    (if it is an automaton)."""
+    if "hoa" in header:
+        import spot
+
+        aut = spot.automaton(header["hoa"])
+        edges = [e for s in range(aut.num_states()) for e in aut.out(s)]
+        return aut, edges
+    return header["value"], None
+
+
+def _thaw(frozen, mdp, arrays, prefix):
+    """Fill empty `mdp` with the structure of `frozen` and with the exact
+    probabilities stored in `arrays` (if present).
+
+    The actions are created in the order of their action indices.
+    """
+    transitions = frozen.to_arrays()
+    if prefix + "succ_decimals" in arrays:
+        transitions["probability"] = arrays[prefix + "succ_decimals"]
+    mdp._fill_from_arrays(**transitions)
+    mdp.name = frozen.name
+    return mdp
+
+
+def _mmap_arrays(path):
+    """Return dict of arrays stored in the `.npz` file `path` memory-mapped
+    from the file."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Member {info.filename} of {path} is "
+                                 "compressed and cannot be memory-mapped.")
+            # Skip the local header of the zip member
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            if dtype.hasobject:
+                raise ValueError(f"Member {info.filename} of {path} "
+                                 "contains Python objects.")
+
+            name = info.filename[:-len(".npy")]
+            if np.prod(shape) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r",
+                                         offset=f.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+def _is_int(value):
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+
+def _is_automaton(other):
+    return hasattr(other, "to_str") and hasattr(other, "edge_number")
@@ -0,0 +1,208 @@
+"""
+NumPy implementation of the largest fixpoints used by energy solvers.
+
+The functions work on frozen snapshots of ConsMDPs (see `ConsMDP.freeze()`)
+and compute the same values as `energy_solvers.largest_fixpoint` with the
+corresponding action-value functions. Instead of updating one state at a
+time, each iteration evaluates all actions at once:
+ 1. gather the values of all successors,
+ 2. compute the action values by segmented reductions over the successors
+    of each action,
+ 3. take per-state minima (and the first action that achieves it), and
+ 4. apply capacity (and reload) capping as array masks.
+
+The values of all states are updated at once at the end of the iteration
+and `on_update(s, v, a)` is called for each state whose value decreased.
+As the iterations are synchronous (and not in-place as in `SWEEP`), the
+reported intermediate values can differ, the fixpoint does not.
+
+The values are passed as lists (as used by the solvers) and are updated
+in place; finite values are stored as `int`s and infinite as `math.inf`.
+"""
+
+from math import inf
+
+import numpy as np
+
+
+def cons_fixpoint(mdp, values, cap, removed=(),
+                  on_update=lambda s, v, a: None):
+    """Largest fixpoint for minimal levels of energy needed to reach reload.
+
+    Vectorized counterpart of `largest_fixpoint` with the action value
+    `BasicES._action_value` (reload successors count as 0) and with
+    values above `cap` set to ∞.
+
+    Parameters
+    ==========
+     * mdp      : `FrozenConsMDP`
+     * values   : `list` of initial values, updated in place
+     * cap      : capacity
+     * removed  : iterable of reload states that are treated as normal
+                  states and whose values are not changed
+     * on_update: function called with `state × value × action` whenever
+                  the value of `state` decreases to `value` using `action`
+    """
+    if mdp.num_actions == 0:
+        return
+
+    removed_mask = _state_mask(mdp, removed)
+    zero_succ = (mdp.reload_mask & ~removed_mask)[mdp.succ_states]
+    action_starts = mdp.succ_offsets[:-1]
+    cons = mdp.consumption.astype(float)
+
+    def action_values(v):
+        succ_v = np.where(zero_succ, 0, v[mdp.succ_states])
+        return cons + np.maximum.reduceat(succ_v, action_starts), None
+
+    def value_adj(cand):
+        cand[cand > cap] = inf
+        return cand
+
+    _largest_fixpoint(mdp, values, action_values, value_adj,
+                      skip=removed_mask, on_update=on_update)
+
+
+def reach_fixpoint(mdp, values, survival, cap, skip=(),
+                   on_update=lambda s, v, a: None,
+                   threshold=0, prefer_likely=False):
+    """Largest fixpoint for minimal levels of energy needed to reach targets.
+
+    Vectorized counterpart of `largest_fixpoint` with the action value
+    `BasicES._action_value_T` and with `BasicES._reload_capper`. If
+    `prefer_likely` is `True`, the action values and the choice of actions
+    follow `GoalLeaningES` (`threshold` and `pick_best_action`).
+
+    Parameters
+    ==========
+     * mdp      : `FrozenConsMDP`
+     * values   : `list` of initial values, updated in place
+     * survival : `list`, level of energy needed to survive in each state
+     * cap      : capacity
+     * skip     : iterable of states whose values are not changed
+     * on_update: function called with `state × value × action` whenever
+                  the value of `state` decreases to `value` using `action`
+     * threshold: successors with probability below `threshold` cannot
+                  be picked as the preferred successor
+     * prefer_likely: among actions (successors) with the same value, prefer
+                  the one with the highest probability of the preferred
+                  successor
+    """
+    if mdp.num_actions == 0:
+        return
+
+    succ = mdp.succ_states
+    num_succs = len(succ)
+    action_starts = mdp.succ_offsets[:-1]
+    entry_action = np.repeat(np.arange(mdp.num_actions),
+                             np.diff(mdp.succ_offsets))
+    positions = np.arange(num_succs)
+    cons = mdp.consumption.astype(float)
+
+    # For each successor `t` of `a`, compute the maximum of survival values
+    # of the other successors of `a`. It is the maximum over all successors
+    # unless `t` is the (first) successor with the maximal survival value.
+    surv = np.asarray(survival, dtype=float)[succ]
+    max_surv = np.maximum.reduceat(surv, action_starts)
+    is_max = surv == max_surv[entry_action]
+    first_max = np.minimum.reduceat(np.where(is_max, positions, num_succs),
+                                    action_starts)
+    without_max = surv.copy()
+    without_max[first_max] = -inf
+    second_surv = np.maximum.reduceat(without_max, action_starts)
+    others_surv = np.where(positions == first_max[entry_action],
+                           second_surv[entry_action],
+                           max_surv[entry_action])
+
+    below_threshold = mdp.succ_probs < threshold
+
+    def action_values(v):
+        t_v = np.maximum(v[succ], others_surv)
+        t_v[below_threshold] = inf
+        best_t_v = np.minimum.reduceat(t_v, action_starts)
+        probs = None
+        if prefer_likely:
+            picked = (t_v == best_t_v[entry_action]) & ~below_threshold
+            probs = np.maximum.reduceat(np.where(picked, mdp.succ_probs, 0),
+                                        action_starts)
+        return cons + best_t_v, probs
+
+    def value_adj(cand):
+        # "+1"-trick handles cap = ∞
+        over = cand >= cap + 1
+        cand[mdp.reload_mask] = 0
+        cand[over] = inf
+        return cand
+
+    _largest_fixpoint(mdp, values, action_values, value_adj,
+                      skip=_state_mask(mdp, skip), on_update=on_update)
+
+
+def _largest_fixpoint(mdp, values, action_values, value_adj, skip,
+                      on_update):
+    """Iterate synchronous updates of `values` until fixpoint.
+
+    `action_values(v)` returns a pair of arrays with the values of all
+    actions and the probabilities used to break ties (or `None`).
+    `value_adj(cand)` adjusts the array of candidate values.
+    """
+    num_states = mdp.num_states
+    v = np.asarray(values, dtype=float)
+
+    has_actions = np.diff(mdp.action_offsets) > 0
+    state_starts = mdp.action_offsets[:-1][has_actions]
+    updatable = has_actions & ~skip
+
+    while True:
+        act_v, act_p = action_values(v)
+        best_a, best_v = _state_argmin(mdp, act_v, act_p,
+                                       has_actions, state_starts)
+        cand = np.full(num_states, inf)
+        cand[has_actions] = best_v
+        cand = value_adj(cand)
+
+        improved = np.flatnonzero(updatable & (cand < v))
+        if len(improved) == 0:
+            break
+        v[improved] = cand[improved]
+        for s in improved.tolist():
+            value = _to_value(v[s])
+            values[s] = value
+            on_update(s, value, mdp.action(int(best_a[s])))
+
+
+def _state_argmin(mdp, act_v, act_p, has_actions, state_starts):
+    """Return the first action with minimal value for each state and the
+    minimal values (only for states with actions).
+
+    If `act_p` is given, actions with the same value are compared by
+    `act_p` (higher is better).
+    """
+    best_v = np.minimum.reduceat(act_v, state_starts)
+    state_best_v = np.full(mdp.num_states, inf)
+    state_best_v[has_actions] = best_v
+    is_best = act_v == state_best_v[mdp.action_src]
+
+    if act_p is not None:
+        best_p = np.maximum.reduceat(np.where(is_best, act_p, -1),
+                                     state_starts)
+        state_best_p = np.zeros(mdp.num_states)
+        state_best_p[has_actions] = best_p
+        is_best &= act_p == state_best_p[mdp.action_src]
+
+    indices = np.where(is_best, np.arange(mdp.num_actions), mdp.num_actions)
+    best_a = np.zeros(mdp.num_states, dtype=np.int64)
+    best_a[has_actions] = np.minimum.reduceat(indices, state_starts)
+    return best_a, best_v
+
+
+def _state_mask(mdp, states):
+    """Boolean array with `True` for the given states."""
+    mask = np.zeros(mdp.num_states, dtype=bool)
+    mask[list(states)] = True
+    return mask
+
+
+def _to_value(x):
+    """Convert array value back to `int` (or `inf`)."""
+    return inf if x == inf else int(x)
@@ -22,7 +22,8 @@ setup(
     python_requires=">=3.6.0",
     packages=['fimdp'],
     install_requires=[
-        'ipython>=7.13.0',
+        'ipython>=7.13.0',
+        'numpy>=1.18.1',
     ]
 )
 
@@ -1,7 +1,14 @@
 #!/bin/bash
 set -e
 
+python3 test_batch.py
 python3 test_buchi.py
+python3 test_cache.py
+python3 test_compiled.py
+python3 test_consmdp.py
+python3 test_engines.py
+python3 test_explicit.py
+python3 test_frozen.py
 python3 test_lcmdp.py
 python3 test_mecs.py
 python3 test_mincap.py
@@ -9,6 +16,8 @@ python3 test_product.py
 python3 test_product_selector.py
 python3 test_reachability.py
 python3 test_safety.py
+python3 test_simulate.py
+python3 test_storage.py
 python3 test_strategy.py
 python3 test_strategy_old.py
 jupyter nbconvert --execute ../tut/ExplicitEnergy.ipynb --to html
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test parallel solving of many tasks
+
+import pickle
+
+from fimdp.batch import SharedModel, SolverSpec, grid_specs, solve_batch
+from fimdp.energy_solvers import BasicES, GoalLeaningES, LabelSettingES, NUMPY
+from fimdp.objectives import SAFE, POS_REACH, AS_REACH, BUCHI
+from reachability_examples import ultimate
+
+m, T = ultimate()
+
+# ## Solvers and their specifications can be pickled
+
+for SolverClass in [BasicES, GoalLeaningES, LabelSettingES]:
+    solver = SolverClass(m, 15, T)
+    solver.get_selector(BUCHI)
+    copy = pickle.loads(pickle.dumps(solver))
+    assert copy.get_min_levels(BUCHI) == solver.get_min_levels(BUCHI)
+    assert copy.get_min_levels(AS_REACH) == solver.get_min_levels(AS_REACH)
+
+spec = SolverSpec(15, T, BUCHI, GoalLeaningES, threshold=0.5)
+copy = pickle.loads(pickle.dumps(spec))
+assert repr(copy) == repr(spec)
+assert copy.create(m).threshold == 0.5
+print("Passed test 1 for pickling in file test_batch.py")
+
+# ## Models in shared memory
+
+with SharedModel(m) as shared:
+    frozen = SharedModel.attach(pickle.loads(pickle.dumps(shared.descriptor)))
+    for obj in [SAFE, POS_REACH, AS_REACH, BUCHI]:
+        assert BasicES(frozen, 15, T).get_min_levels(obj) == \
+               BasicES(m, 15, T).get_min_levels(obj)
+    assert frozen.labels == m.freeze().labels
+    del frozen
+print("Passed test 1 for SharedModel in file test_batch.py")
+
+# ## Batch solving
+
+
+def rules(selector):
+    return [sorted((e, a.label) for e, a in rule.items()) for rule in selector]
+
+
+specs = grid_specs([10, 15], [T, [0], [3, 5]], [SAFE, AS_REACH, BUCHI],
+                   (BasicES, GoalLeaningES))
+specs.append(SolverSpec(20, T, BUCHI, engine=NUMPY))
+assert len(specs) == 2 * 2 * 3 * 3 + 1
+
+results = list(solve_batch(m, specs, max_workers=2, selectors=True))
+assert sorted(r.index for r in results) == list(range(len(specs)))
+for result in results:
+    spec = result.spec
+    assert spec is specs[result.index]
+    solver = spec.create(m)
+    assert result.min_levels == solver.get_min_levels(spec.objective)
+    assert result.selector.mdp is m
+    assert rules(result.selector) == rules(solver.get_selector(spec.objective))
+    assert result.time >= 0
+print("Passed test 1 for solve_batch in file test_batch.py")
+
+results = list(solve_batch(m, specs[:3], max_workers=1))
+assert all(r.selector is None for r in results)
+print("Passed test 2 for solve_batch in file test_batch.py")
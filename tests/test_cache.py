@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test on-disk cache of results of solvers
+
+import os
+import tempfile
+
+from fimdp.cache import ResultCache
+from fimdp.energy_solvers import BasicES, GoalLeaningES
+from fimdp.objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+from reachability_examples import basic, ultimate
+
+objectives = [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]
+
+
+def rules(selector):
+    return [sorted((e, a.label) for e, a in rule.items()) for rule in selector]
+
+
+# ## Fingerprints
+# The fingerprint depends only on the structure of the mdp.
+
+m, T = ultimate()
+m2, _ = ultimate()
+assert m.fingerprint() == m2.fingerprint()
+assert m.fingerprint() == m.freeze().fingerprint()
+m2.names[0] = "renamed"
+assert m.fingerprint() == m2.fingerprint()
+m2.set_reload(0)
+assert m.fingerprint() != m2.fingerprint()
+assert m.fingerprint() != basic()[0].fingerprint()
+print("Passed test 1 for fingerprints in file test_cache.py")
+
+# ## Results are stored and reused
+
+cache = ResultCache(tempfile.mkdtemp())
+for SolverClass in [BasicES, GoalLeaningES]:
+    for obj in objectives:
+        expected = SolverClass(m, 15, T)
+
+        solver = SolverClass(m, 15, T)
+        solver.cache = cache
+        assert solver.get_min_levels(obj) == expected.get_min_levels(obj)
+
+        # The second solver does not compute anything
+        cached = SolverClass(m, 15, T)
+        cached.cache = cache
+        cached.compute = None
+        assert cached.get_min_levels(obj) == expected.get_min_levels(obj)
+        assert rules(cached.get_selector(obj)) == \
+               rules(expected.get_selector(obj))
+        assert cached.get_selector(obj).mdp is m
+print("Passed test 1 for ResultCache in file test_cache.py")
+
+# Different tasks do not share results
+
+solver = BasicES(m, 14, T)
+solver.cache = cache
+assert solver.get_min_levels(BUCHI) == BasicES(m, 14, T).get_min_levels(BUCHI)
+solver = GoalLeaningES(m, 15, T, threshold=0.5)
+assert cache.key(solver, BUCHI) != cache.key(GoalLeaningES(m, 15, T), BUCHI)
+assert cache.key(solver, BUCHI) != cache.key(solver, AS_REACH)
+print("Passed test 2 for ResultCache in file test_cache.py")
+
+# Entries of solvers with lazy selectors have no selectors; they are built
+# by repeating the last round of the computation, not by computing again.
+
+lazy_cache = ResultCache(tempfile.mkdtemp())
+for obj in objectives:
+    expected = BasicES(m, 15, T)
+    lazy = BasicES(m, 15, T)
+    lazy.lazy_selectors = True
+    lazy.cache = lazy_cache
+    lazy.get_min_levels(obj)
+    assert not lazy.strategy
+
+    for lazy_selectors in [False, True]:
+        cached = BasicES(m, 15, T)
+        cached.lazy_selectors = lazy_selectors
+        cached.cache = lazy_cache
+        cached.compute = None
+        assert cached.get_min_levels(obj) == expected.get_min_levels(obj)
+        assert rules(cached.get_selector(obj)) == \
+               rules(expected.get_selector(obj))
+print("Passed test 3 for ResultCache in file test_cache.py")
+
+# ## Eviction of least recently used entries
+
+small = ResultCache(tempfile.mkdtemp(), max_bytes=1)
+solver = BasicES(m, 15, T)
+solver.cache = small
+solver.get_min_levels(SAFE)
+assert len(os.listdir(small.directory)) == 0
+
+cache.max_bytes = 0
+cache.evict()
+assert len(os.listdir(cache.directory)) == 0
+print("Passed test 4 for ResultCache in file test_cache.py")
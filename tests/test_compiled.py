@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test compiled selectors
+# Compiled selectors must select the same actions as the selectors they
+# were compiled from, also after storing and memory-mapped loading.
+
+import os
+import random
+import tempfile
+
+from fimdp.compiled import CompiledCounterStrategy, CompiledProductSelector, \
+    CompiledSelector
+from fimdp.core import CounterStrategy, NoFeasibleActionError, \
+    ProductSelector
+from fimdp.energy_solvers import BasicES
+from fimdp.explicit import product_energy
+from fimdp.objectives import SAFE, BUCHI
+from reachability_examples import ultimate
+
+m, T = ultimate()
+cap = 15
+solver = BasicES(m, cap, T)
+selector = solver.get_selector(BUCHI)
+frozen = m.freeze()
+
+
+def check_same(compiled, selector):
+    for s in range(m.num_states):
+        for energy in range(cap + 2):
+            try:
+                expected = selector.select_action(s, energy)
+            except NoFeasibleActionError:
+                try:
+                    compiled.select(s, energy)
+                    assert False
+                except NoFeasibleActionError:
+                    continue
+            i = compiled.select(s, energy)
+            assert frozen.action(compiled.action_indices[i]) is expected
+            assert compiled.select_action(s, energy) == expected.label
+            assert compiled.action_cons[i] == expected.cons
+
+
+compiled = selector.compile()
+assert isinstance(compiled, CompiledSelector)
+assert len(compiled.offsets) == m.num_states + 1
+assert len(compiled.thresholds) == sum(len(rule) for rule in selector)
+check_same(compiled, selector)
+print("Passed test 1 for CompiledSelector in file test_compiled.py")
+
+# ## Storage
+
+tmp_dir = tempfile.mkdtemp()
+path = os.path.join(tmp_dir, "selector.npz")
+compiled.save(path)
+for mmap in [False, True]:
+    loaded = CompiledSelector.load(path, mmap=mmap)
+    assert type(loaded) == CompiledSelector
+    assert loaded.action_labels == compiled.action_labels
+    check_same(loaded, selector)
+print("Passed test 2 for CompiledSelector in file test_compiled.py")
+
+# ## Strategy
+# Plays of CompiledCounterStrategy follow plays of CounterStrategy.
+
+rnd = random.Random(42)
+for init_state in [0, 3, 6]:
+    energy = solver.get_min_levels(BUCHI)[init_state]
+    strategy = CounterStrategy(m, selector, cap, energy, init_state)
+    compiled_strategy = CompiledCounterStrategy(loaded, cap, energy,
+                                                init_state)
+    outcome = None
+    for _ in range(200):
+        action = strategy.next_action(outcome)
+        assert compiled_strategy.next_action(outcome) == action.label
+        assert compiled_strategy.energy == strategy.energy
+        outcome = rnd.choices(list(action.distr),
+                              weights=list(action.distr.values()))[0]
+print("Passed test 3 for CompiledCounterStrategy in file test_compiled.py")
+
+# ## Product selectors
+
+p, pT = product_energy(m, cap, T)
+product_solver = BasicES(p, cap, pT)
+product_solver.SelectorClass = ProductSelector
+product_selector = product_solver.get_selector(SAFE)
+
+compiled = product_selector.compile()
+assert isinstance(compiled, CompiledProductSelector)
+assert compiled.num_other == cap + 1
+path = os.path.join(tmp_dir, "product_selector.npz")
+compiled.save(path)
+loaded = CompiledSelector.load(path, mmap=True)
+assert type(loaded) == CompiledProductSelector
+
+for orig_state in range(m.num_states):
+    for e in range(cap + 1):
+        for energy in range(cap + 1):
+            try:
+                expected = product_selector.select_action(orig_state, e,
+                                                          energy)
+            except (KeyError, NoFeasibleActionError):
+                try:
+                    loaded.select(orig_state, e, energy)
+                    assert False
+                except NoFeasibleActionError:
+                    continue
+            i = loaded.select(orig_state, e, energy)
+            assert frozen.action(loaded.action_indices[i]) is expected
+            assert loaded.select_action(orig_state, e, energy) == \
+                   expected.label
+print("Passed test 4 for CompiledProductSelector in file test_compiled.py")
+
+# ## Batch selection
+# `select_actions` of product selectors selects the same actions as
+# `select_action`, given by their indices in the frozen original mdp.
+
+import numpy as np
+
+from fimdp.core import ProductSelectorWrapper
+
+p_selector = BasicES(p, cap, pT).get_selector(SAFE)
+wrapper = ProductSelectorWrapper(p, p_selector)
+num_other = cap + 1
+orig_states = np.repeat(np.arange(m.num_states), num_other * (cap + 2))
+other_states = np.tile(np.repeat(np.arange(num_other), cap + 2),
+                       m.num_states)
+energies = np.tile(np.arange(cap + 2), m.num_states * num_other)
+for batch_selector in [product_selector, wrapper]:
+    ids = batch_selector.select_actions(orig_states, other_states, energies)
+    for orig_state, e, energy, i in zip(orig_states, other_states, energies,
+                                        ids):
+        try:
+            expected = batch_selector.select_action(int(orig_state), int(e),
+                                                    int(energy))
+        except (KeyError, TypeError, NoFeasibleActionError):
+            # TypeError: the wrapper has no product state for the pair
+            assert i == -1
+            continue
+        assert frozen.action(i) is expected
+assert list(wrapper.select_actions([0], [num_other], [cap])) == [-1]
+
+energies = product_selector.update_energies(orig_states[ids >= 0],
+                                            ids[ids >= 0], cap, cap)
+assert (energies == cap - frozen.consumption[ids[ids >= 0]]).all()
+
+# New and changed rules are noticed
+for s in range(p.num_states):
+    orig_state, e = p.components[s]
+    if orig_state >= 0 and e not in product_selector.get(orig_state, {}):
+        break
+a = next(iter(p.actions_for_state(s)))
+product_selector.update(s, 0, a)
+ids = product_selector.select_actions([orig_state], [e], [0])
+assert frozen.action(ids[0]) is p.orig_action(a)
+product_selector[orig_state][e].pop(0)
+assert list(product_selector.select_actions([orig_state], [e], [0])) == [-1]
+print("Passed test 5 for ProductSelector.select_actions in file "
+      "test_compiled.py")
+
+# ## Non-integer energies
+# `select_indices` selects the same as `select` also for energies that are
+# not integers (e.g. -0.5 has no feasible action).
+
+import numpy as np
+
+compiled = selector.compile()
+states = np.repeat(np.arange(m.num_states), 2 * cap + 6)
+energies = np.tile(np.arange(-1.5, cap + 1.5, 0.5), m.num_states)
+indices = compiled.select_indices(states, energies)
+for s, energy, i in zip(states, energies, indices):
+    try:
+        assert compiled.select(int(s), float(energy)) == i
+    except NoFeasibleActionError:
+        assert i == -1
+assert compiled.select_indices([0], [-0.5])[0] == -1
+print("Passed test 6 for CompiledSelector.select_indices in file "
+      "test_compiled.py")
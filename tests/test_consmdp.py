@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test building and modifications of ConsMDPs
+
+from fimdp.core import ConsMDP
+
+
+def labels(mdp, s):
+    return [a.label for a in mdp.actions_for_state(s)]
+
+
+# ## Adding and removing actions
+# New actions are appended to the actions of the state, also after
+# removal of the last action.
+
+m = ConsMDP()
+m.new_states(3)
+for label in "abcd":
+    m.add_action(0, {1: 1}, label, 1)
+m.add_action(1, {2: 1}, "a", 1)
+assert labels(m, 0) == ["a", "b", "c", "d"]
+
+m.remove_action(4)
+m.add_action(0, {2: 1}, "e", 1)
+assert labels(m, 0) == ["a", "b", "c", "e"]
+
+m.remove_action(1)
+m.add_action(0, {2: 1}, "a", 2)
+assert labels(m, 0) == ["b", "c", "e", "a"]
+print("Passed test 1 for adding and removing actions in file test_consmdp.py")
+
+# Labels of removed actions can be used again, the others can't
+
+try:
+    m.add_action(0, {2: 1}, "b", 2)
+    assert False
+except ValueError:
+    pass
+
+it = m.out_iteraser(0)
+for a in it:
+    if a.label in ["b", "c", "a"]:
+        it.erase()
+assert labels(m, 0) == ["e"]
+for label in "abc":
+    m.add_action(0, {2: 1}, label, 2)
+assert labels(m, 0) == ["e", "a", "b", "c"]
+print("Passed test 2 for adding and removing actions in file test_consmdp.py")
+
+# Removing all actions of a state
+
+it = m.out_iteraser(0)
+for a in it:
+    it.erase()
+assert labels(m, 0) == []
+m.add_action(0, {1: 1}, "a", 1)
+assert labels(m, 0) == ["a"]
+assert labels(m, 1) == ["a"]
+print("Passed test 3 for adding and removing actions in file test_consmdp.py")
+
+# ## Bulk construction from arrays
+
+from reachability_examples import ultimate
+from fimdp.energy_solvers import BasicES
+from fimdp.objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+
+
+def actions(mdp, s):
+    return [(a.label, a.cons, {t: float(p) for t, p in a.distr.items()})
+            for a in mdp.actions_for_state(s)]
+
+
+m, T = ultimate()
+m2 = ConsMDP.from_arrays(**m.to_arrays())
+assert m2.num_states == m.num_states
+assert m2.reloads == [bool(r) for r in m.reloads]
+for s in range(m.num_states):
+    assert actions(m2, s) == actions(m, s)
+print("Passed test 1 for from_arrays in file test_consmdp.py")
+
+# Transitions can come in any order; actions of a state are created in
+# the order of their first transition.
+
+m3 = ConsMDP.from_arrays(src=[1, 0, 1, 0, 1],
+                         label=["b", "a", "a", "a", "b"],
+                         consumption=[2, 1, 3, 1, 2],
+                         successor=[0, 1, 1, 0, 1],
+                         probability=[.25, .5, 1, .5, .75],
+                         reloads=[True, False],
+                         names=["r", "s"])
+assert actions(m3, 0) == [("a", 1, {1: .5, 0: .5})]
+assert actions(m3, 1) == [("b", 2, {0: .25, 1: .75}), ("a", 3, {1: 1})]
+assert m3.state_with_name("s") == 1
+assert m3.is_reload(0) and not m3.is_reload(1)
+
+# The result behaves like a ConsMDP built by add_action
+m3.add_action(0, {0: 1}, "b", 0)
+assert actions(m3, 0) == [("a", 1, {1: .5, 0: .5}), ("b", 0, {0: 1})]
+try:
+    m3.add_action(1, {0: 1}, "a", 0)
+    assert False
+except ValueError:
+    pass
+print("Passed test 2 for from_arrays in file test_consmdp.py")
+
+# Invalid inputs are reported
+
+invalid = [
+    # probabilities do not sum up to 1
+    dict(src=[0, 0], label=["a", "a"], consumption=[1, 1],
+         successor=[0, 1], probability=[.5, .6]),
+    # different consumption for one action
+    dict(src=[0, 0], label=["a", "a"], consumption=[1, 2],
+         successor=[0, 1], probability=[.5, .5]),
+    # repeated successor
+    dict(src=[0, 0], label=["a", "a"], consumption=[1, 1],
+         successor=[1, 1], probability=[.5, .5]),
+    # non-existent state
+    dict(src=[0], label=["a"], consumption=[1],
+         successor=[2], probability=[1], num_states=2),
+    # arrays of different lengths
+    dict(src=[0, 1], label=["a"], consumption=[1],
+         successor=[1], probability=[1]),
+]
+for kwargs in invalid:
+    try:
+        ConsMDP.from_arrays(**kwargs)
+        assert False, kwargs
+    except ValueError:
+        pass
+print("Passed test 3 for from_arrays in file test_consmdp.py")
+
+# Probabilities are stored exactly, so that they can be used for new
+# actions and products (0.7 + 0.2 + 0.1 != 1 for floats).
+
+from decimal import Decimal
+from fimdp.explicit import product_energy
+
+m5 = ConsMDP.from_arrays(src=[0, 0, 0, 1, 1, 1],
+                         label=["a", "a", "a", "b", "b", "b"],
+                         consumption=[1, 1, 1, 2, 2, 2],
+                         successor=[0, 1, 2, 0, 1, 2],
+                         probability=[.7, .2, .1, 1/3, 1/3, 1/3],
+                         reloads=[True, False, False])
+assert next(iter(m5.actions_for_state(0))).distr == \
+       {0: Decimal("0.7"), 1: Decimal("0.2"), 2: Decimal("0.1")}
+for s in [0, 1]:
+    assert sum(next(iter(m5.actions_for_state(s))).distr.values()) == 1
+m5.add_action(2, next(iter(m5.actions_for_state(1))).distr, "c", 0)
+p, pT = product_energy(m5, 5, [1])
+assert p.num_states > 0
+print("Passed test 4 for from_arrays in file test_consmdp.py")
+
+# ## Bulk construction from scipy.sparse matrices
+
+matrices, consumption = m.to_scipy()
+m4 = ConsMDP.from_scipy(matrices, consumption, reloads=m.reloads)
+for s in range(m.num_states):
+    assert sorted(actions(m4, s), key=str) == sorted(actions(m, s), key=str)
+for obj in [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]:
+    assert BasicES(m4, 15, T).get_min_levels(obj) == \
+           BasicES(m, 15, T).get_min_levels(obj)
+print("Passed test 1 for from_scipy in file test_consmdp.py")
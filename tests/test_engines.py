@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test fixpoint engines of energy solvers
+# All engines must compute the same minimal levels as the default `SWEEP`
+# engine and must produce selectors that offer an action for each state and
+# the minimal level of energy in each state that is not a reload.
+
+from math import inf
+
+from reachability_examples import basic, little_alsure, little_alsure2, ultimate
+from fimdp.energy_solvers import BasicES, GoalLeaningES, LeastFixpointES, \
+    NUMPY, WORKLIST
+from fimdp.objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+
+objectives = [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]
+examples = [basic, little_alsure, little_alsure2, ultimate]
+
+
+def check_engine(SolverClass, engine, **kwargs):
+    for example in examples:
+        m, T = example()
+        for cap in [5, 10, 15, 30, inf]:
+            reference = SolverClass(m, cap, T, **kwargs)
+            solver = SolverClass(m, cap, T, engine=engine, **kwargs)
+            for obj in objectives:
+                expected = reference.get_min_levels(obj)
+                result = solver.get_min_levels(obj)
+                assert result == expected, (
+                    f"{SolverClass.__name__} with engine {engine} returns "
+                    f"wrong values for objective {obj} and capacity {cap}:\n"
+                    f"  expected: {expected}\n  returns:  {result}\n")
+
+                # Reload states are refilled to `cap` and thus their
+                # selectors are not queried with their minimal levels
+                selector = solver.get_selector(obj)
+                for s in range(m.num_states):
+                    if result[s] < cap + 1 and not m.is_reload(s):
+                        a = selector.select_action(s, result[s])
+                        assert a.src == s
+
+
+# ## NUMPY engine
+
+check_engine(BasicES, NUMPY)
+print("Passed test 1 for NUMPY engine in file test_engines.py")
+
+check_engine(GoalLeaningES, NUMPY)
+check_engine(GoalLeaningES, NUMPY, threshold=0.3)
+print("Passed test 2 for NUMPY engine in file test_engines.py")
+
+# Unknown engines are reported
+
+m, T = ultimate()
+try:
+    BasicES(m, 15, T, engine="unknown")
+    assert False
+except ValueError:
+    print("Passed test 3 for NUMPY engine in file test_engines.py")
+
+# ## WORKLIST engine
+
+check_engine(BasicES, WORKLIST)
+print("Passed test 1 for WORKLIST engine in file test_engines.py")
+
+check_engine(GoalLeaningES, WORKLIST)
+check_engine(GoalLeaningES, WORKLIST, threshold=0.3)
+print("Passed test 2 for WORKLIST engine in file test_engines.py")
+
+for example in examples:
+    m, T = example()
+    for cap in [5, 10, 15, 30, inf]:
+        expected = LeastFixpointES(m, cap, T).get_min_levels(SAFE)
+        result = LeastFixpointES(m, cap, T, engine=WORKLIST).get_min_levels(SAFE)
+        assert result == expected, (
+            f"LeastFixpointES with engine {WORKLIST} returns wrong values "
+            f"for capacity {cap}:\n"
+            f"  expected: {expected}\n  returns:  {result}\n")
+print("Passed test 3 for WORKLIST engine in file test_engines.py")
+
+# Predecessors index is the same for ConsMDP and its frozen snapshot
+# and is updated after changes of the structure.
+m, T = ultimate()
+expected = [set() for s in range(m.num_states)]
+for s in range(m.num_states):
+    for t in m.state_succs(s):
+        expected[t].add(s)
+frozen = m.freeze()
+for s in range(m.num_states):
+    assert set(m.predecessors(s)) == expected[s]
+    assert frozen.predecessors(s) == m.predecessors(s)
+
+s = m.new_state()
+m.add_action(s, {0: 1}, "new", 1)
+assert s in m.predecessors(0)
+assert m.predecessors(s) == ()
+print("Passed test 4 for WORKLIST engine in file test_engines.py")
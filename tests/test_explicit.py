@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test explicit encoding of energy into state-space
+
+from math import inf
+
+from reachability_examples import basic, little_alsure2, ultimate
+from fimdp.core import ConsMDP, ProductConsMDP
+from fimdp.energy_solvers import BasicES
+from fimdp.explicit import EnergyProductConsMDP, ExplicitES, product_energy
+from fimdp.objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+
+m, T = ultimate()
+cap = 15
+p, pT = product_energy(m, cap, T)
+
+assert isinstance(p, EnergyProductConsMDP)
+assert isinstance(p, ProductConsMDP)
+assert len(p.components) == p.num_states
+for s, (orig_s, e) in enumerate(p.components):
+    assert p.get_state(orig_s, e) == s
+    assert p.names[s] == f"{orig_s},{e}" or (orig_s, e) == (-1, "-∞")
+    assert p.state_with_name(p.names[s]) == s
+    assert p.is_reload(s) == (orig_s >= 0 and m.is_reload(orig_s))
+    if orig_s >= 0:
+        assert (s in pT) == (orig_s in T)
+assert p.components_to_states_d == {c: s for s, c in enumerate(p.components)}
+assert p.get_state(0, cap + 1) is None
+assert p.get_state("0", 1) is None
+assert p.state_with_name("0,16") is None
+print("Passed test 1 for product_energy in file test_explicit.py")
+
+# ## Successors
+# Actions go to `(s', e - c)` or to `(r, cap)` for reloads, or to the sink.
+
+sink = p.get_state(-1, "-∞")
+assert sink is not None and p.names[sink] == "sink,-∞"
+for s, (orig_s, e) in enumerate(p.components):
+    if orig_s < 0:
+        continue
+    for a in p.actions_for_state(s):
+        orig_a = p.orig_action(a)
+        assert orig_a.src == orig_s and orig_a.label == a.label
+        if e < a.cons:
+            assert list(a.distr) == [sink]
+            continue
+        expected = {p.get_state(t, cap if m.is_reload(t) else e - a.cons): prob
+                    for t, prob in orig_a.distr.items()}
+        assert a.distr == expected
+print("Passed test 2 for product_energy in file test_explicit.py")
+
+# ## Initial states
+# Only states reachable from the given initial states are built.
+
+q, qT = product_energy(m, cap, T, init_states=[0])
+assert q.num_states < p.num_states
+assert q.components[0] == (0, cap)
+for s, (orig_s, e) in enumerate(q.components):
+    assert p.get_state(orig_s, e) is not None
+
+# The levels of energy needed from (s, cap) agree with the full product
+full = BasicES(p, cap, pT).get_min_levels(AS_REACH)
+part = BasicES(q, cap, qT).get_min_levels(AS_REACH)
+for s, (orig_s, e) in enumerate(q.components):
+    assert part[s] == full[p.get_state(orig_s, e)]
+print("Passed test 3 for product_energy in file test_explicit.py")
+
+# ## Custom names
+
+q.names[0] = "init"
+assert q.names[0] == "init"
+assert q.state_with_name(f"0,{cap}") is None
+s = q.new_state(1, 3, name="custom")
+assert q.state_with_name("custom") == s and q.components[s] == (1, 3)
+print("Passed test 4 for product_energy in file test_explicit.py")
+
+# ## Infinite capacity
+# All states of the product have infinite energy and the product is
+# a copy of the original mdp.
+
+q, qT = product_energy(m, inf, T)
+assert q.num_states == m.num_states
+assert list(q.components) == [(s, inf) for s in range(m.num_states)]
+assert sorted(qT) == sorted(T)
+for s in range(m.num_states):
+    assert q.components_to_states_d[(s, inf)] == s
+    assert q.names[s] == f"{s},inf"
+    assert [a.label for a in q.actions_for_state(s)] == \
+           [a.label for a in m.actions_for_state(s)]
+assert (0, 0) not in q.components_to_states_d
+print("Passed test 5 for product_energy in file test_explicit.py")
+
+# ## Capacity given by NumPy
+# Integers of NumPy (for capacity and components) work as Python integers;
+# capacities that are not integers are rejected.
+
+import numpy as np
+
+q, qT = product_energy(m, np.int64(cap), T)
+assert q.capacity == cap and type(q.capacity) is int
+assert list(q.components) == list(p.components)
+assert sorted(qT) == sorted(pT)
+assert q.get_state(np.int64(0), np.int64(cap)) == p.get_state(0, cap)
+for value in [5.0, 5.5, "5"]:
+    try:
+        product_energy(m, value, T)
+        assert False
+    except ValueError:
+        pass
+print("Passed test 6 for product_energy in file test_explicit.py")
+
+# ## ExplicitES
+# The solver on the explicit product agrees with the counter-based solver.
+
+objectives = [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]
+for example in [basic, little_alsure2, ultimate]:
+    m, T = example()
+    for cap in [0, 3, 6, 10, 25]:
+        solver = BasicES(m, cap, T)
+        explicit = ExplicitES(m, cap, T)
+        frozen = ExplicitES(m.freeze(), cap, T)
+        for obj in objectives:
+            expected = solver.get_min_levels(obj)
+            assert explicit.get_min_levels(obj) == expected, \
+                f"{example.__name__}, cap={cap}, objective={obj}"
+            assert frozen.get_min_levels(obj) == expected
+print("Passed test 1 for ExplicitES in file test_explicit.py")
+
+# The selectors play enabled actions that lead to safe successors.
+
+m, T = ultimate()
+cap = 15
+explicit = ExplicitES(m, cap, T)
+safe = explicit.get_min_levels(SAFE)
+for obj in objectives:
+    levels = explicit.get_min_levels(obj)
+    selector = explicit.get_selector(obj)
+    for s in range(m.num_states):
+        if levels[s] == inf:
+            continue
+        for e in range(levels[s], cap + 1):
+            a = selector.select_action(s, e)
+            assert a.src == s
+            if obj == MIN_INIT_CONS:
+                assert a.cons <= e
+                continue
+            if m.is_reload(s):
+                e = cap
+            assert a.cons <= e
+            for t in a.distr:
+                assert safe[t] <= (cap if m.is_reload(t) else e - a.cons)
+print("Passed test 2 for ExplicitES in file test_explicit.py")
+
+# In state 2, the action `wait` consumes nothing and reaches the reload
+# state 1 almost surely. As the counter-based solvers, ExplicitES does not
+# count on repeating the cycle of `wait` with zero consumption: the reload
+# state 3 is removed and state 2 cannot surely reach another reload state.
+
+m = ConsMDP()
+m.new_states(4)
+m.set_reload(1)
+m.set_reload(3)
+m.add_action(0, {1: 1}, "", 1)
+m.add_action(1, {0: 1}, "", 1)
+m.add_action(2, {2: .5, 1: .5}, "wait", 0)
+m.add_action(2, {3: 1}, "trap", 2)
+m.add_action(3, {3: 1}, "", 1)
+explicit = ExplicitES(m, 5, {0})
+basic = BasicES(m, 5, {0})
+for objective in [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]:
+    assert explicit.get_min_levels(objective) == \
+           basic.get_min_levels(objective)
+assert explicit.get_min_levels(AS_REACH) == [1, 0, inf, inf]
+assert explicit.get_min_levels(BUCHI) == [1, 0, inf, inf]
+assert explicit.get_min_levels(POS_REACH) == [1, 0, 2, inf]
+
+# A target with a zero-consumption loop satisfies BUCHI only if it can
+# also reach a reload state that is not removed.
+
+m = ConsMDP()
+m.new_states(2)
+m.set_reload(1)
+m.add_action(0, {0: 1}, "loop", 0)
+m.add_action(0, {1: 1}, "reload", 0)
+m.add_action(1, {1: 1}, "", 0)
+explicit = ExplicitES(m, 3, {0})
+basic = BasicES(m, 3, {0})
+for objective in [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]:
+    assert explicit.get_min_levels(objective) == \
+           basic.get_min_levels(objective)
+assert explicit.get_min_levels(BUCHI) == [inf, inf]
+
+try:
+    ExplicitES(m, inf, {0})
+    assert False, "ExplicitES should not accept infinite capacity"
+except ValueError:
+    pass
+print("Passed test 3 for ExplicitES in file test_explicit.py")
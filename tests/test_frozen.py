@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test frozen (array-backed) snapshots of ConsMDPs
+
+from reachability_examples import ultimate, basic
+from fimdp.core import FrozenConsMDP, FrozenProductConsMDP
+from fimdp.energy_solvers import BasicES, GoalLeaningES, LeastFixpointES
+from fimdp.explicit import product_energy
+from fimdp.objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+
+objectives = [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]
+
+# ## Structure of the snapshot
+
+m, T = ultimate()
+f = m.freeze()
+
+assert isinstance(f, FrozenConsMDP)
+assert f.num_states == m.num_states
+assert f.action_offsets.tolist() == [0, 2, 3, 4, 7, 8, 10, 12, 13, 14, 15, 16]
+assert f.consumption.tolist() == [1, 3, 1, 1, 1, 2, 3, 1, 1, 1, 3, 6, 1, 3, 1, 1]
+assert f.succ_states[f.succ_offsets[11]:f.succ_offsets[12]].tolist() == [3, 8]
+assert f.reload_mask.tolist() == [bool(m.is_reload(s)) for s in range(m.num_states)]
+for s in range(m.num_states):
+    assert list(f.actions_for_state(s)) == [a for a in m.actions_for_state(s)]
+    assert f.state_succs(s) == m.state_succs(s)
+print("Passed test 1 for FrozenConsMDP in file test_frozen.py")
+
+# The snapshot is read-only and cached until the structure changes
+
+try:
+    f.consumption[0] = 5
+    assert False
+except ValueError:
+    pass
+assert m.freeze() is f
+m.set_reload(2)
+assert m.freeze() is not f
+print("Passed test 2 for FrozenConsMDP in file test_frozen.py")
+
+# Actions created from the arrays only carry the same data
+
+lazy = FrozenConsMDP(f.action_offsets, f.action_ids, f.consumption,
+                     f.succ_offsets, f.succ_states, f.succ_probs,
+                     f.reload_mask, f.labels)
+for s in range(m.num_states):
+    for a, b in zip(lazy.actions_for_state(s), m.actions_for_state(s)):
+        assert (a.src, a.cons, a.label) == (b.src, b.cons, b.label)
+        assert a.distr == {t: float(p) for t, p in b.distr.items()}
+print("Passed test 3 for FrozenConsMDP in file test_frozen.py")
+
+# ## Solvers on snapshots
+# Solvers running on the snapshot should give the same results as on the
+# original ConsMDP. The selectors choose the same actions of the original
+# ConsMDP.
+
+for example in [ultimate, basic]:
+    m, T = example()
+    for SolverClass, objs in [(BasicES, objectives),
+                              (GoalLeaningES, objectives),
+                              (LeastFixpointES, [MIN_INIT_CONS, SAFE])]:
+        for cap in [15, 30]:
+            orig = SolverClass(m, cap, T)
+            frozen = SolverClass(m.freeze(), cap, T)
+            for obj in objs:
+                assert frozen.get_min_levels(obj) == orig.get_min_levels(obj)
+                assert frozen.strategy.get(obj) == orig.strategy.get(obj)
+print("Passed test 4 for FrozenConsMDP in file test_frozen.py")
+
+# ## Products
+
+m, T = ultimate()
+p, pT = product_energy(m, 15, T)
+fp = p.freeze()
+assert isinstance(fp, FrozenProductConsMDP)
+assert fp.components == tuple(p.components)
+for s in range(p.num_states):
+    orig_s, other_s = p.components[s]
+    assert fp.get_state(orig_s, other_s) == s
+    for a in fp.actions_for_state(s):
+        assert fp.orig_action(a) is p.orig_action(a)
+print("Passed test 5 for FrozenConsMDP in file test_frozen.py")
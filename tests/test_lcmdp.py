@@ -69,6 +69,40 @@ m.new_states(count, labels=labels)
 assert m.states_with_label({0,2}) == [0,20,30,50,60,80,90]
 print("Passed test 4 for LabeledConsMDP (states_with_label).")
 
+# Labels are stored as bitmasks, the index follows changes of labels
+assert list(m.label_masks[:4]) == [0b101, 0b010, 0b001, 0]
+assert m.state_labels[:3] == [{0, 2}, {1}, {0}]
+assert m.state_labels == labels
+m.state_labels[1] = {0, 2}
+assert m.label_masks[1] == 0b101
+assert m.states_with_label({0,2})[:2] == [0, 1]
+assert m.freeze().states_with_label({0,2}) == m.states_with_label({0,2})
+m.state_labels = [{1}] * count
+assert m.states_with_label({0,2}) == []
+assert m.states_with_label({1}) == list(range(count))
+assert m.freeze().state_labels[0] == {1}
+print("Passed test 5 for LabeledConsMDP (label bitmasks).")
+
+# Labels of states are views; changing them in place changes the labels
+label = m.state_labels[3]
+label.add(2)
+assert m.state_labels[3] == {1, 2} and label == {1, 2}
+assert m.label_masks[3] == 0b110
+assert m.states_with_label({1, 2}) == [3]
+m.state_labels[4] |= {0}
+m.state_labels[3].discard(1)
+m.state_labels[3].remove(2)
+assert m.state_labels[3] == set() and len(m.state_labels[3]) == 0
+assert m.states_with_label({0, 1}) == [4]
+assert m.freeze().state_labels[4] == {0, 1}
+assert m.state_labels[-1] == {1} and 5 not in m.state_labels[-1]
+try:
+    m.state_labels[count]
+    assert False
+except IndexError:
+    pass
+print("Passed test 6 for LabeledConsMDP (label views).")
+
 # Check that algorithms work also on LabeledConsMDP
 m = LabeledConsMDP(["a"])
 m.new_states(11, labels=[{0}]*11)
@@ -115,4 +149,4 @@ assert result == expected, ("get_min_levels(BUCHI) returns" +
     " wrong values:\n" +
     f"  expected: {expected}\n  returns:  {result}\n")
 
-print("Passed test 5 for LabeledConsMDP (algo).")
\ No newline at end of file
+print("Passed test 7 for LabeledConsMDP (algo).")
\ No newline at end of file
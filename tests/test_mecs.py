@@ -1,5 +1,6 @@
 from reachability_examples import ultimate
 import fimdp.explicit as mec
+from fimdp.core import ConsMDP
 
 mdp = ultimate()[0]
 result = mec.get_MECs(mdp)
@@ -10,3 +11,34 @@ assert result == expected, ("get_MECs() returns" +
     " wrong values:\n" +
     f"  expected: {expected}\n  returns:  {result}\n")
 print("Passed test 1 for get_MECs() in test_mecs file.")
+
+# ## Long chains
+# The SCCs are computed without recursion.
+
+chain = ConsMDP()
+chain.new_states(20000)
+for s in range(20000):
+    chain.add_action(s, {(s + 1) % 20000: 1}, "", 1)
+result = mec.get_MECs(chain)
+assert len(result) == 1 and sorted(result[0]) == list(range(20000))
+print("Passed test 2 for get_MECs() in test_mecs file.")
+
+# ## Actions that can leave a component
+# State 2 can return to state 1 only by `risk`, which may lead to the
+# trap 0. So {1, 2} is not an end component, {1} is (by `stay`).
+# State 3 has no actions.
+
+risky = ConsMDP()
+risky.new_states(4)
+risky.add_action(0, {0: 1}, "trap", 1)
+risky.add_action(1, {0: .5, 2: .5}, "risk", 1)
+risky.add_action(1, {1: 1}, "stay", 1)
+risky.add_action(2, {1: 1}, "back", 1)
+risky.add_action(2, {3: 1}, "end", 1)
+for backend in ["python", "scipy"]:
+    result = mec.get_MECs(risky, backend=backend)
+    assert sorted(result) == [[0], [1]], f"{backend}: {result}"
+
+assert sorted(map(sorted, mec.get_MECs(mdp, backend="scipy"))) == \
+       sorted(map(sorted, expected))
+print("Passed test 3 for get_MECs() in test_mecs file.")
@@ -76,3 +76,71 @@ expected = 7
 
 assert result == expected, (f"The minimal capacity should be {expected}, not {result}.")
 print("Passed test 6 for bin_search() in test_mincap.py file.")
+
+# ## Minimal capacities for all states
+# `min_capacities` computes the minimal capacity for each state at once.
+
+from math import inf
+from fimdp.mincap_solvers import min_capacities
+from fimdp.objectives import MIN_INIT_CONS, SAFE
+
+for objective in [MIN_INIT_CONS, SAFE, AS_REACH, BUCHI]:
+    for load in [None, 8]:
+        result = min_capacities(m, T, objective, max_capacity=30,
+                                max_starting_load=load)
+        expected = []
+        for s in range(m.num_states):
+            caps = [c for c in range(1, 31)
+                    if BasicES(m, c, T).get_min_levels(objective)[s] <=
+                    (c if load is None else load)]
+            expected.append(min(caps) if caps else inf)
+        assert result == expected, (f"min_capacities({objective}) returns "
+                                    f"{result}, expected {expected}.")
+print("Passed test 1 for min_capacities() in test_mincap.py file.")
+
+result = min_capacities(m, T)
+assert result[0] == bin_search(m, 0, T)
+result = min_capacities(m, T, AS_REACH)
+assert result[0] == 9 and result[3] == 7
+assert min_capacities(m, T, max_capacity=14)[0] == inf
+print("Passed test 2 for min_capacities() in test_mincap.py file.")
+
+# With actions that consume no energy, capacity 0 would suffice; like
+# `bin_search`, `min_capacities` considers only capacities from 1.
+
+from fimdp.core import ConsMDP
+
+z = ConsMDP()
+z.new_states(2)
+z.set_reload(1)
+z.add_action(0, {1: 1}, "go", 0)
+z.add_action(1, {0: 1}, "back", 0)
+for objective in [AS_REACH, BUCHI]:
+    result = min_capacities(z, [0], objective)
+    assert result == [1, 1]
+    assert result == [bin_search(z, s, [0], objective=objective)
+                      for s in range(z.num_states)]
+assert min_capacities(z, [0], MIN_INIT_CONS) == [1, 1]
+print("Passed test 3 for min_capacities() in test_mincap.py file.")
+
+# ## Batched queries
+# `min_capacity_queries` answers many pairs (initial state, targets) at once.
+
+from fimdp.mincap_solvers import min_capacity_queries
+
+queries = [(0, T), (3, T), (5, list(T)), (0, 4), (4, [4]), (3, [7, 10]),
+           (0, [1])]
+for objective in [AS_REACH, BUCHI]:
+    for workers in [1, 2]:
+        result = min_capacity_queries(m, queries, objective, max_capacity=30,
+                                      max_workers=workers)
+        expected = [min_capacities(m, targets if not isinstance(targets, int)
+                                   else [targets], objective,
+                                   max_capacity=30)[init]
+                    for init, targets in queries]
+        assert result == expected, (f"min_capacity_queries returns {result},"
+                                    f" expected {expected}.")
+assert min_capacity_queries(m, [(0, T)], max_workers=1) == [15]
+assert min_capacity_queries(m, [(0, T)], max_starting_load=5,
+                            max_workers=1) == [inf]
+print("Passed test 1 for min_capacity_queries() in test_mincap.py file.")
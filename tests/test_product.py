@@ -33,6 +33,11 @@ assert wrapper.succ(2, []) == 1
 assert wrapper.succ(0, [b]) == 0
 assert wrapper.succ(1, [a, b]) == 2
 
+# Edges are memoized by labels given as bitmasks
+assert wrapper.label_mask([a, b]) == (1 << a) | (1 << b)
+assert wrapper.edge(2, [a]) is wrapper.edge_for_mask(2, 1 << a)
+assert wrapper.edge_for_mask(2, (1 << b) | (1 << 5)).dst == 0
+
 print("Passed test for DBAWrapper in file test_product.py")
 # -
 
@@ -60,6 +65,17 @@ aut
 
 p, T = lmdp.product_with_dba(aut)
 assert p.names == ['0,1', '1,0', '2,1', '3,1', '3,0', '0,0', '2,2']
+
+# Successors in the automaton are computed once per automaton state and
+# class of labels (empty, s1, s2)
+stats = p.construction_stats
+assert stats["states"] == p.num_states
+assert stats["label_classes"] == 3
+assert stats["edges"] == sum(len(a.distr) for s in range(p.num_states)
+                             for a in p.actions_for_state(s))
+assert stats["automaton_lookups"] + stats["cached_lookups"] == \
+       stats["edges"] + lmdp.num_states
+assert stats["automaton_lookups"] <= 3 * aut.num_states()
 print("Passed test 1 for product in file test_product.py")
 
 psolver = BasicES(p, 5, T)
@@ -105,3 +105,51 @@ except AttributeError:
 
 assert selector.select_action(0,0,10).label == "α"
 print("Passed test 6 for ProductSelector") 
+
+# ## Products with automata loaded from files
+# The product and the labeled mdp are restored from the file, the automaton
+# is restored from its HOA representation.
+
+# +
+import os
+import tempfile
+
+import fimdp
+from fimdp.labeled import DBACounterStategy, FrozenLabeledConsMDP
+
+product, T = lmdp.product_with_dba(aut)
+path = os.path.join(tempfile.mkdtemp(), "product.npz")
+fimdp.save(product, path)
+
+expected = BasicES(product, 9, T).get_min_levels(BUCHI)
+for mmap in [False, True]:
+    loaded = fimdp.load(path, mmap=mmap)
+    assert list(loaded.components) == list(product.components)
+    assert [set(l) for l in loaded.orig_mdp.state_labels] == lmdp.state_labels
+    assert mmap == isinstance(loaded.orig_mdp, FrozenLabeledConsMDP)
+    assert BasicES(loaded, 9, T).get_min_levels(BUCHI) == expected
+
+    for p_s in range(loaded.num_states):
+        for a in loaded.actions_for_state(p_s):
+            edge = loaded.other_action(a)
+            orig_s, aut_s = loaded.components[p_s]
+            assert edge.src == aut_s
+
+    solver = BasicES(loaded, 9, T)
+    selector = ProductSelector(loaded)
+    for state, rule in enumerate(solver.get_selector(BUCHI)):
+        for energy, action in rule.items():
+            selector.update(state, energy, action)
+
+    # Strategies start from states of the product that are initial
+    played = 0
+    for s in range(lmdp.num_states):
+        strategy = DBACounterStategy(loaded.orig_mdp, loaded.other, selector,
+                                     9, 9, init_state=s)
+        p_s = loaded.get_state(s, strategy.aut_state)
+        if expected[p_s] <= 9:
+            assert strategy.next_action() in \
+                   loaded.orig_mdp.actions_for_state(s)
+            played += 1
+    assert played > 0
+print("Passed test 7 for ProductSelector (loaded from file)")
@@ -219,3 +219,100 @@ assert result == expected, ("get_min_levels(AS_REACH) returns" +
     " wrong values:\n" +
     f"  expected: {expected}\n  returns:  {result}\n")
 print("Passed test 4 for get_min_levels(AS_REACH) in test_reachability file.")
+
+###############################################################################
+# ## Reuse of SAFE for many sets of targets
+
+from fimdp.energy_solvers import GoalLeaningES
+from fimdp.objectives import SAFE, BUCHI
+from reachability_examples import ultimate
+
+m, T = ultimate()
+targets_list = [[s] for s in range(m.num_states)] + [T]
+
+for SolverClass, kwargs in [(BasicES, {}), (GoalLeaningES, {"threshold": 0.3})]:
+    base = SolverClass(m, 15, [], **kwargs)
+    for objective in [POS_REACH, AS_REACH, BUCHI]:
+        solvers = base.solve_many(targets_list, objective)
+        for targets, solver in zip(targets_list, solvers):
+            expected = SolverClass(m, 15, targets, **kwargs)
+            assert type(solver) is SolverClass
+            assert solver.targets == targets
+            assert solver.min_levels[SAFE] is base.min_levels[SAFE]
+            assert solver.get_min_levels(objective) == \
+                   expected.get_min_levels(objective)
+            for s in range(m.num_states):
+                assert dict(solver.get_selector(objective)[s]) == \
+                       dict(expected.get_selector(objective)[s])
+print("Passed test 1 for solve_many() in test_reachability file.")
+
+# Solvers for other targets do not change results of the original solver
+solver = BasicES(m, 15, T)
+result = list(solver.get_min_levels(AS_REACH))
+other = solver.for_targets([0])
+other.get_min_levels(AS_REACH, recompute=True)
+other.get_min_levels(SAFE, recompute=True)
+assert solver.get_min_levels(AS_REACH) == result
+assert other.min_levels[SAFE] is not solver.min_levels[SAFE]
+print("Passed test 1 for for_targets() in test_reachability file.")
+
+###############################################################################
+# ## Decision queries
+# `is_satisfiable` agrees with minimal levels and discards partial results.
+
+from fimdp.energy_solvers import LabelSettingES, NUMPY, WORKLIST
+from fimdp.objectives import MIN_INIT_CONS
+
+m, T = ultimate()
+for SolverClass, kwargs in [(BasicES, {}), (BasicES, {"engine": NUMPY}),
+                            (BasicES, {"engine": WORKLIST}),
+                            (GoalLeaningES, {"threshold": 0.3}),
+                            (LabelSettingES, {})]:
+    for cap in [8, 15, inf]:
+        full = SolverClass(m, cap, T, **kwargs)
+        for objective in [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]:
+            expected = full.get_min_levels(objective)
+            for s in range(m.num_states):
+                for energy in [0, 3, 7, 14, inf]:
+                    solver = SolverClass(m, cap, T, **kwargs)
+                    result = solver.is_satisfiable(objective, s, energy)
+                    assert result == (expected[s] <= energy), (
+                        f"is_satisfiable({objective}, {s}, {energy}) returns "
+                        f"{result} for {SolverClass.__name__}, cap={cap}")
+                    assert solver.get_min_levels(objective) == expected
+                    assert getattr(solver, "threshold", 0) == \
+                           kwargs.get("threshold", 0)
+print("Passed test 1 for is_satisfiable() in test_reachability file.")
+
+solver = BasicES(m, 15, T)
+solver.get_min_levels(BUCHI)
+assert solver.is_satisfiable(BUCHI, 0, 6)
+assert not solver.is_satisfiable(BUCHI, 0, 5)
+print("Passed test 2 for is_satisfiable() in test_reachability file.")
+
+###############################################################################
+# ## Lazy selectors
+# With `lazy_selectors`, only minimal levels are computed; selectors are
+# built on request and are the same as the selectors of the full computation.
+
+from fimdp.explicit import ExplicitES
+
+for SolverClass, kwargs in [(BasicES, {}), (BasicES, {"engine": NUMPY}),
+                            (BasicES, {"engine": WORKLIST}),
+                            (GoalLeaningES, {"threshold": 0.3}),
+                            (LabelSettingES, {}), (ExplicitES, {})]:
+    for cap in [8, 15]:
+        full = SolverClass(m, cap, T, **kwargs)
+        solver = SolverClass(m, cap, T, **kwargs)
+        solver.lazy_selectors = True
+        objectives = [BUCHI, AS_REACH, POS_REACH, SAFE, MIN_INIT_CONS]
+        for objective in objectives:
+            assert solver.get_min_levels(objective) == \
+                   full.get_min_levels(objective)
+        assert not solver.strategy
+        for objective in objectives:
+            selector = solver.get_selector(objective)
+            for s in range(m.num_states):
+                assert dict(selector[s]) == \
+                       dict(full.get_selector(objective)[s])
+print("Passed test 1 for lazy_selectors in test_reachability file.")
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 from fimdp import core
 from math import inf
-from fimdp.energy_solvers import BasicES, LeastFixpointES
+from fimdp.energy_solvers import BasicES, LeastFixpointES, LabelSettingES
 from fimdp.objectives import MIN_INIT_CONS, SAFE
 from sys import stderr
 
@@ -104,6 +104,16 @@ assert result == expected, ("Safe reloads are wrong.\n" +
     f"  expected: {expected}\n  returns:  {result}\n")
 print("Passed test 1 for LeastFixpointES() in test_safety file.")
 
+# ### version with LabelSetting
+
+label_solver = LabelSettingES(m, 14, None)
+result = label_solver.get_min_levels(SAFE)
+label_solver
+
+assert result == expected, ("Safe reloads are wrong.\n" +
+    f"  expected: {expected}\n  returns:  {result}\n")
+print("Passed test 1 for LabelSettingES() in test_safety file.")
+
 # ### Test propagation of useless reloads
 # Change the consumption on the action of st. 3. This makes state 3 an useless reload
 
@@ -127,6 +137,12 @@ assert result == expected, ("Safe reloads are wrong.\n" +
     f"  expected: {expected}\n  returns:  {result}\n")
 print("Passed test 2 for LeastFixpointES() in test_safety file.")
 
+# Test the version with LabelSetting
+result = label_solver.get_min_levels(SAFE, recompute=True)
+assert result == expected, ("Safe reloads are wrong.\n" +
+    f"  expected: {expected}\n  returns:  {result}\n")
+print("Passed test 2 for LabelSettingES() in test_safety file.")
+
 # ## Reload that is never safe
 # safe_values = ∞ even with cap = ∞, which is different from minInitCons (orange)
 
@@ -160,6 +176,13 @@ assert result == expected, ("Safe reloads are wrong.\n" +
     f"  expected: {expected}\n  returns:  {result}\n")
 print("Passed test 3 for LeastFixpointES() in test_safety file.")
 
+# Test the version with LabelSetting
+label_solver = LabelSettingES(m, inf, None)
+result = label_solver.get_min_levels(SAFE)
+assert result == expected, ("Safe reloads are wrong.\n" +
+    f"  expected: {expected}\n  returns:  {result}\n")
+print("Passed test 3 for LabelSettingES() in test_safety file.")
+
 # ## Test safe_values[r] = cap for a reload
 # The reload should get 0. This was incorrect for some time.
 
@@ -198,6 +221,17 @@ assert result == expected, ("BasicES.get_min_levels(MIN_INIT_CONS) returns" +
     f"  expected: {expected}\n  returns:  {result}\n")
 print("Passed test 5 for BasicES.get_min_levels(MIN_INIT_CONS) in test_safety file.")
 
+label_solver = LabelSettingES(m, inf, None)
+result = label_solver.get_min_levels(MIN_INIT_CONS)
+assert result == expected, ("LabelSettingES.get_min_levels(MIN_INIT_CONS) returns" +
+    " wrong values:\n" +
+    f"  expected: {expected}\n  returns:  {result}\n")
+# The selector must achieve the values
+selector = label_solver.get_selector(MIN_INIT_CONS)
+assert selector.select_action(1, 1000).label == "a"
+assert selector.select_action(2, 1001).label == "b"
+print("Passed test 1 for LabelSettingES.get_min_levels(MIN_INIT_CONS) in test_safety file.")
+
 # # Example of the incorrectness of bounding SafeReloads by $|S|$ iterations
 # The original idea that we can bound the number of iterations by $|S|$ is incorrect. The following example used to give value 1 for state 2.
 
@@ -233,3 +267,54 @@ solver_least
 assert result == expected, ("Safe reloads are wrong.\n" +
     f"  expected: {expected}\n  returns:  {result}\n")
 print("Passed test 5 for LeastFixpointES() in test_safety file.")
+
+# Test the version with LabelSetting
+solver_label = LabelSettingES(m, 1005, None)
+result = solver_label.get_min_levels(SAFE)
+solver_label
+
+assert result == expected, ("Safe reloads are wrong.\n" +
+    f"  expected: {expected}\n  returns:  {result}\n")
+print("Passed test 5 for LabelSettingES() in test_safety file.")
+
+# ### Large consumption and the selectors of LabelSettingES
+# The levels need not be small: the buckets are kept only for levels that
+# occur. The selectors are the same as those of BasicES.
+
+m = core.ConsMDP()
+m.new_state(True)
+m.new_state()
+m.add_action(0, {1:1}, "a", 10**7)
+m.add_action(1, {0:1}, "b", 10**7)
+result = LabelSettingES(m, inf, [0]).get_min_levels(MIN_INIT_CONS)
+assert result == BasicES(m, inf, [0]).get_min_levels(MIN_INIT_CONS)
+assert result == [20000000, 10000000]
+print("Passed test 6 for LabelSettingES() in test_safety file.")
+
+# The sweeps of BasicES record the rule `5: a` for state 1 before the value
+# of state 2 is known
+m = core.ConsMDP()
+m.new_state(True)
+m.new_states(2)
+m.add_action(0, {0:1}, "r", 1)
+m.add_action(1, {0:1}, "a", 5)
+m.add_action(1, {2:1}, "b", 1)
+m.add_action(2, {0:1}, "c", 1)
+selector = LabelSettingES(m, 10, None).get_selector(MIN_INIT_CONS)
+assert dict(selector[1]) == dict(BasicES(m, 10, None).get_selector(MIN_INIT_CONS)[1])
+assert {e: a.label for e, a in selector[1].items()} == {5: "a", 2: "b"}
+
+from fimdp.objectives import POS_REACH, AS_REACH, BUCHI
+from reachability_examples import ultimate
+
+m, T = ultimate()
+for cap in [8, 15, inf]:
+    basic = BasicES(m, cap, T)
+    label_solver = LabelSettingES(m, cap, T)
+    for objective in [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]:
+        assert label_solver.get_min_levels(objective) == \
+               basic.get_min_levels(objective)
+        selector = label_solver.get_selector(objective)
+        for s in range(m.num_states):
+            assert dict(selector[s]) == dict(basic.get_selector(objective)[s])
+print("Passed test 7 for LabelSettingES() in test_safety file.")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test Monte Carlo simulation of counter strategies
+
+from fimdp.core import ConsMDP, CounterStrategy
+from fimdp.energy_solvers import BasicES
+from fimdp.objectives import AS_REACH, BUCHI
+from fimdp.simulate import Simulator, simulate
+from reachability_examples import ultimate
+
+# ## Deterministic plays
+# All plays of a model with Dirac distributions are the same and agree with
+# the play of CounterStrategy.
+
+m = ConsMDP()
+m.new_states(4)
+m.set_reload(0)
+m.add_action(0, {1: 1}, "go", 2)
+m.add_action(1, {2: 1}, "go", 3)
+m.add_action(2, {3: 1}, "go", 1)
+m.add_action(3, {0: 1}, "back", 2)
+m.add_action(2, {0: 1}, "back", 1)
+cap = 8
+solver = BasicES(m, cap, {3})
+selector = solver.get_selector(BUCHI)
+
+steps = 12
+strategy = CounterStrategy(m, selector, cap, cap, 0)
+state, energies, visits, hit_time = 0, [cap], 0, -1
+for step in range(steps + 1):
+    if state == 3:
+        visits += 1
+        hit_time = step if hit_time < 0 else hit_time
+    if step == steps:
+        break
+    action = strategy.next_action()
+    state = list(action.distr)[0]
+    strategy.update_state(state)
+    energies.append(strategy.energy)
+
+result = Simulator(m, selector, cap).run(0, cap, 5, steps, targets={3},
+                                         seed=0)
+assert result.errors == 0
+assert list(result.visits) == [visits] * 5
+assert list(result.hit_time) == [hit_time] * 5
+assert list(result.min_energy) == [min(energies)] * 5
+print("Passed test 1 for Simulator in file test_simulate.py")
+
+# ## Random plays
+# With enough energy, plays of the Büchi strategy never stop and visit
+# targets; with less energy, no action is feasible.
+
+m, T = ultimate()
+cap = 15
+solver = BasicES(m, cap, T)
+levels = solver.get_min_levels(BUCHI)
+simulator = Simulator(m, solver.get_selector(BUCHI), cap)
+
+result = simulator.run(3, levels[3], 2000, 200, targets=T, seed=1)
+assert result.num_plays == 2000
+assert result.errors == 0
+assert result.min_energy.min() >= 0
+assert result.hit_rate == 1
+assert (result.visits > 1).all()
+
+again = simulator.run(3, levels[3], 2000, 200, targets=T, seed=1)
+assert (again.visits == result.visits).all()
+
+result = simulator.run(3, levels[3] - 1, 100, 10, targets=T, seed=1)
+assert result.errors == 100 and (result.error_step == 0).all()
+print("Passed test 2 for Simulator in file test_simulate.py")
+
+# ## Selectors and strategies
+# Tables built from compiled selectors and from calls of `select_action`
+# are the same; `simulate` continues from the configuration of a strategy.
+# Selectors for reachability do not select actions in targets, so the plays
+# stop after they reach them.
+
+
+class Wrapped:
+    def __init__(self, selector):
+        self.selector = selector
+
+    def select_action(self, state, energy):
+        return self.selector.select_action(state, energy)
+
+
+selector = solver.get_selector(AS_REACH)
+table = Simulator(m, selector, cap).table
+assert (Simulator(m, Wrapped(selector), cap).table == table).all()
+assert (Simulator(m.freeze(), selector.compile(), cap).table == table).all()
+
+strategy = CounterStrategy(m, selector, cap, levels[3], 3)
+result = simulate(strategy, 1000, 50, targets=T, seed=3)
+assert result.hit_rate == 1
+assert (result.error_step >= result.hit_time).all()
+print("Passed test 3 for Simulator in file test_simulate.py")
+
+# ## Invalid selectors and capacities
+# Selectors for products are rejected without the automaton and tables that
+# would not fit in `max_table_bytes` are not built.
+
+from fimdp.core import ProductConsMDP, ProductSelector
+
+product = ProductConsMDP(m)
+for s in range(m.num_states):
+    for other in range(2):
+        product.new_state(s, other)
+product_selector = ProductSelector(product)
+for p_s in range(product.num_states):
+    s, other = product.components[p_s]
+    for a in m.actions_for_state(s):
+        p_a = product.add_action(p_s, {product.get_state(t, other): p
+                                       for t, p in a.distr.items()},
+                                 a.label, a.cons, a)
+        product_selector.update(p_s, a.cons, product.actions[p_a])
+        break
+
+for sel in (product_selector, product_selector.compile()):
+    try:
+        Simulator(m, sel, cap)
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+
+try:
+    Simulator(m, selector, 10 ** 12)
+    assert False, "ValueError expected"
+except ValueError as e:
+    assert "max_table_bytes" in str(e)
+print("Passed test 4 for Simulator in file test_simulate.py")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# # Test storage of models in files
+# Models loaded by `fimdp.load` must give the same results as the
+# original models, both as mutable models and as memory-mapped snapshots.
+
+import os
+import tempfile
+
+import numpy as np
+
+import fimdp
+from fimdp.core import ConsMDP, FrozenConsMDP, FrozenProductConsMDP, \
+    ProductConsMDP, ProductSelector
+from fimdp.energy_solvers import BasicES
+from fimdp.explicit import product_energy
+from fimdp.objectives import MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI
+from reachability_examples import ultimate
+
+objectives = [MIN_INIT_CONS, SAFE, POS_REACH, AS_REACH, BUCHI]
+tmp_dir = tempfile.mkdtemp()
+
+
+def actions(mdp, s):
+    return [(a.label, a.cons, {t: float(p) for t, p in a.distr.items()})
+            for a in mdp.actions_for_state(s)]
+
+
+def check_same(loaded, mdp, cap, targets):
+    assert loaded.num_states == mdp.num_states
+    assert list(loaded.names) == list(mdp.names)
+    for s in range(mdp.num_states):
+        assert bool(loaded.is_reload(s)) == bool(mdp.is_reload(s))
+        assert actions(loaded, s) == actions(mdp, s)
+    for obj in objectives:
+        assert BasicES(loaded, cap, targets).get_min_levels(obj) == \
+               BasicES(mdp, cap, targets).get_min_levels(obj)
+
+
+# ## ConsMDP
+
+m, T = ultimate()
+m.names[3] = "three"
+m.names_dict["three"] = 3
+path = os.path.join(tmp_dir, "ultimate.npz")
+fimdp.save(m, path)
+
+loaded = fimdp.load(path)
+assert type(loaded) == ConsMDP
+check_same(loaded, m, 15, T)
+assert loaded.state_with_name("three") == 3
+print("Passed test 1 for storage of ConsMDP in file test_storage.py")
+
+loaded = fimdp.load(path, mmap=True)
+assert type(loaded) == FrozenConsMDP
+assert isinstance(loaded.succ_states.base, np.memmap)
+check_same(loaded, m, 15, T)
+print("Passed test 2 for storage of ConsMDP in file test_storage.py")
+
+# ## ProductConsMDP
+
+p, pT = product_energy(m, 15, T)
+path = os.path.join(tmp_dir, "product.npz")
+fimdp.save(p, path)
+
+
+def selector_rules(selector):
+    return sorted((orig, other, energy, a.src, a.label)
+                  for orig, rules in selector.items()
+                  for other, rule in rules.items()
+                  for energy, a in rule.items())
+
+
+solver = BasicES(p, 15, pT)
+solver.SelectorClass = ProductSelector
+expected = selector_rules(solver.get_selector(SAFE))
+
+for mmap, cls in [(False, ProductConsMDP), (True, FrozenProductConsMDP)]:
+    loaded = fimdp.load(path, mmap=mmap)
+    assert type(loaded) == cls
+    check_same(loaded, p, 15, pT)
+    assert list(loaded.components) == list(p.components)
+    assert loaded.get_state(-1, "-∞") == p.get_state(-1, "-∞")
+    assert loaded.other == 15
+
+    # Actions are mapped to actions of the loaded original mdp
+    for s in range(loaded.num_states):
+        for a in loaded.actions_for_state(s):
+            orig_a = loaded.orig_action(a)
+            if loaded.components[s][0] == -1:
+                assert orig_a is None
+            else:
+                assert orig_a in loaded.orig_mdp.actions_for_state(orig_a.src)
+                assert orig_a.label == a.label
+
+    solver = BasicES(loaded, 15, pT)
+    solver.SelectorClass = ProductSelector
+    assert selector_rules(solver.get_selector(SAFE)) == expected
+    print(f"Passed test {1 + mmap} for storage of ProductConsMDP in file "
+          "test_storage.py")
+
+# Loaded snapshot can be stored again
+
+path2 = os.path.join(tmp_dir, "product2.npz")
+fimdp.save(fimdp.load(path, mmap=True), path2)
+with open(path, "rb") as f1, open(path2, "rb") as f2:
+    assert f1.read() == f2.read()
+print("Passed test 3 for storage of ProductConsMDP in file test_storage.py")
+
+# Loaded models keep exact probabilities and can be used to build products
+
+from decimal import Decimal
+
+e = ConsMDP()
+e.new_states(3)
+e.set_reload(0)
+e.add_action(0, {0: Decimal("0.7"), 1: Decimal("0.2"), 2: Decimal("0.1")},
+             "a", 1)
+e.add_action(1, {0: Decimal("0.12345678901234567891"),
+                2: Decimal("0.87654321098765432109")}, "b", 1)
+e.add_action(2, {1: Decimal("0.06"), 2: Decimal("0.82"), 0: Decimal("0.12")},
+             "c", 2)
+path = os.path.join(tmp_dir, "exact.npz")
+fimdp.save(e, path)
+loaded = fimdp.load(path)
+for s in range(e.num_states):
+    assert [a.distr for a in loaded.actions_for_state(s)] == \
+           [a.distr for a in e.actions_for_state(s)]
+q, qT = product_energy(loaded, 5, [1])
+assert q.num_states == product_energy(e, 5, [1])[0].num_states
+fimdp.save(q, path)
+q = fimdp.load(path)
+product_energy(q.orig_mdp, 5, [1])
+print("Passed test 4 for storage of ProductConsMDP in file test_storage.py")
+
+# ## Invalid files
+
+path = os.path.join(tmp_dir, "arrays.npz")
+np.savez(path, a=np.arange(3))
+try:
+    fimdp.load(path)
+    assert False
+except ValueError:
+    print("Passed test 1 for invalid files in file test_storage.py")
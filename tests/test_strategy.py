@@ -74,13 +74,46 @@ try:
 except NoFeasibleActionError:
     print("Passed test 5 for selection rules (`select_action`) in file test_strategy.py")
 
+# ### 4. Changes after selection and frozen rules
+# The sorted lower bounds must follow changes of the rule.
+
+rule4 = SelectionRule({5: rule[2]})
+assert rule4.select_action(7).label == 't'
+rule4[7] = rule[12]
+assert rule4.select_action(7).label == 'r'
+del rule4[7]
+assert rule4.select_action(7).label == 't'
+rule4.update({0: rule[12]})
+assert rule4.select_action(4).label == 'r'
+rule4 |= {3: rule[2]}
+assert rule4.select_action(4).label == 't'
+
+frozen = rule.freeze()
+assert frozen == rule and dict(frozen) == rule
+assert str(frozen) == str(rule)
+for energy in range(60):
+    try:
+        expected = rule.select_action(energy)
+    except NoFeasibleActionError:
+        expected = None
+    try:
+        assert frozen.select_action(energy) is expected
+    except NoFeasibleActionError:
+        assert expected is None
+try:
+    frozen[3] = rule[2]
+    assert False
+except TypeError:
+    pass
+print("Passed test 6 for selection rules (frozen rules) in file test_strategy.py")
+
 # ## Test CounterSelector
 # 1. Test initialization (with an iterable, nothing)
 # 2. Test update (correct and incorrect actions)
 # 3. Test `select_action`
 # 4. Test `copy_values_from`
 
-from fimdp.core import CounterSelector
+from fimdp.core import CounterSelector, CounterStrategy
 
 # ### 1. Test initialization
 
@@ -181,6 +214,73 @@ for s in range(m.num_states):
         assert selector_to[s] == expected[s]
 print("Passed test 6 for CounterSelector (copy_values_from) in file test_strategy.py")
 
+# ### 5. Frozen selector
+
+frozen = selector_to.freeze()
+assert frozen == selector_to and frozen.mdp is selector_to.mdp
+for s in range(m.num_states):
+    for energy in range(30):
+        try:
+            expected = selector_to.select_action(s, energy)
+        except NoFeasibleActionError:
+            continue
+        assert frozen.select_action(s, energy) is expected
+try:
+    frozen.update(3, 1, m.actions[5])
+    assert False
+except TypeError:
+    pass
+print("Passed test 7 for CounterSelector (freeze) in file test_strategy.py")
+
+# ### 6. Batch selection
+# `select_actions` selects for many pairs of states and energies at once and
+# returns indices of actions in the frozen mdp (-1 if no action is
+# feasible). Changes of the selector are taken into account.
+
+# +
+import numpy as np
+
+frozen_mdp = m.freeze()
+states = np.repeat(np.arange(m.num_states), 32)
+energies = np.tile(np.arange(-1, 31), m.num_states)
+ids = selector_to.select_actions(states, energies)
+for state, energy, i in zip(states, energies, ids):
+    try:
+        assert frozen_mdp.action(i) is selector_to.select_action(state, energy)
+    except NoFeasibleActionError:
+        assert i == -1
+
+selector_to.update(3, 1, m.actions[5])
+ids = selector_to.select_actions([3], [1])
+assert frozen_mdp.action(ids[0]) is m.actions[5]
+selector_to[3] = SelectionRule()
+assert list(selector_to.select_actions([3, 3], [1, 100])) == [-1, -1]
+
+actions = selector_to.select_actions([0, 0, 6], [2, 10, 10])
+new_energies = selector_to.update_energies([0, 0, 6], actions, [2, 10, 10], 30)
+for state, energy, i, new_energy in zip([0, 0, 6], [2, 10, 10], actions,
+                                        new_energies):
+    strategy = CounterStrategy(m, selector_to, 30, energy, state)
+    assert frozen_mdp.action(i) is strategy.next_action()
+    strategy.update_state(list(frozen_mdp.action(i).distr)[0])
+    assert strategy.energy == new_energy
+
+# Only changes of its own rules make the selector compile them again
+compiled = selector_to._batch[1]
+other = CounterSelector(m)
+other.update(3, 1, m.actions[5])
+other[3].setdefault(1)
+selector_to.select_actions([3], [1])
+assert selector_to._batch[1] is compiled
+selector_to[0].setdefault(min(selector_to[0]))
+selector_to.select_actions([3], [1])
+assert selector_to._batch[1] is compiled
+selector_to.update(3, 1, m.actions[5])
+selector_to.select_actions([3], [1])
+assert selector_to._batch[1] is not compiled
+print("Passed test 8 for CounterSelector (select_actions) in file test_strategy.py")
+# -
+
 # ## Test Strategy interface
 # We first create a simple strategy that always chooses the first action for the current state.
 